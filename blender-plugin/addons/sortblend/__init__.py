@@ -28,6 +28,10 @@ import os
 from . import base
 from . import renderer
 from . import material
+from . import exporter
+from . import geometry_cache
+from . import animation
+from .daemon import render_daemon
 from .ui import ui_render
 from .ui import ui_particle
 from .ui import ui_world
@@ -35,13 +39,42 @@ from .ui import ui_camera
 from .ui import ui_light
 from .ui import ui_material
 
+@base.register_class
+class SORT_clear_geometry_cache(bpy.types.Operator):
+    bl_idname = "sort.clear_geometry_cache"
+    bl_label = "Clear Geometry Cache"
+    def execute(self, context):
+        geometry_cache.clear()
+        return {'FINISHED'}
+
 @base.register_class
 class SORTAddonPreferences(bpy.types.AddonPreferences):
     bl_idname = __package__
     install_path : bpy.props.StringProperty( name="Path to SORT binary", description='Path to SORT binary', subtype='DIR_PATH')
+    stream_scene : bpy.props.BoolProperty( name="Stream Scene", description='Stream the scene to SORT through socket instead of writing it to a file first', default=True)
+    shared_memory_display : bpy.props.BoolProperty( name="Shared Memory Display", description='SORT writes pixels to memory shared with Blender instead of sending them through socket', default=True)
+    render_daemon : bpy.props.BoolProperty( name="Render Daemon", description='Keep SORT running between renders so that compiled shaders and loaded textures are reused', default=False)
+    render_workers : bpy.props.IntProperty( name="Render Workers", description='Number of SORT processes rendering an image together, they are spread over NUMA nodes', default=1, min=1, max=64)
+    worker_launcher : bpy.props.StringProperty( name="Worker Launcher", description="Command each worker is launched through, like 'ssh node{worker}'. '{worker}' and '{node}' are replaced by the index and NUMA node of the worker")
+    geometry_cache_enabled : bpy.props.BoolProperty( name="Geometry Cache", description='Keep exported meshes on disk so that unchanged meshes are not exported again in later renders', default=True)
+    geometry_cache_path : bpy.props.StringProperty( name="Path to geometry cache", description='Folder of the geometry cache, the system temporary folder is used if it is empty', subtype='DIR_PATH')
+    geometry_cache_size : bpy.props.IntProperty( name="Geometry cache size (MB)", description='Least recently used meshes are evicted once the cache is larger than this', default=4096, min=0)
 
     def draw(self, context):
         self.layout.prop(self, "install_path")
+        self.layout.prop(self, "stream_scene")
+        self.layout.prop(self, "shared_memory_display")
+        self.layout.prop(self, "render_daemon")
+        self.layout.prop(self, "render_workers")
+        if self.render_workers > 1:
+            self.layout.prop(self, "worker_launcher")
+        self.layout.prop(self, "geometry_cache_enabled")
+        if self.geometry_cache_enabled:
+            self.layout.prop(self, "geometry_cache_path")
+            self.layout.prop(self, "geometry_cache_size")
+            row = self.layout.row()
+            row.label(text='Hits: %d    Misses: %d    Size: %.2f(MB)' % (geometry_cache.cache_hits, geometry_cache.cache_misses, geometry_cache.cache_size / (1024 * 1024)))
+            row.operator("sort.clear_geometry_cache")
 
 def register():
     # register all classes in this plugin
@@ -50,6 +83,20 @@ def register():
     # this is the place for initializing group node information saved last time
     bpy.app.handlers.load_post.append(material.node_groups_load_post)
 
+    # keep track of what is updated since last export so that only updated data gets exported again
+    bpy.app.handlers.depsgraph_update_post.append(exporter.track_depsgraph_updates)
+    bpy.app.handlers.frame_change_post.append(exporter.frame_changed)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        handlers.append(exporter.invalidate_exported_data)
+
 def unregister():
     # unregister everything already registered
     base.unregister()
+
+    # the render daemon doesn't outlive the add-on
+    render_daemon.stop()
+
+    bpy.app.handlers.depsgraph_update_post.remove(exporter.track_depsgraph_updates)
+    bpy.app.handlers.frame_change_post.remove(exporter.frame_changed)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        handlers.remove(exporter.invalidate_exported_data)
@@ -0,0 +1,206 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+
+import bpy
+import os
+import queue
+import shutil
+import threading
+from .log import log
+from . import base
+from . import exporter
+from .supervisor import RenderSupervisor
+from .framebuffer import Framebuffer
+from .daemon import render_daemon
+
+# How often the animation render checks whether a frame is rendered or the next one can be exported, in seconds.
+ANIMATION_POLL_INTERVAL = 0.05
+
+# The render engine that a frame of an animation looks like to a supervisor, the image is only needed once it is done.
+class AnimationFrame:
+    def __init__(self, animation):
+        self.animation = animation
+
+    def test_break(self):
+        return self.animation.cancelled
+
+    def update_result(self, x, y, w, h, pixels):
+        pass
+
+# Frames are rendered one after another in a background thread. At most one exported frame waits for its turn, so that
+# Blender exports the next frame while SORT is rendering the current one without piling up exported scenes.
+class AnimationRender:
+    def __init__(self, settings, ip_addr):
+        self.settings = settings
+        self.ip_addr = ip_addr
+        self.cancelled = False
+        self.supervisor = None
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # whether the next frame is needed, which is the case once the render thread has taken the last one
+    def can_queue(self):
+        return self.jobs.empty()
+
+    # queue an exported frame, the exported scene is deleted once the frame is rendered
+    def queue(self, frame, scene_dir, width, height):
+        self.jobs.put((frame, scene_dir, width, height))
+
+    # no more frames, the render thread quits once all queued frames are rendered
+    def finish(self):
+        self.jobs.put(None)
+
+    # stop rendering, frames not rendered yet are dropped
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.supervisor is not None:
+                self.supervisor.cancel()
+        self.jobs.put(None)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            frame, scene_dir, width, height = job
+            try:
+                # frames queued before cancelling are dropped without being rendered
+                pixels = None if self.cancelled else self.render_frame(scene_dir, width, height)
+            except Exception as exc:
+                log('Failed to render frame %d: %s' % (frame, exc))
+                pixels = None
+            finally:
+                shutil.rmtree(scene_dir, ignore_errors=True)
+            self.results.put((frame, pixels))
+
+    # render one frame, the image is returned unless the render is cancelled
+    def render_frame(self, scene_dir, width, height):
+        binary_path, binary_dir, shared_memory, daemon, arguments = self.settings
+        framebuffer = Framebuffer(width, height, shared_memory)
+        supervisor = RenderSupervisor(AnimationFrame(self), self.ip_addr, framebuffer)
+
+        cmd_argument = [ binary_path ]
+        cmd_argument.append( '--input:' + scene_dir + 'scene.sort' )
+        cmd_argument.append( '--displayserver:' + self.ip_addr + ':' + str(supervisor.port) )
+        cmd_argument.append( '--blendermode' )
+        if framebuffer.is_shared():
+            cmd_argument.append( '--displaymemory:' + framebuffer.path )
+        cmd_argument += arguments
+
+        with self.lock:
+            if self.cancelled:
+                supervisor.close()
+                return None
+            self.supervisor = supervisor
+
+        try:
+            if daemon is None or not supervisor.submit(daemon, cmd_argument, binary_dir):
+                supervisor.launch(cmd_argument, binary_dir)
+            finished = supervisor.run()
+
+            # the shared frame buffer is gone once the supervisor is closed
+            pixels = framebuffer.pixels.copy() if finished else None
+        finally:
+            with self.lock:
+                self.supervisor = None
+            supervisor.close()
+        return pixels
+
+# save a rendered frame to where Blender would save it, with the output settings of the scene
+def save_frame(scene, frame, pixels):
+    path = scene.render.frame_path(frame=frame)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new('SORT Animation Frame', width, height, alpha=True, float_buffer=True)
+    try:
+        image.pixels.foreach_set(pixels.ravel())
+        image.save_render(path, scene=scene)
+    finally:
+        bpy.data.images.remove(image)
+    log('Saved frame %d to %s' % (frame, path))
+
+@base.register_class
+class SORT_OT_render_animation(bpy.types.Operator):
+    bl_idname = "sort.render_animation"
+    bl_label = "Render Animation"
+    bl_description = "Render the frame range of the scene, the next frame is exported while the current one is rendered"
+
+    def invoke(self, context, event):
+        binary_path = exporter.get_sort_bin_path()
+        if binary_path is None or not os.path.exists(binary_path):
+            self.report({'ERROR'}, 'Set the path where binary for SORT is located before rendering anything.')
+            return {'CANCELLED'}
+
+        scene = context.scene
+        preferences = context.preferences.addons['sortblend'].preferences
+        settings = ( binary_path , exporter.get_sort_dir() , preferences.shared_memory_display ,
+                     render_daemon if preferences.render_daemon else None , exporter.get_progressive_arguments(scene) )
+
+        self.frames = list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+        self.next_frame = 0
+        self.rendered_frames = 0
+        self.original_frame = scene.frame_current
+        self.animation = AnimationRender(settings, '127.0.0.1')
+        exporter.begin_animation()
+
+        context.window_manager.progress_begin(0, len(self.frames))
+        self.timer = context.window_manager.event_timer_add(ANIMATION_POLL_INTERVAL, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.animation.cancel()
+            self.finish(context)
+            self.report({'WARNING'}, 'Animation rendering is cancelled.')
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        scene = context.scene
+        while not self.animation.results.empty():
+            frame, pixels = self.animation.results.get()
+            if pixels is not None:
+                save_frame(scene, frame, pixels)
+            self.rendered_frames += 1
+            context.window_manager.progress_update(self.rendered_frames)
+
+        # export the next frame while the current one is being rendered
+        if self.next_frame < len(self.frames) and self.animation.can_queue():
+            frame = self.frames[self.next_frame]
+            scene.frame_set(frame)
+            exporter.export_blender(context.evaluated_depsgraph_get())
+            _, _, width, height = exporter.get_render_border(scene)
+            self.animation.queue(frame, exporter.get_intermediate_dir(), width, height)
+            self.next_frame += 1
+            if self.next_frame == len(self.frames):
+                self.animation.finish()
+
+        if self.rendered_frames < len(self.frames):
+            return {'RUNNING_MODAL'}
+        self.finish(context)
+        return {'FINISHED'}
+
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        exporter.end_animation()
+        context.scene.frame_set(self.original_frame)
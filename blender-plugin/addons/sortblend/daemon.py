@@ -0,0 +1,123 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+import socket
+import struct
+import threading
+import subprocess
+from .log import log
+from .stream import stream
+
+# How long a newly launched render daemon has to connect back before it is given up.
+CONNECT_TIME_OUT = 5.0
+
+# Reply of a render job, the result of the job.
+JOB_RESULT = struct.Struct('<i')
+
+# A SORT process that lives through the Blender session instead of a single render. Everything SORT keeps resident,
+# compiled shader units and loaded textures for example, is reused by later renders so that they only pay for what
+# has changed. Each render job is the list of command line arguments a separate SORT process would get.
+# The daemon renders one job at a time, whoever can't acquire it, like a final render while the viewport is rendering,
+# launches a separate SORT process instead.
+class RenderDaemon:
+    def __init__(self):
+        self.process = None
+        self.connection = None
+        self.binary_path = None
+        self.lock = threading.Lock()
+
+    # take the daemon for a render job, returns False if it is busy with another one
+    def acquire(self):
+        return self.lock.acquire(blocking=False)
+
+    def release(self):
+        self.lock.release()
+
+    def is_alive(self):
+        return self.connection is not None and self.process is not None and self.process.poll() is None
+
+    # make sure the daemon is running, returns whether it is available
+    def start(self, binary_path, cwd, ip_addr):
+        if self.is_alive() and self.binary_path == binary_path:
+            return True
+        self.kill()
+
+        # the daemon connects back to a socket that is only open until it does
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind((ip_addr, 0))
+            listener.listen()
+            listener.settimeout(CONNECT_TIME_OUT)
+            daemon_addr = ip_addr + ':' + str(listener.getsockname()[1])
+            self.process = subprocess.Popen([binary_path, '--daemon:' + daemon_addr], cwd=cwd)
+            self.connection, _ = listener.accept()
+            self.connection.settimeout(None)
+        except OSError as e:
+            log('Failed to start render daemon: %s' % e)
+            self.kill()
+            return False
+        finally:
+            listener.close()
+
+        self.binary_path = binary_path
+        log('Render daemon is running.')
+        return True
+
+    # send a render job, it is done once its result is available to read from the connection
+    def submit(self, args):
+        ms = stream.MemoryStream()
+        ms.serialize(len(args))
+        for arg in args:
+            ms.serialize(arg)
+        self.connection.sendall(ms.getvalue())
+
+    # read the result of a job, None means the daemon is gone or doesn't reply in time
+    def receive_result(self, time_out=None):
+        try:
+            self.connection.settimeout(time_out)
+            data = self.connection.recv(JOB_RESULT.size, socket.MSG_WAITALL)
+            self.connection.settimeout(None)
+        except OSError:
+            data = b''
+        if len(data) != JOB_RESULT.size:
+            log('Render daemon is gone.')
+            self.kill()
+            return None
+        return JOB_RESULT.unpack(data)[0]
+
+    # ask the daemon to quit, it is killed if it doesn't do so in time
+    def stop(self):
+        if self.is_alive():
+            try:
+                self.connection.sendall(struct.pack('<I', 0))
+                self.process.wait(CONNECT_TIME_OUT)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+    # kill the daemon right away, this is the only way to stop a render job in the middle
+    def kill(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+        self.binary_path = None
+
+# the render daemon of this Blender session
+render_daemon = RenderDaemon()
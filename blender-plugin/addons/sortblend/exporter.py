@@ -25,6 +25,7 @@ from math import degrees
 from .log import log, logD
 from .strid import SID
 from .stream import stream
+from . import geometry_cache
 
 BLENDER_VERSION = f'{bpy.app.version[0]}.{bpy.app.version[1]}'
 
@@ -35,11 +36,44 @@ def depsgraph_objects(depsgraph: bpy.types.Depsgraph):
         if obj.type in ITERATED_OBJECT_TYPES:
             yield obj.evaluated_get(depsgraph)
 
+# Walk all instances in the dependency graph and group them by the mesh data they share.
+# Unlike 'depsgraph.objects', this also covers collection instances and particle instances. Objects with modifiers own their
+# evaluated mesh, they can still be shared if the same object is instanced multiple times. Meshes with smoke or materials
+# that need a per-mesh material proxy in the renderer ( SSS and volume ) are never shared, each instance gets its own copy.
+def collect_mesh_instances(depsgraph: bpy.types.Depsgraph):
+    scene = depsgraph.scene
+    groups = {}
+    for instance in depsgraph.object_instances:
+        obj = instance.instance_object if instance.is_instance else instance.object
+        if obj.type != 'MESH':
+            continue
+        if not instance.is_instance and obj.is_instancer and not obj.show_instancer_for_render:
+            continue
+
+        # instances are temporary, the matrix has to be copied before moving to the next one
+        matrix = instance.matrix_world.copy()
+
+        shareable = get_smoke_modifier(obj) is None and \
+                    not any(m is not None and name_compat(m.name) in matname_with_proxy for m in obj.data.materials[:])
+        if not shareable:
+            key = ('unique', len(groups))
+        elif obj.is_modified(scene, 'RENDER'):
+            key = ('object', obj.original.as_pointer())
+        else:
+            key = ('mesh', obj.data.original.as_pointer())
+
+        if key in groups:
+            groups[key][1].append(matrix)
+        else:
+            groups[key] = (obj, [matrix], shareable)
+    return groups.items()
+
 # Get the list of material for the whole scene, this function will only list materials that are currently
 # attached to an object in the scene. Non-used materials will not be needed to be exported to SORT.
 def list_materials( depsgraph ):
     exported_materials = []
-    for ob in depsgraph_objects(depsgraph):
+    for instance in depsgraph.object_instances:
+        ob = instance.instance_object if instance.is_instance else instance.object
         if ob.type == 'MESH':
             for material in ob.data.materials[:]:
                 # make sure it is a SORT material
@@ -168,41 +202,187 @@ def lookat_camera(camera):
     up = matrix[1]                   # up direction
     return (pos, target, up)
 
+# get view data of a viewport, the view matrix maps from world space to view space
+def lookat_view(view_matrix, distance):
+    matrix = ( MatrixBlenderToSort() @ view_matrix.inverted() ).transposed()
+    pos = matrix[3]             # get eye position
+    target = pos - matrix[2] * distance
+    up = matrix[1]
+    return (pos, target, up)
+
 # export blender information
-def export_blender(depsgraph, force_debug=False, is_preview=False):
+# a viewport render passes the view of the viewport, which overrides the camera and resolution of the scene
+def export_blender(depsgraph, force_debug=False, is_preview=False, connection=None, view=None):
     scene = depsgraph.scene
 
     # create intermediate resource path
     sort_resource_path = create_path(scene, force_debug)
 
-    # initialize the file to be fed as main input for the renderer
-    # this will potentially be replaced with socket streaming in the future
-    sort_config_file = sort_resource_path + 'scene.sort'
-    fs = stream.FileStream( sort_config_file )
-    log("Exporting sort file %s" % sort_config_file)
+    # the scene is streamed to the renderer directly if it is connected already, otherwise it goes to a file,
+    # which is also what happens when exporting a scene for debugging purposes.
+    if connection is not None:
+        fs = stream.SocketStream( connection )
+        log("Streaming scene to SORT.")
+    else:
+        sort_config_file = sort_resource_path + 'scene.sort'
+        fs = stream.SectionedFileStream( sort_config_file )
+        log("Exporting sort file %s" % sort_config_file)
 
     # export global settings for the renderer
     current_time = time()
     log("Exporting global configuration.")
-    export_global_config(scene, fs, sort_resource_path)
+    export_global_config(scene, fs, sort_resource_path, view)
     log("Exported configuration %.2f" % (time() - current_time))
 
-    # export materials
+    # export materials, they are serialized again only if any of them is updated since last export
     current_time = time()
     log("Exporting materials.")
-    collect_shader_resources(depsgraph, scene, fs)     # this is the place for material to signal heavy resources, like textures, measured BRDF, etc.
-    export_materials(depsgraph, fs)                    # this is the place for serializing OSL shader source code with proper default values.
+    export_materials_incrementally(depsgraph, scene, fs)
     log("Exported materials %.2f(s)" % (time() - current_time))
 
-    # export scene
+    # export scene, meshes that are not changed since last time are picked up from the geometry cache
     current_time = time()
     log("Exporting scene.")
-    export_scene(depsgraph, is_preview, fs)
+    geometry_cache.begin_export(force_debug is False)
+    export_scene(depsgraph, is_preview, fs, view)
+    geometry_cache.end_export()
     log("Exported scene %.2f(s)" % (time() - current_time))
 
-    # make sure the result of the file writting is flushed because it could be problematic on some machines
-    fs.flush()
-    del fs
+    # everything updated so far is exported now, meshes are not tracked if the geometry cache is not used
+    if geometry_cache.is_enabled():
+        updated_ids.clear()
+
+    # make sure the result of the file writting is flushed because it could be problematic on some machines,
+    # closing the socket stream also tells the renderer that the whole scene is sent.
+    fs.close()
+
+# Incremental export
+#
+# Meshes and materials are the expensive part of exporting a scene. Updates of the depsgraph are tracked between
+# renders so that a later export only serializes meshes whose geometry is updated and materials only if any of them
+# is updated. Everything else, like camera, lights, transforms and global settings, is cheap and always serialized.
+# Reusing a mesh only takes its file in the geometry cache, the mesh data itself is never kept in memory.
+exported_meshes = {}        # group key of a mesh -> ( path of the cached mesh , vertex count , primitive count )
+exported_materials = None   # ( list of materials , serialized material data , material mapping )
+updated_ids = set()         # pointers to objects and meshes whose geometry is updated since last export
+materials_updated = True    # whether any material is updated since last export
+
+# a full export is needed when anything can't be tracked through depsgraph updates, like loading a file or changing frame
+@bpy.app.handlers.persistent
+def invalidate_exported_data(*args):
+    global exported_materials, materials_updated
+    exported_meshes.clear()
+    exported_materials = None
+    materials_updated = True
+
+@bpy.app.handlers.persistent
+def track_depsgraph_updates(scene, depsgraph):
+    global materials_updated
+    for update in depsgraph.updates:
+        updated_id = update.id.original
+        if isinstance(updated_id, bpy.types.Object):
+            # transform is always exported, only geometry update matters
+            if update.is_updated_geometry:
+                updated_ids.add(updated_id.as_pointer())
+                if updated_id.data is not None:
+                    updated_ids.add(updated_id.data.original.as_pointer())
+            # material assignment affects the material id of triangles
+            if update.is_updated_shading:
+                materials_updated = True
+        elif isinstance(updated_id, bpy.types.Mesh):
+            updated_ids.add(updated_id.as_pointer())
+        elif isinstance(updated_id, (bpy.types.Material, bpy.types.NodeTree, bpy.types.Image)):
+            materials_updated = True
+
+# Animation rendering
+#
+# Frames of an animation share whatever doesn't change over the frame range. Objects are classified once before the
+# first frame, later frames only export animated geometry again, static meshes and materials come from the previous
+# frame through the incremental export. Transforms, camera and lights are always exported, they are cheap anyway.
+animated_ids = None         # pointers to objects and meshes whose geometry may change between frames, None unless rendering an animation
+materials_animated = False  # whether any material may change between frames
+
+# modifiers that never change the geometry between frames on their own, they still do if they refer to another object
+STATIC_MODIFIERS = { 'ARRAY', 'BEVEL', 'DECIMATE', 'EDGE_SPLIT', 'MIRROR', 'MULTIRES', 'REMESH', 'SCREW', 'SKIN',
+                     'SOLIDIFY', 'SUBSURF', 'TRIANGULATE', 'WELD', 'WEIGHTED_NORMAL', 'WIREFRAME' }
+
+def has_animation(id_data):
+    return id_data is not None and id_data.animation_data is not None and \
+           ( id_data.animation_data.action is not None or len(id_data.animation_data.drivers) > 0 )
+
+# whether the geometry of an object may be different in a different frame, transform doesn't count
+def is_geometry_animated(obj):
+    if has_animation(obj.data) or has_animation(obj.data.shape_keys):
+        return True
+    # modifiers may be animated through the object
+    if has_animation(obj):
+        fcurves = list(obj.animation_data.drivers)
+        if obj.animation_data.action is not None:
+            fcurves += list(obj.animation_data.action.fcurves)
+        if any(fcurve.data_path.startswith('modifiers') for fcurve in fcurves):
+            return True
+    for modifier in obj.modifiers:
+        if modifier.type not in STATIC_MODIFIERS:
+            return True
+        if any(prop.type == 'POINTER' and isinstance(getattr(modifier, prop.identifier), bpy.types.Object) for prop in modifier.bl_rna.properties):
+            return True
+    return False
+
+# classify everything before rendering the frames of an animation
+def begin_animation():
+    global animated_ids, materials_animated
+    animated_ids = set()
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and is_geometry_animated(obj):
+            animated_ids.add(obj.as_pointer())
+            animated_ids.add(obj.data.as_pointer())
+
+    # image sequences and movies are different in each frame too
+    materials_animated = any(has_animation(material) or has_animation(material.node_tree) for material in bpy.data.materials) or \
+                         any(has_animation(group) for group in bpy.data.node_groups) or \
+                         any(image.source in ('SEQUENCE', 'MOVIE') for image in bpy.data.images)
+    log('Animated meshes: %d, animated materials: %s.' % (len(animated_ids) // 2, materials_animated))
+
+def end_animation():
+    global animated_ids
+    animated_ids = None
+    invalidate_exported_data()
+
+# changing frame invalidates everything, unless it is an animation render which knows what may change
+@bpy.app.handlers.persistent
+def frame_changed(*args):
+    global materials_updated
+    if animated_ids is None:
+        invalidate_exported_data()
+        return
+    updated_ids.update(animated_ids)
+    materials_updated = materials_updated or materials_animated
+
+# export materials or reuse the serialized data from last export if none of them is updated
+def export_materials_incrementally(depsgraph, scene, fs):
+    global exported_materials, materials_updated
+    global matname_to_id
+
+    materials = ( tuple(material.name for material in list_materials(depsgraph)), scene.sort_data.allUseDefaultMaterial )
+    if not materials_updated and exported_materials is not None and exported_materials[0] == materials:
+        fs.serialize(exported_materials[1])
+        matname_to_id = exported_materials[2].copy()
+        return
+
+    previous_matname_to_id = dict(matname_to_id)
+    matname_to_id.clear()
+
+    ms = stream.MemoryStream()
+    collect_shader_resources(depsgraph, scene, ms)     # this is the place for material to signal heavy resources, like textures, measured BRDF, etc.
+    export_materials(depsgraph, ms)                    # this is the place for serializing OSL shader source code with proper default values.
+    fs.serialize(ms.getvalue())
+
+    # material ids of triangles in exported meshes are not valid anymore once the mapping changes
+    if matname_to_id != previous_matname_to_id:
+        exported_meshes.clear()
+
+    exported_materials = ( materials, ms.getvalue(), dict(matname_to_id) )
+    materials_updated = False
 
 # clear old data and create new path
 def create_path(scene, force_debug):
@@ -223,17 +403,70 @@ def get_smoke_modifier(obj: bpy.types.Object):
         return next((modifier for modifier in obj.modifiers if modifier.type == 'FLUID' and modifier.fluid_type == 'DOMAIN'), None)
     return next((modifier for modifier in obj.modifiers if modifier.type == 'SMOKE' and modifier.smoke_type == 'DOMAIN'), None)
 
+# helper function to convert a vector to a tuple
+def vec3_to_tuple(vec):
+    return (vec[0],vec[1],vec[2])
+
+# serialize the camera entity, it is the camera of the viewport if there is a view
+def serialize_camera(scene, fs, view=None):
+    camera = scene.camera
+    if view is not None:
+        # the view of a viewport
+        pos, target, up = view.pos, view.target, view.up
+        sensor_w, sensor_h = view.sensor
+        sensor_fit = view.sensor_fit
+        aspect_ratio_x = aspect_ratio_y = 1.0
+        fov_angle = view.fov
+        xres, yres = view.resolution
+        lens_size = view.lens_size
+    else:
+        if camera is None:
+            print("There is no active camera.")
+            return False
+
+        pos, target, up = lookat_camera(camera)
+        sensor_w = bpy.data.cameras[0].sensor_width
+        sensor_h = bpy.data.cameras[0].sensor_height
+        sensor_fit = 0.0 # auto
+        sfit = bpy.data.cameras[0].sensor_fit
+        if sfit == 'VERTICAL':
+            sensor_fit = 2.0
+        elif sfit == 'HORIZONTAL':
+            sensor_fit = 1.0
+        aspect_ratio_x = scene.render.pixel_aspect_x
+        aspect_ratio_y = scene.render.pixel_aspect_y
+        fov_angle = bpy.data.cameras[0].angle
+
+        # resolution of the final image
+        xres = scene.render.resolution_x * scene.render.resolution_percentage / 100
+        yres = scene.render.resolution_y * scene.render.resolution_percentage / 100
+        lens_size = camera.data.sort_data.lens_size
+
+    fs.serialize(SID('PerspectiveCameraEntity'))
+    fs.serialize(vec3_to_tuple(pos))
+    fs.serialize(vec3_to_tuple(up))
+    fs.serialize(vec3_to_tuple(target))
+    fs.serialize((int(xres),int(yres)))
+    fs.serialize(lens_size)
+    fs.serialize((sensor_w,sensor_h))
+    fs.serialize(int(sensor_fit))
+    fs.serialize((aspect_ratio_x,aspect_ratio_y))
+    fs.serialize(fov_angle)
+    return True
+
+# serialize the camera of a viewport alone so that a running interactive render can go on with it
+def serialize_view(scene, view):
+    ms = stream.MemoryStream()
+    serialize_camera(scene, ms, view)
+    return ms.getvalue()
+
 # export scene
-def export_scene(depsgraph, is_preview, fs):
+def export_scene(depsgraph, is_preview, fs, view=None):
     # helper function to convert a matrix to a tuple
     def matrix_to_tuple(matrix):
         return (matrix[0][0],matrix[0][1],matrix[0][2],matrix[0][3],matrix[1][0],matrix[1][1],matrix[1][2],matrix[1][3],
                 matrix[2][0],matrix[2][1],matrix[2][2],matrix[2][3],matrix[3][0],matrix[3][1],matrix[3][2],matrix[3][3])
 
-    # helper function to convert a vector to a tuple
-    def vec3_to_tuple(vec):
-        return (vec[0],vec[1],vec[2])
-
     # get the scene object from dependency graph
     scene = depsgraph.scene
 
@@ -242,63 +475,78 @@ def export_scene(depsgraph, is_preview, fs):
     fs.serialize( vericiation_bits )
 
     # camera node
-    camera = scene.camera
-    if camera is None:
-        print("There is no active camera.")
+    if not serialize_camera(scene, fs, view):
         return
 
-    pos, target, up = lookat_camera(camera)
-    sensor_w = bpy.data.cameras[0].sensor_width
-    sensor_h = bpy.data.cameras[0].sensor_height
-    sensor_fit = 0.0 # auto
-    sfit = bpy.data.cameras[0].sensor_fit
-    if sfit == 'VERTICAL':
-        sensor_fit = 2.0
-    elif sfit == 'HORIZONTAL':
-        sensor_fit = 1.0
-    aspect_ratio_x = scene.render.pixel_aspect_x
-    aspect_ratio_y = scene.render.pixel_aspect_y
-    fov_angle = bpy.data.cameras[0].angle
-
-    # resolution of the final image
-    xres = scene.render.resolution_x * scene.render.resolution_percentage / 100
-    yres = scene.render.resolution_y * scene.render.resolution_percentage / 100
-
-    fs.serialize(SID('PerspectiveCameraEntity'))
-    fs.serialize(vec3_to_tuple(pos))
-    fs.serialize(vec3_to_tuple(up))
-    fs.serialize(vec3_to_tuple(target))
-    fs.serialize((int(xres),int(yres)))
-    fs.serialize(camera.data.sort_data.lens_size)
-    fs.serialize((sensor_w,sensor_h))
-    fs.serialize(int(sensor_fit))
-    fs.serialize((aspect_ratio_x,aspect_ratio_y))
-    fs.serialize(fov_angle)
-
     all_lights = [ ob for ob in depsgraph_objects(depsgraph) if ob.type == 'LIGHT' ]
     all_objs = [ ob for ob in depsgraph_objects(depsgraph) if ob.type == 'MESH' ]
 
-    total_vert_cnt = 0
-    total_prim_cnt = 0
-    # export meshes
-    for obj in all_objs:
-        fs.serialize(SID('VisualEntity'))
-        fs.serialize( matrix_to_tuple( MatrixBlenderToSort() @ obj.matrix_world ) )
-        fs.serialize( 1 )   # only one mesh for each mesh entity
-        stat = None
+    # meshes exported through the geometry cache in this export
+    exported_keys = set()
+
+    # helper function to export the mesh of an object
+    def export_object_mesh(obj, key = None):
+        # reuse the mesh from last export if it is not updated since then
+        if key is not None and geometry_cache.is_enabled():
+            exported_keys.add(key)
+            exported = exported_meshes.get(key)
+            if exported is not None and key[1] not in updated_ids and geometry_cache.reference(exported[0]):
+                fs.serialize(SID('CachedMeshVisual'))
+                fs.serialize(exported[0])
+                return exported[1:]
+
+            stat = export_object_mesh(obj)
+            if stat[2] is not None:
+                exported_meshes[key] = stat[2:] + stat[:2]
+            return stat
+
         # apply the modifier if there is one
         if obj.type != 'MESH' or obj.is_modified(scene, 'RENDER'):
             try:
                 evaluated_obj = obj.evaluated_get(depsgraph)
                 mesh = evaluated_obj.to_mesh()
-                stat = export_mesh(evaluated_obj, mesh, fs)
+                return export_mesh(evaluated_obj, mesh, fs)
             finally:
                 evaluated_obj.to_mesh_clear()
-        else:
-            stat = export_mesh(obj, obj.data, fs)
+        return export_mesh(obj, obj.data, fs)
+
+    total_vert_cnt = 0
+    total_prim_cnt = 0
+    total_instance_cnt = 0
+    geometry_id = 0
+    # export meshes
+    for key, (obj, matrices, shareable) in collect_mesh_instances(depsgraph):
+        # a mesh with only one instance is flattened in world space, which is faster to be traversed
+        if not shareable or len(matrices) == 1:
+            for matrix in matrices:
+                fs.serialize(SID('VisualEntity'))
+                fs.serialize( matrix_to_tuple( MatrixBlenderToSort() @ matrix ) )
+                fs.serialize( 1 )   # only one mesh for each mesh entity
+                stat = export_object_mesh(obj, key if shareable else None)
 
+                total_vert_cnt += stat[0]
+                total_prim_cnt += stat[1]
+            continue
+
+        # the mesh data is exported only once in its local space
+        fs.serialize(SID('SharedGeometryEntity'))
+        fs.serialize(geometry_id)
+        stat = export_object_mesh(obj, key)
+
+        # each instance is merely a transform and a reference to the shared mesh
+        for matrix in matrices:
+            fs.serialize(SID('InstanceEntity'))
+            fs.serialize( matrix_to_tuple( MatrixBlenderToSort() @ matrix ) )
+            fs.serialize(geometry_id)
+
+        geometry_id += 1
         total_vert_cnt += stat[0]
         total_prim_cnt += stat[1]
+        total_instance_cnt += len(matrices)
+
+    # meshes not in the scene anymore are not tracked, they need to be exported again once they are back
+    for key in [key for key in exported_meshes if key not in exported_keys]:
+        del exported_meshes[key]
 
     # output hair/fur exporting
     for obj in all_objs:
@@ -316,6 +564,7 @@ def export_scene(depsgraph, is_preview, fs):
 
     log( "Total vertices: %d." % total_vert_cnt )
     log( "Total primitives: %d." % total_prim_cnt )
+    log( "Total instances of %d shared meshes: %d." % (geometry_id, total_instance_cnt) )
 
     mapping = {'SUN': 'DirLightEntity', 'POINT': 'PointLightEntity', 'SPOT': 'SpotLightEntity', 'AREA': 'AreaLightEntity' }
     for ob in all_lights:
@@ -369,31 +618,56 @@ def export_scene(depsgraph, is_preview, fs):
     # to indicate the scene stream comes to an end
     fs.serialize(SID('End of Entities'))
 
-    # the accelerator
+    # the accelerator, there is no point to benchmark accelerators for previews, it is the default one for them
     sort_data = scene.sort_data
     accelerator_type = sort_data.accelerator_type_prop
+    if accelerator_type == "Auto" and ( is_preview or view is not None ):
+        accelerator_type = "Qbvh"
+    if accelerator_type == "Auto":
+        fs.serialize( SID('Auto') )
+        fs.serialize( get_accelerator_cache_path() )
+        fs.serialize( float(get_expected_paths(scene)) )
+        fs.serialize( len(ACCELERATOR_CANDIDATES) )
+        for candidate in ACCELERATOR_CANDIDATES:
+            fs.serialize( ACCELERATOR_NAMES[candidate] )
+            export_accelerator_settings(sort_data, candidate, fs)
+    else:
+        fs.serialize( SID(ACCELERATOR_NAMES[accelerator_type]) )
+        export_accelerator_settings(sort_data, accelerator_type, fs)
+
+# accelerators benchmarked by the 'Auto' accelerator, the name of each of them in SORT
+ACCELERATOR_CANDIDATES = [ 'Qbvh' , 'Obvh' , 'bvh' , 'KDTree' , 'OcTree' , 'UniGrid' ]
+ACCELERATOR_NAMES = { 'Qbvh' : 'Qbvh' , 'Obvh' : 'Obvh' , 'bvh' : 'Bvh' , 'KDTree' : 'KDTree' , 'OcTree' : 'OcTree' , 'UniGrid' : 'UniGrid' }
+
+# the settings of an accelerator, they are serialized by the accelerator itself in SORT
+def export_accelerator_settings(sort_data, accelerator_type, fs):
     if accelerator_type == "bvh":
-        fs.serialize( SID('Bvh') )
         fs.serialize( int(sort_data.bvh_max_node_depth) )
         fs.serialize( int(sort_data.bvh_max_pri_in_leaf) )
     elif accelerator_type == "KDTree":
-        fs.serialize( SID('KDTree') )
         fs.serialize( int(sort_data.kdtree_max_node_depth) )
         fs.serialize( int(sort_data.kdtree_max_pri_in_leaf) )
     elif accelerator_type == "OcTree":
-        fs.serialize( SID('OcTree') )
         fs.serialize( int(sort_data.octree_max_node_depth) )
         fs.serialize( int(sort_data.octree_max_pri_in_leaf) )
     elif accelerator_type == "Qbvh":
-        fs.serialize( SID('Qbvh') )
         fs.serialize( int(sort_data.qbvh_max_node_depth) )
         fs.serialize( int(sort_data.qbvh_max_pri_in_leaf) )
     elif accelerator_type == "Obvh":
-        fs.serialize( SID('Obvh') )
         fs.serialize( int(sort_data.obvh_max_node_depth) )
         fs.serialize( int(sort_data.obvh_max_pri_in_leaf) )
-    else:
-        fs.serialize( SID('UniGrid') )
+
+# The accelerator picked for each scene is kept in this file, a scene is only benchmarked once.
+def get_accelerator_cache_path():
+    return os.path.join(tempfile.gettempdir(), 'sort_accelerator_cache.txt')
+
+# Number of camera paths the whole render is expected to trace, it tells how much faster tracing rays has to be to pay
+# for the time of building a more expensive accelerator.
+def get_expected_paths(scene):
+    border = get_render_border(scene)
+    sort_data = scene.sort_data
+    samples = sort_data.adaptive_min_samples if sort_data.adaptive_sampling else sort_data.sampler_count_prop
+    return border[2] * border[3] * samples
 
 # avoid having space in material name
 def name_compat(name):
@@ -402,23 +676,59 @@ def name_compat(name):
     else:
         return name.replace(' ', '_')
 
+# Region of the image to be rendered as ( x , y , width , height ) in pixels, y goes from top to bottom like in SORT.
+# It is the whole image unless there is a render border, which is rounded the same way Blender does. Blender expects
+# the result of the region only, cropping the image or not is up to Blender.
+def get_render_border(scene):
+    xres = int(scene.render.resolution_x * scene.render.resolution_percentage / 100)
+    yres = int(scene.render.resolution_y * scene.render.resolution_percentage / 100)
+    if not scene.render.use_border:
+        return ( 0 , 0 , xres , yres )
+    xmin = int(scene.render.border_min_x * xres)
+    xmax = int(scene.render.border_max_x * xres)
+    ymin = int(scene.render.border_min_y * yres)
+    ymax = int(scene.render.border_max_y * yres)
+    return ( xmin , yres - ymax , max( xmax - xmin , 1 ) , max( ymax - ymin , 1 ) )
+
+# Command line arguments rendering the image progressively, a time budget or a noise target can stop it earlier.
+def get_progressive_arguments(scene):
+    sort_data = scene.sort_data
+    if not sort_data.progressive_rendering:
+        return []
+    arguments = [ '--progressive' ]
+    if sort_data.progressive_time_budget > 0.0:
+        arguments.append( '--time-budget:' + str(sort_data.progressive_time_budget) )
+    if sort_data.progressive_noise_target > 0.0:
+        arguments.append( '--noise-target:' + str(sort_data.progressive_noise_target) )
+    return arguments
+
 # export glocal settings for the renderer
-def export_global_config(scene, fs, sort_resource_path):
+def export_global_config(scene, fs, sort_resource_path, view=None):
     # global renderer configuration
     xres = scene.render.resolution_x * scene.render.resolution_percentage / 100
     yres = scene.render.resolution_y * scene.render.resolution_percentage / 100
+    border = get_render_border(scene)
+    if view is not None:
+        xres, yres = view.resolution
+        border = ( 0 , 0 , int(xres) , int(yres) )
 
     sort_data = scene.sort_data
 
     integrator_type = sort_data.integrator_type_prop
     
-    fs.serialize( 0 )
+    fs.serialize( 2 )
     fs.serialize( sort_resource_path )
     fs.serialize( int(sort_data.thread_num_prop) )
     fs.serialize( int(sort_data.sampler_count_prop) )
     fs.serialize( int(xres) )
     fs.serialize( int(yres) )
     fs.serialize( sort_data.clampping )
+    fs.serialize( border )
+    fs.serialize( bool(sort_data.adaptive_sampling) )
+    fs.serialize( sort_data.adaptive_noise_threshold )
+    fs.serialize( int(sort_data.adaptive_min_samples) )
+    fs.serialize( int(sort_data.adaptive_max_samples) )
+    fs.serialize( bool(sort_data.adaptive_show_sample_count) )
 
     fs.serialize( SID(integrator_type) )
     fs.serialize( int(sort_data.inte_max_recur_depth) )
@@ -433,6 +743,36 @@ def export_global_config(scene, fs, sort_resource_path):
         fs.serialize( sort_data.ir_light_path_num )
         fs.serialize( sort_data.ir_min_dist )
 
+# export a volume grid as sparse bricks
+#
+# Most of a smoke domain is usually empty. The grid is split into bricks of 8x8x8 voxels and only bricks with any
+# non-zero voxel are exported, along with an occupancy index of all bricks, which is -1 for empty bricks. Voxels in
+# a brick are ordered the same way as in the grid, x goes first, then y and z, with all channels of a voxel together.
+VOLUME_BRICK_SIZE = 8
+def export_volume_grid(grid, resolution, channels, fs):
+    if grid is None:
+        fs.serialize((0, 0, 0))
+        return
+
+    x, y, z = resolution
+    fs.serialize((x, y, z))
+
+    # pad the grid to whole bricks
+    bx, by, bz = ( ( d + VOLUME_BRICK_SIZE - 1 ) // VOLUME_BRICK_SIZE for d in resolution )
+    padded = np.zeros((bz * VOLUME_BRICK_SIZE, by * VOLUME_BRICK_SIZE, bx * VOLUME_BRICK_SIZE, channels), dtype=np.float32)
+    padded[:z, :y, :x] = grid.reshape(z, y, x, channels)
+
+    bricks = padded.reshape(bz, VOLUME_BRICK_SIZE, by, VOLUME_BRICK_SIZE, bx, VOLUME_BRICK_SIZE, channels)
+    bricks = bricks.transpose(0, 2, 4, 1, 3, 5, 6).reshape(bz * by * bx, -1)
+
+    occupied = np.any(bricks != 0.0, axis=1)
+    brick_indices = np.full(len(occupied), -1, dtype=np.int32)
+    brick_indices[occupied] = np.arange(np.count_nonzero(occupied), dtype=np.int32)
+
+    fs.serialize(int(np.count_nonzero(occupied)))
+    fs.serialize_ints(brick_indices)
+    fs.serialize_floats(bricks[occupied])
+
 # export smoke information
 def export_smoke(obj, fs):
     smoke_modifier = get_smoke_modifier(obj)
@@ -449,42 +789,28 @@ def export_smoke(obj, fs):
     fs.serialize( SID('has_volume') )
     
     # dimension of the volume data
-    x, y, z = domain.domain_resolution
-    fs.serialize(x)
-    fs.serialize(y)
-    fs.serialize(z)
-
-    # the color itself, don't export it for now
-    # color_grid = np.fromiter(domain.color_grid, dtype=np.float32)
-    # fs.serialize(color_grid)
-
-    FLTFMT = struct.Struct('=f')
+    resolution = tuple(domain.domain_resolution)
+    voxel_cnt = resolution[0] * resolution[1] * resolution[2]
 
     # the density itself
-    density_data = bytearray()
-    density_grid = np.fromiter(domain.density_grid, dtype=np.float32)
-    for density in density_grid:
-        density_data += FLTFMT.pack(density)
+    density_grid = np.fromiter(domain.density_grid, dtype=np.float32, count=voxel_cnt)
+    export_volume_grid(density_grid, resolution, 1, fs)
 
-    fs.serialize(density_data)
+    # the color of the smoke, it comes with an alpha channel, which is not needed
+    color_grid = None
+    if len(domain.color_grid) == voxel_cnt * 4:
+        color_grid = np.fromiter(domain.color_grid, dtype=np.float32, count=voxel_cnt * 4).reshape(voxel_cnt, 4)[:, :3]
+    export_volume_grid(color_grid, resolution, 3, fs)
 
 # export a mesh
+#
+# Instead of walking every polygon and loop in Python, all mesh data is pulled out of Blender with 'foreach_get'
+# and the vertex/index buffers are built with array operations. Every loop generates exactly one vertex, which
+# matches the layout of the previous per-loop implementation so that the serialized data stays byte-identical.
+# Triangles and quads are split as a fan ( 0 , 1 , 2 ) and ( 0 , 2 , 3 ), while n-gons are triangulated through
+# 'loop_triangles' since a fan split is not valid for concave polygons.
 def export_mesh(obj, mesh, fs):
     LENFMT = struct.Struct('=i')
-    FLTFMT = struct.Struct('=f')
-    VERTFMT = struct.Struct('=ffffffff')
-    LINEFMT = struct.Struct('=iiffi')
-    POINTFMT = struct.Struct('=fff')
-    TRIFMT = struct.Struct('=iiii')
-
-    materials = mesh.materials[:]
-    material_names = [m.name if m else None for m in materials]
-
-    vert_cnt = 0
-    primitive_cnt = 0
-    verts = mesh.vertices
-    wo3_verts = bytearray()
-    wo3_tris = bytearray()
 
     global matname_to_id
 
@@ -492,14 +818,8 @@ def export_mesh(obj, mesh, fs):
     mesh.calc_normals()
     mesh.calc_loop_triangles()
 
-    has_uv = bool(mesh.uv_layers)
-    uv_layer = None
-    if has_uv:
-        active_uv_layer = mesh.uv_layers.active
-        if not active_uv_layer:
-            has_uv = False
-        else:
-            uv_layer = active_uv_layer.data
+    uv_layer = mesh.uv_layers.active if mesh.uv_layers else None
+    has_uv = uv_layer is not None
 
     # Warning this function seems to cause quite some trouble on MacOS during the first renderer somehow.
     # And this problem only exists on MacOS not the other two OS.
@@ -508,80 +828,146 @@ def export_mesh(obj, mesh, fs):
     #if has_uv:
     #    mesh.calc_tangents( uvmap = uv_layer_name )
 
-    vert_cnt = 0
-    remapping = {}
-
-    mesh_sid = SID( mesh.name )
-
-    for poly in mesh.polygons:
-        smooth = poly.use_smooth
-        normal = poly.normal[:]
-
-        oi = []
-        for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-            # vertex index
-            vid = mesh.loops[loop_index].vertex_index
-            # vertex information
-            vert = verts[vid]
-
-            # uv coordinate
-            uvcoord = uv_layer[loop_index].uv[:] if has_uv else ( 0.0 , 0.0 )
-
-            # use smooth normal if necessary
-            if smooth:
-                normal = vert.normal[:]
-
-            #tangent = mesh.loops[loop_index].tangent
-
-            # an unique key to identify the vertex
-            key = (vid, loop_index, smooth)
-
-            # acquire the key if possible, otherwise pack one
-            out_idx = remapping.get(key)
-            if out_idx is None:
-                out_idx = vert_cnt
-                remapping[key] = out_idx
-                wo3_verts += VERTFMT.pack(vert.co[0], vert.co[1], vert.co[2], normal[0], normal[1], normal[2], uvcoord[0], uvcoord[1])
-                vert_cnt += 1
-            oi.append(out_idx)
-
-        matid = -1
-        matname = name_compat(material_names[poly.material_index]) if len( material_names ) > 0 else None
-        matid = matname_to_id[matname] if matname in matname_to_id else -1
-        if len(oi) == 3:
-            # triangle
-            wo3_tris += TRIFMT.pack(oi[0], oi[1], oi[2], matid)
-            primitive_cnt += 1
-        elif len(oi) == 4:
-            # quad
-            wo3_tris += TRIFMT.pack(oi[0], oi[1], oi[2], matid)
-            wo3_tris += TRIFMT.pack(oi[0], oi[2], oi[3], matid)
-            primitive_cnt += 2
+    vert_num = len(mesh.vertices)
+    loop_num = len(mesh.loops)
+    poly_num = len(mesh.polygons)
+
+    # per vertex data
+    positions = np.empty(vert_num * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', positions)
+    positions = positions.reshape(-1, 3)
+    vert_normals = np.empty(vert_num * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('normal', vert_normals)
+    vert_normals = vert_normals.reshape(-1, 3)
+
+    # per loop data
+    loop_verts = np.empty(loop_num, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_verts)
+    loop_uvs = np.zeros(loop_num * 2, dtype=np.float32)
+    if has_uv:
+        uv_layer.data.foreach_get('uv', loop_uvs)
+    loop_uvs = loop_uvs.reshape(-1, 2)
+
+    # per polygon data
+    loop_starts = np.empty(poly_num, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    loop_totals = np.empty(poly_num, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', loop_totals)
+    smooth = np.empty(poly_num, dtype=bool)
+    mesh.polygons.foreach_get('use_smooth', smooth)
+    poly_normals = np.empty(poly_num * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('normal', poly_normals)
+    poly_normals = poly_normals.reshape(-1, 3)
+    material_indices = np.empty(poly_num, dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_indices)
+
+    # mapping from material slot to the material id in the exported material list
+    material_names = [m.name if m else None for m in mesh.materials[:]]
+    slot_to_matid = np.array([matname_to_id.get(name_compat(name), -1) for name in material_names] + [-1], dtype=np.int32)
+    poly_matids = slot_to_matid[np.clip(material_indices, 0, len(material_names))] if material_names else np.full(poly_num, -1, dtype=np.int32)
+
+    # meshes without smoke are looked up in the geometry cache first, the hash covers everything the exported data depends on.
+    # n-gon triangulation is not part of it since it is fully determined by the positions and the topology.
+    cache_key = None
+    if geometry_cache.is_enabled() and get_smoke_modifier(obj) is None:
+        cache_key = geometry_cache.hash_arrays((np.array([has_uv]), positions, vert_normals, loop_verts, loop_uvs, loop_starts, loop_totals,
+                                                smooth, poly_normals, material_indices, slot_to_matid))
+        cached_path = geometry_cache.lookup(cache_key)
+        if cached_path is not None:
+            fs.serialize(SID('CachedMeshVisual'))
+            fs.serialize(cached_path)
+            return (int(loop_totals.sum()), int((loop_totals - 2).sum()), cached_path)
+
+    # the first exported vertex of each polygon, vertices are emitted polygon by polygon
+    first_verts = np.cumsum(loop_totals, dtype=np.int64) - loop_totals
+    vert_cnt = int(loop_totals.sum())
+
+    # the polygon and the loop index of each exported vertex
+    vert_polys = np.repeat(np.arange(poly_num), loop_totals)
+    vert_loops = np.arange(vert_cnt) - np.repeat(first_verts, loop_totals) + np.repeat(loop_starts, loop_totals)
+    vert_ids = loop_verts[vert_loops]
+
+    # smooth polygons use vertex normals, flat polygons use the face normal
+    normals = np.where(smooth[vert_polys, np.newaxis], vert_normals[vert_ids], poly_normals[vert_polys])
+
+    wo3_verts = np.empty((vert_cnt, 8), dtype=np.float32)
+    wo3_verts[:, 0:3] = positions[vert_ids]
+    wo3_verts[:, 3:6] = normals
+    wo3_verts[:, 6:8] = loop_uvs[vert_loops]
+
+    # triangles and quads are split as a fan starting from the first vertex of the polygon
+    fan_polys = np.flatnonzero((loop_totals == 3) | (loop_totals == 4))
+    fan_tri_cnt = loop_totals[fan_polys] - 2
+    fan_tri_polys = np.repeat(fan_polys, fan_tri_cnt)
+    fan_tri_offsets = np.arange(len(fan_tri_polys)) - np.repeat(np.cumsum(fan_tri_cnt) - fan_tri_cnt, fan_tri_cnt)
+    fan_tri_bases = first_verts[fan_tri_polys]
+    fan_tris = np.stack((fan_tri_bases, fan_tri_bases + fan_tri_offsets + 1, fan_tri_bases + fan_tri_offsets + 2), axis=1)
+
+    # n-gons are triangulated by Blender
+    ngon_polys = loop_totals > 4
+    if ngon_polys.any():
+        loop_tri_num = len(mesh.loop_triangles)
+        loop_tri_loops = np.empty(loop_tri_num * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('loops', loop_tri_loops)
+        loop_tri_polys = np.empty(loop_tri_num, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('polygon_index', loop_tri_polys)
+
+        # mapping from loop index to the exported vertex index
+        loop_to_vert = np.empty(loop_num, dtype=np.int64)
+        loop_to_vert[vert_loops] = np.arange(vert_cnt)
+
+        ngon_tri_mask = ngon_polys[loop_tri_polys]
+        ngon_tri_polys = loop_tri_polys[ngon_tri_mask]
+        ngon_tris = loop_to_vert[loop_tri_loops.reshape(-1, 3)[ngon_tri_mask]]
+
+        # keep triangles in polygon order
+        tri_polys = np.concatenate((fan_tri_polys, ngon_tri_polys))
+        order = np.argsort(tri_polys, kind='stable')
+        tri_polys = tri_polys[order]
+        tris = np.concatenate((fan_tris, ngon_tris))[order]
+    else:
+        tri_polys = fan_tri_polys
+        tris = fan_tris
+
+    primitive_cnt = len(tris)
+    wo3_tris = np.empty((primitive_cnt, 4), dtype=np.int32)
+    wo3_tris[:, 0:3] = tris
+    wo3_tris[:, 3] = poly_matids[tri_polys]
+
+    def serialize_mesh(stream):
+        stream.serialize(bool(has_uv))
+        stream.serialize(LENFMT.pack(vert_cnt))
+        stream.serialize_floats(wo3_verts)
+        stream.serialize(LENFMT.pack(primitive_cnt))
+        stream.serialize_ints(wo3_tris)
+
+        # export smoke data if needed, this is for volumetric rendering
+        export_smoke(obj, stream)
+
+        stream.serialize(SID('end of mesh'))
+
+    # the scene file only refers to the cached mesh or the section of the mesh, which have exactly the same layout as an embedded one
+    cached_path = None
+    if cache_key is None:
+        section = fs.serialize_section(SID('mesh'), serialize_mesh)
+        if section is None:
+            fs.serialize(SID('MeshVisual'))
+            serialize_mesh(fs)
         else:
-            # no other primitive supported in mesh
-            # assert( False )
-            log("Warning, there is unsupported geometry. The exported scene may be incomplete.")
-
-    fs.serialize(SID('MeshVisual'))
-    fs.serialize(bool(has_uv))
-    fs.serialize(LENFMT.pack(vert_cnt))
-    fs.serialize(wo3_verts)
-    fs.serialize(LENFMT.pack(primitive_cnt))
-    fs.serialize(wo3_tris)
-
-    # export smoke data if needed, this is for volumetric rendering
-    export_smoke(obj, fs)
-
-    fs.serialize(SID('end of mesh'))
+            fs.serialize(SID('SectionMeshVisual'))
+            fs.serialize(section)
+    else:
+        cached_path = geometry_cache.store(cache_key, serialize_mesh)
+        fs.serialize(SID('CachedMeshVisual'))
+        fs.serialize(cached_path)
 
-    return (vert_cnt, primitive_cnt)
+    return (vert_cnt, primitive_cnt, cached_path)
 
 # export hair information
 def export_hair(ps, obj, scene, is_preview, fs):
-    LENFMT = struct.Struct('=i')
-    POINTFMT = struct.Struct('=fff')
+    # number of hair processed at a time, this bounds the temporary memory for dense grooms
+    HAIR_CHUNK_SIZE = 16384
 
-    vert_cnt = 0
     hair_step = ps.settings.display_step if is_preview else ps.settings.render_step
     width_tip = ps.settings.sort_data.fur_tip
     width_bottom = ps.settings.sort_data.fur_bottom
@@ -596,45 +982,60 @@ def export_hair(ps, obj, scene, is_preview, fs):
 
     # for some unknown reason
     steps = 2 ** hair_step
+    points_per_hair = steps + 1
 
-    verts = bytearray()
-
-    world2Local = obj.matrix_world.inverted()
+    world2Local = np.array(obj.matrix_world.inverted(), dtype=np.float32)
     num_parents = len( ps.particles )
     num_children = len( ps.child_particles )
 
     hair_cnt = num_parents + num_children
-    total_hair_segs = 0
 
-    real_hair_cnt = 0
-    for pindex in range(hair_cnt):
-        hair = []
-        for step in range(0, steps + 1):
-            co = ps.co_hair(obj, particle_no = pindex, step = step)
-
-            if co[0] == 0 and co[1] == 0 and co[2] == 0:
-                continue
+    # Blender only exposes the evaluated path of a hair point by point, children are interpolated from parents
+    # with clumping, kink and roughness, none of which is available through the Python API.
+    co_hair = ps.co_hair
+    def sample_hair(first, last):
+        coords = ( c for pindex in range(first, last) for step in range(points_per_hair) for c in co_hair(obj, particle_no = pindex, step = step) )
+        return np.fromiter(coords, dtype=np.float32, count=(last - first) * points_per_hair * 3).reshape(last - first, points_per_hair, 3)
 
-            co = world2Local @ co
-            hair.append( co )
-            vert_cnt += 1
-
-        if len(hair) <= 1:
-            continue
-
-        real_hair_cnt += 1
-
-        verts += LENFMT.pack( len(hair) - 1 )
-        for h in hair :
-            verts += POINTFMT.pack( h[0] , h[1] , h[2] )
-        total_hair_segs += len(hair) - 1
+    vert_cnt = 0
+    real_hair_cnt = 0
+    total_hair_segs = 0
+    chunks = []
+    for first in range(0, hair_cnt, HAIR_CHUNK_SIZE):
+        coords = sample_hair(first, min(first + HAIR_CHUNK_SIZE, hair_cnt))
+
+        # points at the origin are not valid, hair with less than two points left are skipped
+        valid_points = np.any(coords != 0.0, axis=2)
+        point_cnts = valid_points.sum(axis=1)
+        vert_cnt += int(point_cnts.sum())
+        valid_hair = point_cnts > 1
+        valid_points &= valid_hair[:, np.newaxis]
+        point_cnts = point_cnts[valid_hair]
+
+        points = coords[valid_points]
+        points = points @ world2Local[:3, :3].T + world2Local[:3, 3]
+
+        # each hair is its segment count followed by all of its points
+        record_sizes = 1 + 3 * point_cnts
+        record_starts = np.cumsum(record_sizes) - record_sizes
+        point_indices = np.arange(len(points)) - np.repeat(np.cumsum(point_cnts) - point_cnts, point_cnts)
+        point_offsets = np.repeat(record_starts + 1, point_cnts) + 3 * point_indices
+
+        chunk = np.empty(int(record_sizes.sum()), dtype=np.float32)
+        chunk.view(np.int32)[record_starts] = point_cnts - 1
+        chunk[point_offsets[:, np.newaxis] + np.arange(3)] = points
+        chunks.append(chunk)
+
+        real_hair_cnt += len(point_cnts)
+        total_hair_segs += int(point_cnts.sum()) - len(point_cnts)
 
     fs.serialize( SID('HairVisual') )
     fs.serialize( real_hair_cnt )
     fs.serialize( width_tip )
     fs.serialize( width_bottom )
     fs.serialize( mat_index )
-    fs.serialize( verts )
+    for chunk in chunks:
+        fs.serialize_array( chunk )
 
     return (vert_cnt, total_hair_segs)
 
@@ -713,7 +1114,11 @@ def collect_shader_resources(depsgraph, scene, fs):
         fs.serialize( resource[1] ) # external file name
 
 matname_to_id = {}
+# materials that need a per-mesh material proxy in the renderer, meshes using them can't be shared by instances
+matname_with_proxy = set()
 def export_materials(depsgraph, fs):
+    matname_with_proxy.clear()
+
     # if we are in no-material mode, just skip outputting all materials
     if depsgraph.scene.sort_data.allUseDefaultMaterial is True:
         fs.serialize( SID('End of Material') )
@@ -913,6 +1318,10 @@ def export_materials(depsgraph, fs):
         else:
             fs.serialize( SID('Invalid Volume Shader') )
 
+        # a material proxy is created for each mesh with sss or volume in the renderer
+        if has_sss_node or len(volume_shader_node_type) > 1:
+            matname_with_proxy.add(compact_material_name)
+
         # mark whether there is transparent support in the material, this is very important because it will affect performance eventually.
         fs.serialize( bool(has_transparent_node) )
         fs.serialize( bool(has_sss_node) )
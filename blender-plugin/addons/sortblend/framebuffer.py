@@ -0,0 +1,122 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+import os
+import numpy
+import tempfile
+
+# Beyond this number of separate dirty regions, all of them are merged into one so that refreshing the image in
+# Blender doesn't cost more than the tiles themselves.
+MAX_DIRTY_REGIONS = 16
+
+# Size of a pixel in the frame buffer, four float32 channels, RGBA.
+PIXEL_SIZE = 16
+
+# The full resolution image of a render. Tiles from SORT land here directly and the regions that have changed since
+# last refresh are tracked so that Blender only needs to be updated every now and then, no matter how many tiles arrive.
+# Pixels are in Blender's convention, the first row is the bottom of the image.
+# A shared frame buffer lives in a memory mapped file that SORT writes tiles to directly, only the position of each
+# tile is sent through socket then.
+class Framebuffer:
+    def __init__(self, width, height, shared = False):
+        self.width = width
+        self.height = height
+        self.path = None
+        if shared and width > 0 and height > 0:
+            self.path = create_shared_file(width * height * PIXEL_SIZE)
+        if self.path is not None:
+            self.pixels = numpy.memmap(self.path, dtype=numpy.float32, mode='r+', shape=(height, width, 4))
+        else:
+            self.pixels = numpy.zeros((height, width, 4), dtype=numpy.float32)
+        self.bytes = memoryview(self.pixels).cast('B')
+        self.dirty = []
+
+    # whether SORT writes pixels to the frame buffer directly
+    def is_shared(self):
+        return self.path is not None
+
+    # release the memory shared with SORT
+    def close(self):
+        if self.path is None:
+            return
+        self.bytes.release()
+        self.bytes = None
+        self.pixels = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self.path = None
+
+    # whether a tile, in the coordinate system of SORT, is inside the image
+    def contains(self, x, y, w, h):
+        return x >= 0 and y >= 0 and w >= 0 and h >= 0 and x + w <= self.width and y + h <= self.height
+
+    # memory of one row of a tile, rows of the tile go from bottom to top like the image itself
+    def row_view(self, x, y, w, h, row):
+        offset = ( ( self.height - y - h + row ) * self.width + x ) * PIXEL_SIZE
+        return self.bytes[offset : offset + w * PIXEL_SIZE]
+
+    # a region, in the coordinate system of SORT, has changed
+    def mark_dirty(self, x, y, w, h):
+        region = (x, self.height - y - h, x + w, self.height - y)
+
+        # keep merging as long as the merged region doesn't cover anything that is not dirty already
+        merged = True
+        while merged:
+            merged = False
+            for i, other in enumerate(self.dirty):
+                union = (min(region[0], other[0]), min(region[1], other[1]), max(region[2], other[2]), max(region[3], other[3]))
+                if area(union) <= area(region) + area(other) - overlap(region, other):
+                    region = union
+                    del self.dirty[i]
+                    merged = True
+                    break
+        self.dirty.append(region)
+
+        if len(self.dirty) > MAX_DIRTY_REGIONS:
+            self.dirty = [(min(r[0] for r in self.dirty), min(r[1] for r in self.dirty),
+                           max(r[2] for r in self.dirty), max(r[3] for r in self.dirty))]
+
+    def is_dirty(self):
+        return len(self.dirty) > 0
+
+    # regions changed since last time, as (x, y, w, h) in Blender's coordinate system
+    def take_dirty(self):
+        regions = [(r[0], r[1], r[2] - r[0], r[3] - r[1]) for r in self.dirty]
+        self.dirty = []
+        return regions
+
+def area(region):
+    return max(region[2] - region[0], 0) * max(region[3] - region[1], 0)
+
+def overlap(a, b):
+    return area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+# create a file to be shared with SORT, it lives in memory instead of on disk if possible
+def create_shared_file(size):
+    folder = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    try:
+        fd, path = tempfile.mkstemp(prefix='sort_framebuffer_', suffix='.bin', dir=folder)
+    except OSError:
+        return None
+    try:
+        os.ftruncate(fd, size)
+    except OSError:
+        os.close(fd)
+        os.remove(path)
+        return None
+    os.close(fd)
+    return path
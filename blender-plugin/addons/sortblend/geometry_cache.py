@@ -0,0 +1,150 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+
+import bpy
+import os
+import hashlib
+import tempfile
+import numpy as np
+from .log import log
+from .stream import stream
+
+# Persistent on-disk geometry cache shared across renders.
+#
+# Each mesh is stored in its own file named after a content hash of its evaluated data. Exporting a scene that
+# hasn't changed only needs to pull the data out of Blender to compute the hash, the heavy part of building and
+# writing the vertex/index buffers is skipped and the scene file simply refers to the cached file. Files are
+# evicted in least recently used order once the total size of the cache exceeds the budget in preferences.
+
+# bump this whenever the layout of the cached mesh data changes so that stale files are never picked up
+CACHE_VERSION = b'1'
+CACHE_FILE_EXT = '.mesh'
+
+# statistics of the current Blender session, they are displayed in add-on preferences
+cache_hits = 0
+cache_misses = 0
+cache_size = 0
+
+# whether the cache is used by the current export and the files it refers to
+cache_enabled = False
+referenced_files = set()
+
+def get_preferences():
+    return bpy.context.preferences.addons['sortblend'].preferences
+
+def get_cache_dir():
+    cache_dir = get_preferences().geometry_cache_path
+    if cache_dir:
+        return os.path.expanduser(cache_dir)
+    return os.path.join(tempfile.gettempdir(), 'sort_geometry_cache')
+
+# start an export, the cache is never used for debug scenes since they are supposed to be self-contained
+def begin_export(enabled):
+    global cache_enabled
+    cache_enabled = enabled and get_preferences().geometry_cache_enabled
+    referenced_files.clear()
+    if cache_enabled:
+        os.makedirs(get_cache_dir(), exist_ok=True)
+
+# finish an export, this is where the cache gets trimmed down to its budget
+def end_export():
+    if cache_enabled:
+        evict(get_preferences().geometry_cache_size * 1024 * 1024)
+        log('Geometry cache hits: %d, misses: %d, size: %.2f(MB).' % (cache_hits, cache_misses, cache_size / (1024 * 1024)))
+
+def is_enabled():
+    return cache_enabled
+
+# hash a list of numpy arrays, the shape and type of each array is part of the hash too
+def hash_arrays(arrays):
+    hasher = hashlib.blake2b(CACHE_VERSION, digest_size=20)
+    for array in arrays:
+        hasher.update(str((array.dtype.str, array.shape)).encode())
+        hasher.update(memoryview(np.ascontiguousarray(array)).cast('B'))
+    return hasher.hexdigest()
+
+# look up the cached file of a key, None is returned for a cache miss
+def lookup(key):
+    global cache_hits, cache_misses
+    path = os.path.join(get_cache_dir(), key + CACHE_FILE_EXT)
+    try:
+        # touching the file keeps it from being evicted as the least recently used one
+        os.utime(path)
+    except OSError:
+        cache_misses += 1
+        return None
+    cache_hits += 1
+    referenced_files.add(path)
+    return path
+
+# keep using a cached file without looking it up by its key, False is returned if the file is evicted already
+def reference(path):
+    global cache_hits
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    cache_hits += 1
+    referenced_files.add(path)
+    return True
+
+# store the data of a key in the cache, 'serialize' is the function that writes data to the given stream
+def store(key, serialize):
+    path = os.path.join(get_cache_dir(), key + CACHE_FILE_EXT)
+
+    # write to a temporary file first so that a partially written file is never visible to other renders
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    fs = stream.FileStream(tmp_path)
+    serialize(fs)
+    fs.close()
+    os.replace(tmp_path, path)
+
+    referenced_files.add(path)
+    return path
+
+# evict least recently used files until the total size is within the budget, files used by the current export are kept
+def evict(budget):
+    global cache_size
+    entries = []
+    for entry in os.scandir(get_cache_dir()):
+        if entry.is_file() and entry.name.endswith(CACHE_FILE_EXT):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if cache_size <= budget:
+            break
+        if path in referenced_files:
+            continue
+        try:
+            os.remove(path)
+            cache_size -= size
+        except OSError:
+            pass
+
+# remove everything in the cache
+def clear():
+    global cache_size
+    cache_dir = get_cache_dir()
+    if os.path.exists(cache_dir):
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_EXT):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    cache_size = 0
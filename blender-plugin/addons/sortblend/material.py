@@ -3025,14 +3025,9 @@ class SORTNodeVolumeColor(SORTShadingNode):
     bl_label = 'Volume Color'
     bl_idname = 'SORTNodeVolumeColor'
     osl_shader = '''
-        /*
-        This node is not even supported for now, I don't have a plan to support it in the near future though.
-        texture3d g_density
-        shader VolumeDensity( out float Result = 0.0 ){
-            vector uvw = global_value<local_position>;
-            Result = texture2d_sample<g_density>( uvw.x, uvw.y, uvw.z );
+        shader VolumeColor( out color Result ){
+            Result = global_value<volume_color>;
         }
-        */
     '''
     def init(self, context):
         self.outputs.new( 'SORTNodeSocketColor' , 'Result' )
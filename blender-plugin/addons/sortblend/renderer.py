@@ -14,81 +14,18 @@
 #    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
 
 import bpy
+import bgl
 import os
-import subprocess
 import math
-import numpy
 import shutil
-import time
-import threading
-import socket
-import platform
-from .log import log, logD
+from .log import logD
 from . import base
 from . import exporter
-
-# this thread runs forever
-def dipslay_update(sock, render_engine):
-    # we only wait for 5 seconds before bail
-    time_out = 5.0
-    time_start = time.time()
-    while True:
-        try:
-            connection, _ = sock.accept()
-            break
-        except:
-            time_stop = time.time()
-            if time_stop - time_start > time_out:
-                log('Can not accept connection!')
-                return
-            pass
-
-    while render_engine.terminating_display_thread is False:
-        try:
-            header_bytes = connection.recv(4)
-            if header_bytes == b'':
-                break
-            
-            pkg_length = int.from_bytes(header_bytes, "little")
-            header = connection.recv(16)
-            if header == b'':
-                log('[header] socket error.')
-                break
-
-            # update a proportion of the image
-            tile_width  = int.from_bytes(header[0:3], "little")
-            tile_height = int.from_bytes(header[4:7], "little")
-            offset_x    = int.from_bytes(header[8:11], "little")
-            offset_y    = int.from_bytes(header[12:15], "little")
-
-            # receive the pixel data
-            length_to_read = pkg_length - 16
-            pixels = connection.recv(length_to_read, socket.MSG_WAITALL)
-            if len(pixels) != length_to_read:
-                log('[pixel data] socket error.')
-                break
-
-            # convert binary to two dimensional array
-            tile_data = numpy.fromstring(pixels, dtype=numpy.float32)
-            tile_rect = tile_data.reshape( ( ( tile_width * tile_height ) , 4 ) )
-
-            # begin result
-            result = render_engine.begin_result(offset_x, render_engine.image_size_h - offset_y - tile_height, tile_width, tile_height)
-
-            # update image memmory
-            if result is not None:
-                result.layers[0].passes[0].rect = tile_rect
-
-                # refresh the update
-                render_engine.end_result(result)
-
-        except socket.error as e:
-            log('socket error\t ')
-            log(e)
-            break
-    
-    log('Socket disconnected from SORT.')
-    connection.close()
+from .supervisor import RenderSupervisor
+from .framebuffer import Framebuffer
+from .workers import TileScheduler, worker_commands, WHOLE_IMAGE_INTEGRATORS
+from .daemon import render_daemon
+from .viewport import ViewportCamera, ViewportRender, ViewportImage, render_settings_key, has_visible_updates
 
 @base.register_class
 class SORTRenderEngine(bpy.types.RenderEngine):
@@ -98,13 +35,8 @@ class SORTRenderEngine(bpy.types.RenderEngine):
     bl_label = 'SORT'
     bl_use_preview = False  # disable material preview until it works
 
-    # Socket to listen so that SORT can talk to Blender
+    # SORT talks to Blender through a socket bound to an ephemeral port, each render has its own
     ip_addr     = '127.0.0.1'
-    port        = 2009 # just a random port
-
-    sock        = None
-    display_thread = None
-    terminating_display_thread = False
 
     @classmethod
     def is_active(cls, context):
@@ -112,39 +44,16 @@ class SORTRenderEngine(bpy.types.RenderEngine):
 
     def __init__(self):
         self.sort_available = True
-        
-        self.image_size_w = int(bpy.data.scenes[0].render.resolution_x * bpy.data.scenes[0].render.resolution_percentage / 100)
-        self.image_size_h = int(bpy.data.scenes[0].render.resolution_y * bpy.data.scenes[0].render.resolution_percentage / 100)
-
-        # create the socket
-        if self.sock is None:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-            # non blocking socket
-            self.sock.setblocking(False)
-
-            # bind the socket
-            value = socket.SO_EXCLUSIVEADDRUSE if platform.system() == 'Windows' else socket.SO_REUSEADDR
-            self.sock.setsockopt(socket.SOL_SOCKET, value, 1)
+        self.supervisor = None
+        self.intermediate_dir = None
+        self.viewport = None
+        self.viewport_key = None
+        self.viewport_settings_key = None
+        self.viewport_image = None
 
-            time_out = 5.0
-            time_start = time.time()
-            while True:
-                try:
-                    self.sock.bind((self.ip_addr, self.port))
-                    break
-                except:
-                    time_stop = time.time()
-                    if time_stop - time_start > time_out:
-                        log('Can not bind the socket!')
-                        return
-                    pass
-
-            # listen for socket connection
-            self.sock.settimeout(5)
-            self.sock.listen()
-
-            log("Listening address and port:\t {ip}:{p}".format(ip=self.ip_addr, p=self.port))
+    def __del__(self):
+        if self.viewport is not None:
+            self.viewport.cancel()
 
     # update frame
     def update(self, data, depsgraph):
@@ -163,8 +72,31 @@ class SORTRenderEngine(bpy.types.RenderEngine):
         if not self.sort_available:
             return
 
+        # the scene is streamed to SORT once it is launched, there is nothing to export here
+        if self.stream_scene() and self.render_workers(depsgraph.scene) == 1:
+            return
+
         # export the scene
         exporter.export_blender(depsgraph)
+        self.intermediate_dir = exporter.get_intermediate_dir()
+
+    # whether the scene is streamed through socket instead of being written to a file
+    def stream_scene(self):
+        return bpy.context.preferences.addons['sortblend'].preferences.stream_scene
+
+    # whether pixels are shared with SORT through memory instead of socket
+    def shared_memory_display(self):
+        return bpy.context.preferences.addons['sortblend'].preferences.shared_memory_display
+
+    # whether SORT keeps running between renders
+    def use_render_daemon(self):
+        return bpy.context.preferences.addons['sortblend'].preferences.render_daemon
+
+    # number of SORT processes rendering the image together, progressive passes cover the whole image in one process
+    def render_workers(self, scene):
+        if scene.sort_data.integrator_type_prop in WHOLE_IMAGE_INTEGRATORS or exporter.get_progressive_arguments(scene):
+            return 1
+        return bpy.context.preferences.addons['sortblend'].preferences.render_workers
 
     # render
     def render(self, depsgraph):
@@ -172,48 +104,145 @@ class SORTRenderEngine(bpy.types.RenderEngine):
             return
 
         scene = depsgraph.scene
+        # only the region inside the render border is rendered and displayed
+        border = exporter.get_render_border(scene)
+        self.image_size_w, self.image_size_h = border[2:]
 
         # start rendering process first
         binary_dir = exporter.get_sort_dir()
         binary_path = exporter.get_sort_bin_path()
-        intermediate_dir = exporter.get_intermediate_dir()
+        render_workers = self.render_workers(scene)
+
+        # every worker reads the same exported file, the scene can't be streamed to all of them
+        stream_scene = self.stream_scene() and render_workers == 1
+
+        # SORT writes pixels to the frame buffer directly if it can be shared, otherwise pixels go through the socket
+        framebuffer = Framebuffer(self.image_size_w, self.image_size_h, self.shared_memory_display())
+        self.supervisor = RenderSupervisor(self, self.ip_addr, framebuffer)
+        server = self.ip_addr + ":" + str(self.supervisor.port)
+        logD("Listening address and port:\t " + server)
 
         # execute binary
         cmd_argument = [binary_path];
-        cmd_argument.append( '--input:' + intermediate_dir + 'scene.sort')
-        cmd_argument.append( "--displayserver:" + self.ip_addr + ":" + str(self.port))
+        if stream_scene:
+            cmd_argument.append( "--inputserver:" + server )
+        else:
+            cmd_argument.append( '--input:' + self.intermediate_dir + 'scene.sort')
+        cmd_argument.append( "--displayserver:" + server )
         cmd_argument.append( '--blendermode' )
         if scene.sort_data.profilingEnabled is True:
             cmd_argument.append( '--profiling:on' )
         if scene.sort_data.allUseDefaultMaterial is True:
             cmd_argument.append( '--noMaterial' )
-        process = subprocess.Popen(cmd_argument,cwd=binary_dir)
-
-        # start a background pool thread
-        self.display_thread = threading.Thread(target=dipslay_update, args=(self.sock, self))
-        self.display_thread.start()
+        if framebuffer.is_shared():
+            cmd_argument.append( '--displaymemory:' + framebuffer.path )
+        cmd_argument += exporter.get_progressive_arguments(scene)
 
-        # wait for the process to finish
-        while subprocess.Popen.poll(process) is None:
-            if self.test_break():
-                break
-
-        # terminate the process by force
-        if subprocess.Popen.poll(process) is None:
-            # indiate to terminate the thread since the exe is about to be terminated
-            self.terminating_display_thread = True
+        try:
+            if render_workers > 1:
+                # workers take tiles from the same tile server and send them to the same display server
+                scheduler = TileScheduler(border, render_workers)
+                tile_server = self.ip_addr + ":" + str(self.supervisor.serve_tiles(scheduler))
+                launcher = bpy.context.preferences.addons['sortblend'].preferences.worker_launcher
+                for command in worker_commands(cmd_argument, render_workers, launcher, tile_server):
+                    self.supervisor.launch(command, binary_dir)
+            elif not self.use_render_daemon() or not self.supervisor.submit(render_daemon, cmd_argument, binary_dir):
+                self.supervisor.launch(cmd_argument, binary_dir)
+
+            # SORT connects for the scene before anything else, the display server connection comes a bit later.
+            # The scene is parsed by SORT while it is still being exported.
+            if stream_scene:
+                connection = self.supervisor.accept(5.0)
+                if connection is None:
+                    return
+                try:
+                    exporter.export_blender(depsgraph, connection=connection)
+                except Exception as exc:
+                    self.report({'ERROR'},'Failed to stream scene to SORT: %s' % exc)
+                    return
+                finally:
+                    self.intermediate_dir = exporter.get_intermediate_dir()
+
+            # sleep until SORT finishes or the render is cancelled, tiles are displayed as they arrive
+            self.supervisor.run()
+        finally:
+            # terminates SORT if it is still running
+            self.supervisor.close()
+            self.supervisor = None
+
+            # clear immediate directory
+            if self.intermediate_dir is not None:
+                try:
+                    shutil.rmtree(self.intermediate_dir)
+                except:
+                    print('Failed to delete the temp folder')
+                self.intermediate_dir = None
+
+    # update a proportion of the image
+    def update_result(self, offset_x, offset_y, width, height, pixels):
+        result = self.begin_result(offset_x, offset_y, width, height)
+
+        # update image memmory
+        if result is not None:
+            result.layers[0].passes[0].rect = pixels.reshape( ( ( width * height ) , 4 ) )
+
+            # refresh the update
+            self.end_result(result)
+
+    # the scene has changed, the viewport is rendered again only if the change is visible in it
+    def view_update(self, context, depsgraph):
+        view = ViewportCamera(context)
+        if self.viewport is not None and not has_visible_updates(depsgraph) \
+            and render_settings_key(depsgraph.scene) == self.viewport_settings_key:
+            # moving a camera only changes the view, the running render goes on with it if possible
+            if view.key == self.viewport_key or self.viewport.update_view(depsgraph.scene, view):
+                self.viewport_key = view.key
+                return
+        self.restart_viewport(depsgraph, view)
+
+    # draw whatever is rendered so far, the running render goes on with a new view if it can take one
+    def view_draw(self, context, depsgraph):
+        view = ViewportCamera(context)
+        if view.key != self.viewport_key:
+            if self.viewport is not None and self.viewport.update_view(depsgraph.scene, view):
+                self.viewport_key = view.key
+            else:
+                # exporting the scene takes far too long for drawing, it is done in view_update instead
+                self.tag_update()
+        if self.viewport is None:
+            return
 
-            # wait for the thread to be terminated before moving forward
-            self.display_thread.join()
+        pixels, dirty = self.viewport.take_image()
+        if pixels is None:
+            return
+        if self.viewport_image is None:
+            self.viewport_image = ViewportImage()
+        self.viewport_image.update(pixels, dirty)
+
+        bgl.glEnable(bgl.GL_BLEND)
+        bgl.glBlendFunc(bgl.GL_ONE, bgl.GL_ONE_MINUS_SRC_ALPHA)
+        self.bind_display_space_shader(depsgraph.scene)
+        self.viewport_image.draw(context.region.width, context.region.height)
+        self.unbind_display_space_shader()
+        bgl.glDisable(bgl.GL_BLEND)
+
+    # cancel the current viewport render and start a new one, the scene is exported for the view
+    def restart_viewport(self, depsgraph, view):
+        self.viewport_key = view.key
+        self.viewport_settings_key = render_settings_key(depsgraph.scene)
+        last_pixels = None
+        if self.viewport is not None:
+            last_pixels = self.viewport.latest_image()
+            self.viewport.cancel()
+            self.viewport = None
 
-            # terminate the process
-            subprocess.Popen.terminate(process)
-        else:
-            # wait for the thread to be terminated before moving forward
-            self.display_thread.join()
+        binary_path = exporter.get_sort_bin_path()
+        if binary_path is None or not os.path.exists(binary_path):
+            return
 
-        # clear immediate directory
-        try:
-            shutil.rmtree(intermediate_dir)
-        except:
-            print('Failed to delete the temp folder')
+        exporter.export_blender(depsgraph, view=view)
+        settings = ( binary_path , exporter.get_sort_dir() , self.shared_memory_display() ,
+                     render_daemon if self.use_render_daemon() else None , exporter.get_progressive_arguments(depsgraph.scene) )
+        # integrators rendering the whole image at once are not progressive, they are restarted for every view
+        interactive = depsgraph.scene.sort_data.integrator_type_prop not in WHOLE_IMAGE_INTEGRATORS
+        self.viewport = ViewportRender(self, settings, exporter.get_intermediate_dir(), view, interactive, last_pixels)
@@ -13,50 +13,276 @@
 #    You should have received a copy of the GNU General Public License along with
 #    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
 
-import bpy
 import struct
+import socket
+import numpy as np
+from ..strid import SID
 
+# Encoding of the basic types supported by the stream.
+# The type of a value is looked up in this table directly instead of comparing type names, notice that 'bool'
+# has to be an exact match since it is also a sub-class of 'int'.
+TYPE_FORMATS = {
+    float       : 'f',
+    np.float32  : 'f',
+    np.float64  : 'f',
+    int         : 'I',
+    np.int32    : 'I',
+    np.uint32   : 'I',
+    np.int64    : 'I',
+    bool        : '?',
+    np.bool_    : '?',
+}
+SCALAR_STRUCTS = { t : struct.Struct( '=' + f ) for t, f in TYPE_FORMATS.items() }
+
+# Raw bytes of a numpy array, memoryview or any other object supporting the buffer protocol.
+# Arrays are flattened first since empty multi-dimensional arrays can't be cast to bytes directly.
+def byte_view(data):
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data).reshape(-1)
+    return memoryview(data).cast('B')
+
+# Base class of all streams.
+#
+# Data is encoded here and handed to 'write' as raw bytes, derived classes decide where the bytes go.
 class Stream():
     def __init__(self):
+        self.tuple_structs = {}
+
+    # Append raw bytes to the stream
+    def write(self, data):
         pass
 
     # Serialize data
     def serialize(self,data):
-        pass
+        data_type = type(data)
+        scalar_struct = SCALAR_STRUCTS.get(data_type)
+        if scalar_struct is not None:
+            self.write(scalar_struct.pack(data))
+        elif data_type is bytes or data_type is bytearray or data_type is memoryview:
+            self.serialize_array(data)
+        elif data_type is str:
+            self.write(data.encode('ascii'))
+            self.write(b'\0')
+        elif data_type is tuple:
+            # tuples with the same element types share one pre-compiled struct
+            types = tuple( type(d) for d in data )
+            tuple_struct = self.tuple_structs.get(types)
+            if tuple_struct is None:
+                tuple_struct = struct.Struct( '=' + ''.join( TYPE_FORMATS.get(t, '') for t in types ) )
+                self.tuple_structs[types] = tuple_struct
+            self.write(tuple_struct.pack(*( d for d in data if type(d) in TYPE_FORMATS )))
+        elif data_type is np.ndarray:
+            self.serialize_array(data)
+
+    # Serialize an array of 32 bit floats, it accepts anything that can be converted to a numpy array
+    def serialize_floats(self, data):
+        self.serialize_array(np.ascontiguousarray(data, dtype=np.float32))
+
+    # Serialize an array of 32 bit integers, it accepts anything that can be converted to a numpy array
+    def serialize_ints(self, data):
+        self.serialize_array(np.ascontiguousarray(data, dtype=np.int32))
+
+    # Serialize raw memory of a numpy array, memoryview or any other object supporting the buffer protocol
+    def serialize_array(self, data):
+        self.write(byte_view(data))
+
+    # Serialize data into a separate section of the stream by calling 'serialize' with the stream.
+    # It returns the index of the section, streams without sections return None without serializing anything.
+    def serialize_section(self, section_type, serialize):
+        return None
 
 # File stream will serialize data into a file.
+#
+# Data is accumulated in an in-memory buffer and only gets written to the file when it is explicitly flushed,
+# closed or the buffer grows beyond 'buffer_size'. Large arrays bypass the buffer and are handed to the file
+# directly without any extra copy.
 class FileStream(Stream):
+    # Default size of the write buffer, 16MB
+    DEFAULT_BUFFER_SIZE = 16 * 1024 * 1024
+
     # Open a file by default
-    def __init__(self,filename):
+    def __init__(self, filename, buffer_size = DEFAULT_BUFFER_SIZE):
+        super().__init__()
+        self.file = None
         self.file = open( filename , 'wb' )
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
 
     # Make sure we close the file
     def __del__(self):
+        self.close()
+
+    # Write everything in the buffer to the file
+    def flush(self):
+        if self.file is None:
+            return
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
         self.file.flush()
+
+    # Flush the buffer and close the file
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
         self.file.close()
+        self.file = None
+
+    # Append raw bytes to the stream
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Serialize raw memory of a numpy array, memoryview or any other object supporting the buffer protocol
+    def serialize_array(self, data):
+        view = byte_view(data)
+        if len(view) < self.buffer_size:
+            self.write(view)
+        else:
+            # there is no need to copy big chunk of data into the buffer
+            self.flush()
+            self.file.write(view)
+
+# Sectioned file stream will serialize data into a file organized in sections.
+#
+# The file starts with a header pointing to a table of sections at the end of the file, each entry of the table has
+# the type, offset and size of a section. Sections are written to the file as soon as they are serialized, while
+# everything else goes to the main section, which is kept in memory and written to the file when it is closed. The
+# renderer memory maps the file and loads sections, like meshes, on worker threads in parallel.
+class SectionedFileStream(FileStream):
+    MAGIC = b'SORTSCN\0'
+    VERSION = 0
+    HEADER = struct.Struct('=8sIIQ')
+    SECTION_ENTRY = struct.Struct('=IQQ')
+
+    def __init__(self, filename, buffer_size = FileStream.DEFAULT_BUFFER_SIZE):
+        super().__init__(filename, buffer_size)
+        self.scene = bytearray()
+        self.sections = []
+        self.in_section = False
+
+        # the header is only valid after the file is closed
+        super().write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, 0))
+
+    # Current position in the file
+    def tell(self):
+        return self.file.tell() + len(self.buffer)
+
+    # Append the main section and the table of sections, then fill the header
+    def close(self):
+        if self.file is None:
+            return
+        self.append_section(SID('scene'), lambda fs : fs.write(self.scene))
 
+        table_offset = self.tell()
+        for section in self.sections:
+            super().write(self.SECTION_ENTRY.pack(*section))
+        self.flush()
+
+        self.file.seek(0)
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(self.sections), table_offset))
+        super().close()
+
+    # Append raw bytes to the stream
+    def write(self, data):
+        if self.in_section:
+            super().write(data)
+        else:
+            self.scene += data
+
+    # Serialize raw memory of a numpy array, memoryview or any other object supporting the buffer protocol
+    def serialize_array(self, data):
+        if self.in_section:
+            super().serialize_array(data)
+        else:
+            Stream.serialize_array(self, data)
+
+    # Serialize data into a separate section of the file
+    def serialize_section(self, section_type, serialize):
+        if self.in_section:
+            return None
+        return self.append_section(section_type, serialize)
+
+    def append_section(self, section_type, serialize):
+        offset = self.tell()
+        self.in_section = True
+        try:
+            serialize(self)
+        finally:
+            self.in_section = False
+        self.sections.append((section_type, offset, self.tell() - offset))
+        return len(self.sections) - 1
+
+# Socket stream will serialize data through a connected socket.
+#
+# The renderer parses the scene as soon as data arrives, so the buffer is much smaller than the one of FileStream
+# so that the renderer can work on the first part of the scene while the rest is still being exported. Closing
+# the stream shuts down the sending side of the connection so that the renderer knows nothing more is coming.
+class SocketStream(Stream):
+    # Default size of the send buffer, 1MB
+    DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+    # Take over a connected socket
+    def __init__(self, connection, buffer_size = DEFAULT_BUFFER_SIZE):
+        super().__init__()
+        self.connection = connection
+        self.connection.setblocking(True)
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+
+    # Make sure we close the connection
+    def __del__(self):
+        self.close()
+
+    # Send everything in the buffer through the socket
     def flush(self):
-        self.file.flush()
+        if self.connection is None:
+            return
+        if self.buffer:
+            self.connection.sendall(self.buffer)
+            self.buffer.clear()
 
-    # Serialize data
-    def serialize(self,data):
-        def serialize_type(data):
-            if type(data).__name__ == 'float' or type(data).__name__ == 'float64':
-                self.file.write(struct.pack( 'f' , data ) )
-            elif type(data).__name__ == 'int':
-                self.file.write(struct.pack( 'I' , data ))
-            elif type(data).__name__ == 'bool':
-                self.file.write(struct.pack( '?' , data ) )
-
-        if type(data).__name__ == 'bytes' or type(data).__name__ == 'bytearray':
-            self.file.write(data)
-        elif type(data).__name__ == 'str' :
-            self.file.write(data.encode('ascii'))
-            end = 0
-            self.file.write(end.to_bytes(1, byteorder='little'))
-        elif type(data).__name__ == 'tuple':
-            for d in data:
-                serialize_type(d)
+    # Flush the buffer and close the connection
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.flush()
+            self.connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            # the renderer could be gone already, there is nothing to do about it
+            pass
+        self.connection.close()
+        self.connection = None
+
+    # Append raw bytes to the stream
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Serialize raw memory of a numpy array, memoryview or any other object supporting the buffer protocol
+    def serialize_array(self, data):
+        view = byte_view(data)
+        if len(view) < self.buffer_size:
+            self.write(view)
         else:
-            serialize_type(data)
-        self.file.flush()
+            # there is no need to copy big chunk of data into the buffer
+            self.flush()
+            self.connection.sendall(view)
+
+# Memory stream will serialize data into an in-memory buffer, which is useful to keep serialized data for later reuse.
+class MemoryStream(Stream):
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+
+    # Append raw bytes to the stream
+    def write(self, data):
+        self.buffer += data
+
+    # Get all serialized data
+    def getvalue(self):
+        return bytes(self.buffer)
@@ -0,0 +1,434 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+import os
+import time
+import socket
+import struct
+import platform
+import selectors
+import threading
+import subprocess
+from .log import log
+from .workers import TileConnection
+
+# The longest time the supervisor sleeps without checking whether the user has cancelled the render.
+# Blender only exposes cancellation through polling 'test_break', this is the latency of cancelling a render.
+BREAK_POLL_INTERVAL = 0.1
+
+# How long a render process has to quit after being asked before it is killed.
+TERMINATE_TIME_OUT = 5.0
+
+# Blender is refreshed at most this many times per second, no matter how fast tiles arrive.
+DISPLAY_REFRESH_RATE = 10.0
+
+# Tile packets sent by SORT in blender mode start with the size of the rest of the packet, followed by the
+# size and offset of the tile. Pixels, four float32 per pixel, follow the header.
+TILE_HEADER = struct.Struct('<5i')
+
+# A connection to the display server of SORT. Pixels are received straight into the frame buffer, one row of a tile
+# at a time, there is no temporary copy of any tile. Views of an interactive render go the other way, they are sent
+# whenever the socket is writable.
+class DisplayConnection:
+    def __init__(self, connection, framebuffer):
+        self.connection = connection
+        self.framebuffer = framebuffer
+        self.header = bytearray(TILE_HEADER.size)
+        self.received = 0
+        self.tile = None
+        self.row = 0
+        self.outgoing = bytearray()
+
+    # queue data to be sent to SORT and send as much of it as possible, returns False once the connection is broken
+    def send(self, data):
+        self.outgoing += data
+        return self.flush()
+
+    # send as much of the queued data as possible without blocking, returns False once the connection is broken
+    def flush(self):
+        try:
+            while self.outgoing:
+                cnt = self.connection.send(self.outgoing)
+                del self.outgoing[:cnt]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            log('socket error\t ')
+            log(str(e))
+            return False
+        return True
+
+    # the selector events the connection waits for, writing only matters while there is anything left to send
+    def events(self):
+        return selectors.EVENT_READ | selectors.EVENT_WRITE if self.outgoing else selectors.EVENT_READ
+
+    # read whatever is available, returns False once the connection is closed
+    def on_readable(self):
+        try:
+            while True:
+                if self.tile is None:
+                    cnt = self.connection.recv_into(memoryview(self.header)[self.received:])
+                else:
+                    cnt = self.connection.recv_into(self.target()[self.received:])
+                if cnt == 0:
+                    return False
+                self.received += cnt
+                if not self.advance():
+                    return False
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError as e:
+            log('socket error\t ')
+            log(str(e))
+            return False
+
+    # memory of the row that is being received
+    def target(self):
+        x, y, w, h = self.tile
+        return self.framebuffer.row_view(x, y, w, h, self.row)
+
+    # move on to the next row or tile once the current one is received, returns False if the packet makes no sense
+    def advance(self):
+        if self.tile is None:
+            if self.received < TILE_HEADER.size:
+                return True
+            pkg_length, w, h, x, y = TILE_HEADER.unpack(self.header)
+
+            # a tile without pixels means the pixels are already in the shared frame buffer
+            in_framebuffer = pkg_length == TILE_HEADER.size - 4 and self.framebuffer.is_shared()
+            pixel_size = 0 if in_framebuffer else w * h * 16
+            if pkg_length != TILE_HEADER.size - 4 + pixel_size or not self.framebuffer.contains(x, y, w, h):
+                log('Invalid tile from SORT, x: %d, y: %d, width: %d, height: %d.' % (x, y, w, h))
+                return False
+            self.tile = (x, y, w, h)
+            self.row = h if in_framebuffer or w == 0 else 0
+        elif self.received < self.tile[2] * 16:
+            return True
+        else:
+            self.row += 1
+
+        self.received = 0
+        if self.row == self.tile[3]:
+            self.framebuffer.mark_dirty(*self.tile)
+            self.tile = None
+        return True
+
+    def close(self):
+        self.connection.close()
+
+# The supervisor owns a SORT process and everything it talks to. Instead of spinning on the process and sockets, it
+# sleeps on a selector that wakes up when SORT connects, sends a tile, quits or when the render is cancelled.
+class RenderSupervisor:
+    def __init__(self, render_engine, ip_addr, framebuffer):
+        self.render_engine = render_engine
+        self.framebuffer = framebuffer
+        self.last_refresh = 0.0
+
+        # the operating system picks a free port, renders never fight for a port no matter how many of them are running
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind((ip_addr, 0))
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.selector = selectors.DefaultSelector()
+        self.processes = []
+        self.exit_pipes = []
+        self.scheduler = None
+        self.tile_listener = None
+        self.tile_connections = []
+        self.tile_worker_cnt = 0
+        self.daemon = None
+        self.job_done = False
+        self.pending_connections = []
+        self.display_connections = []
+        self.cancelled = False
+
+        # the latest view waiting to be sent to SORT, it is only sent once SORT connects to the display server
+        self.view_lock = threading.Lock()
+        self.pending_view = None
+
+        # anyone can cancel the render through this socket pair, even from a different thread
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.wakeup_recv.setblocking(False)
+        self.wakeup_send.setblocking(False)
+        self.selector.register(self.wakeup_recv, selectors.EVENT_READ, self.on_wakeup)
+        self.selector.register(self.listener, selectors.EVENT_READ, self.on_accept)
+
+    # launch SORT, an image can be rendered by several processes if they share a tile server
+    def launch(self, cmd_argument, cwd):
+        if platform.system() == 'Windows':
+            # there is no way to wait on a process handle through select on Windows, the process is polled instead
+            process = subprocess.Popen(cmd_argument, cwd=cwd)
+            self.processes.append(process)
+            return process
+
+        # SORT inherits the write end of the pipe, the read end reports end of file once SORT quits no matter how.
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(cmd_argument, cwd=cwd, pass_fds=(write_fd,))
+        finally:
+            os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        self.processes.append(process)
+        self.exit_pipes.append(read_fd)
+        self.selector.register(read_fd, selectors.EVENT_READ, lambda: self.on_process_exit(read_fd))
+        return process
+
+    # hand out tiles to SORT processes sharing the image, returns the port of the tile server
+    def serve_tiles(self, scheduler):
+        self.scheduler = scheduler
+        self.tile_listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tile_listener.bind((self.listener.getsockname()[0], 0))
+        self.tile_listener.listen()
+        self.tile_listener.setblocking(False)
+        self.selector.register(self.tile_listener, selectors.EVENT_READ, self.on_accept_tile_connection)
+        return self.tile_listener.getsockname()[1]
+
+    # hand the render over to a render daemon instead of launching SORT, returns False if the daemon is not available
+    def submit(self, daemon, cmd_argument, cwd):
+        if not daemon.acquire():
+            return False
+        if not daemon.start(cmd_argument[0], cwd, self.listener.getsockname()[0]):
+            daemon.release()
+            return False
+        self.daemon = daemon
+        self.job_done = False
+        daemon.submit(cmd_argument[1:])
+        self.selector.register(daemon.connection, selectors.EVENT_READ, self.on_job_done)
+        return True
+
+    # whether the render process is still running
+    def is_running(self):
+        if self.daemon is not None:
+            return not self.job_done
+        return any(process.poll() is None for process in self.processes)
+
+    # cancel the render, this is safe to call from any thread
+    def cancel(self):
+        self.cancelled = True
+        self.wakeup()
+
+    # send a view to the display server of SORT, a view not sent yet is replaced. This is safe to call from any thread.
+    def send_view(self, packet):
+        with self.view_lock:
+            self.pending_view = packet
+        self.wakeup()
+
+    # wake up the selector from any thread
+    def wakeup(self):
+        try:
+            self.wakeup_send.send(b'\0')
+        except OSError:
+            pass
+
+    # wait for SORT to connect, returns None if it quits, the render is cancelled or it doesn't connect in time
+    def accept(self, time_out):
+        deadline = time.monotonic() + time_out
+        while not self.pending_connections:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0.0:
+                log('Can not accept connection!')
+                return None
+            if not self.wait(min(remaining, BREAK_POLL_INTERVAL)):
+                return None
+            if not self.pending_connections and not self.is_running():
+                log('SORT quit before connecting.')
+                return None
+        connection = self.pending_connections.pop(0)
+        connection.setblocking(True)
+        return connection
+
+    # watch a connection to the display server of SORT
+    def watch_display(self, connection):
+        connection.setblocking(False)
+        display = DisplayConnection(connection, self.framebuffer)
+        self.display_connections.append(display)
+        self.selector.register(connection, selectors.EVENT_READ, lambda: self.on_display_event(display))
+
+    # hand the pending view over to the display connections, it waits until SORT connects
+    def deliver_view(self):
+        if not self.display_connections:
+            return
+        with self.view_lock:
+            packet, self.pending_view = self.pending_view, None
+        if packet is None:
+            return
+        for display in list(self.display_connections):
+            if display.send(packet):
+                self.update_display_events(display)
+            else:
+                self.drop_display(display)
+
+    # wait for the socket to be writable only while there is anything left to send, it is always writable otherwise
+    def update_display_events(self, display):
+        key = self.selector.get_key(display.connection)
+        if key.events != display.events():
+            self.selector.modify(display.connection, display.events(), key.data)
+
+    # keep dispatching tiles until SORT is done and has nothing more to say, returns False if the render is cancelled
+    def run(self):
+        while self.is_running() or self.display_connections:
+            if not self.wait(self.time_out()):
+                return False
+
+            # the display server may connect any time during rendering
+            while self.pending_connections:
+                self.watch_display(self.pending_connections.pop(0))
+            self.deliver_view()
+
+            if time.monotonic() - self.last_refresh >= 1.0 / DISPLAY_REFRESH_RATE:
+                self.refresh()
+
+        # whatever arrives after last refresh
+        self.refresh()
+        return True
+
+    # how long to sleep, a pending refresh shortens it
+    def time_out(self):
+        if not self.framebuffer.is_dirty():
+            return BREAK_POLL_INTERVAL
+        next_refresh = self.last_refresh + 1.0 / DISPLAY_REFRESH_RATE - time.monotonic()
+        return max(min(next_refresh, BREAK_POLL_INTERVAL), 0.0)
+
+    # push all regions changed since last refresh to Blender
+    def refresh(self):
+        if not self.framebuffer.is_dirty():
+            return
+        for x, y, w, h in self.framebuffer.take_dirty():
+            self.render_engine.update_result(x, y, w, h, self.framebuffer.pixels[y:y+h, x:x+w])
+        self.last_refresh = time.monotonic()
+
+    # sleep until something happens or the time is out, returns False if the render should stop
+    def wait(self, time_out):
+        if not self.cancelled:
+            for key, _ in self.selector.select(time_out):
+                key.data()
+        if not self.cancelled and self.render_engine.test_break():
+            self.cancelled = True
+        return not self.cancelled
+
+    def on_wakeup(self):
+        try:
+            self.wakeup_recv.recv(64)
+        except OSError:
+            pass
+
+    def on_accept(self):
+        try:
+            connection, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        self.pending_connections.append(connection)
+
+    def on_accept_tile_connection(self):
+        try:
+            connection, _ = self.tile_listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        connection.setblocking(False)
+        # each worker owns a region of the image in the order they connect
+        tile_connection = TileConnection(connection, self.scheduler, self.tile_worker_cnt)
+        self.tile_worker_cnt += 1
+        self.tile_connections.append(tile_connection)
+        self.selector.register(connection, selectors.EVENT_READ, lambda: self.on_tile_request(tile_connection))
+
+    def on_process_exit(self, exit_pipe):
+        try:
+            if os.read(exit_pipe, 64):
+                return
+        except (BlockingIOError, InterruptedError):
+            return
+        self.selector.unregister(exit_pipe)
+        os.close(exit_pipe)
+        self.exit_pipes.remove(exit_pipe)
+
+    def on_tile_request(self, tile_connection):
+        if tile_connection.on_readable():
+            return
+        self.selector.unregister(tile_connection.connection)
+        self.tile_connections.remove(tile_connection)
+        tile_connection.close()
+
+    def on_job_done(self):
+        self.selector.unregister(self.daemon.connection)
+        self.daemon.receive_result()
+        self.job_done = True
+
+    # the selector doesn't tell what the event is, the connection is flushed and read no matter what
+    def on_display_event(self, display):
+        if display.flush() and display.on_readable():
+            self.update_display_events(display)
+            return
+        log('Socket disconnected from SORT.')
+        self.drop_display(display)
+
+    def drop_display(self, display):
+        self.selector.unregister(display.connection)
+        self.display_connections.remove(display)
+        display.close()
+
+    # stop SORT if it is still running and release everything
+    def close(self):
+        # SORT abandons the render once the display server goes away
+        for display in self.display_connections:
+            self.selector.unregister(display.connection)
+            display.close()
+        self.display_connections = []
+
+        # the daemon is killed if it doesn't finish the job in time, a new one is launched next time then
+        if self.daemon is not None:
+            if not self.job_done:
+                self.selector.unregister(self.daemon.connection)
+                self.daemon.receive_result(TERMINATE_TIME_OUT)
+                self.job_done = True
+            self.daemon.release()
+            self.daemon = None
+
+        running = [ process for process in self.processes if process.poll() is None ]
+        for process in running:
+            process.terminate()
+        for process in running:
+            try:
+                process.wait(TERMINATE_TIME_OUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        for connection in self.pending_connections:
+            connection.close()
+        self.pending_connections = []
+
+        for exit_pipe in self.exit_pipes:
+            self.selector.unregister(exit_pipe)
+            os.close(exit_pipe)
+        self.exit_pipes = []
+
+        if self.tile_listener is not None:
+            for tile_connection in self.tile_connections:
+                self.selector.unregister(tile_connection.connection)
+                tile_connection.close()
+            self.tile_connections = []
+            self.selector.unregister(self.tile_listener)
+            self.tile_listener.close()
+            self.tile_listener = None
+
+        self.framebuffer.close()
+
+        self.selector.unregister(self.listener)
+        self.selector.unregister(self.wakeup_recv)
+        self.selector.close()
+        self.listener.close()
+        self.wakeup_recv.close()
+        self.wakeup_send.close()
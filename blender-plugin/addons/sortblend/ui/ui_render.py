@@ -62,7 +62,8 @@ class SORTRenderData(bpy.types.PropertyGroup):
                           ("bvh", "BVH", "Binary Bounding Volume Hierarchy", 2),
                           ("KDTree", "SAH KDTree", "K-dimentional Tree", 3),
                           ("UniGrid", "Uniform Grid", "This is not quite practical in all cases.", 4),
-                          ("OcTree" , "OcTree" , "This is not quite practical in all cases." , 5)]
+                          ("OcTree" , "OcTree" , "This is not quite practical in all cases." , 5),
+                          ("Auto" , "Auto" , "Benchmark all accelerators on the scene before rendering and pick the fastest one, the choice is cached for the scene." , 6)]
     accelerator_type_prop : bpy.props.EnumProperty(items=accelerator_types, name='Accelerator')
 
     # bvh properties
@@ -95,6 +96,18 @@ class SORTRenderData(bpy.types.PropertyGroup):
     #------------------------------------------------------------------------------------#
     sampler_count_prop : bpy.props.IntProperty(name='Count',default=1, min=1)
 
+    # adaptive sampling, pixels stop taking samples once they are converged
+    adaptive_sampling : bpy.props.BoolProperty(name='Adaptive Sampling', default=False, description='Stop taking samples in a pixel once its noise is below the threshold')
+    adaptive_noise_threshold : bpy.props.FloatProperty(name='Noise Threshold', default=0.01, min=0.0001, max=1.0, description='A pixel is converged once the relative standard error of its luminance is below this')
+    adaptive_min_samples : bpy.props.IntProperty(name='Min Samples', default=16, min=2, description='Samples taken in every pixel before its noise is estimated')
+    adaptive_max_samples : bpy.props.IntProperty(name='Max Samples', default=1024, min=2, description='Samples taken in a pixel at most, even if it is not converged')
+    adaptive_show_sample_count : bpy.props.BoolProperty(name='Show Sample Count', default=False, description='Display the number of samples taken in each pixel instead of its color')
+
+    # progressive rendering, the whole image is rendered in passes of increasing sample count
+    progressive_rendering : bpy.props.BoolProperty(name='Progressive', default=False, description='Render the whole image in passes of increasing sample count, the image is the best one so far whenever rendering stops')
+    progressive_time_budget : bpy.props.FloatProperty(name='Time Budget', default=0.0, min=0.0, subtype='TIME_ABSOLUTE', unit='TIME_ABSOLUTE', description='Seconds a frame is allowed to take, including loading the scene, zero means no limit')
+    progressive_noise_target : bpy.props.FloatProperty(name='Noise Target', default=0.0, min=0.0, max=1.0, description='Stop once the relative standard error of the luminance of all pixels is below this, zero means no target')
+
     #------------------------------------------------------------------------------------#
     #                                 Debugging Settings                                 #
     #------------------------------------------------------------------------------------#
@@ -191,7 +204,32 @@ class RENDER_PT_ClamppingPanel(SORTRenderPanel,bpy.types.Panel):
 class RENDER_PT_SamplerPanel(SORTRenderPanel, bpy.types.Panel):
     bl_label = 'Sample'
     def draw(self, context):
-        self.layout.prop(context.scene.sort_data,"sampler_count_prop")
+        data = context.scene.sort_data
+        self.layout.prop(data,"adaptive_sampling")
+        if data.adaptive_sampling:
+            self.layout.prop(data,"adaptive_noise_threshold")
+            self.layout.prop(data,"adaptive_min_samples")
+            self.layout.prop(data,"adaptive_max_samples")
+            self.layout.prop(data,"adaptive_show_sample_count")
+        else:
+            self.layout.prop(data,"sampler_count_prop")
+
+@base.register_class
+class RENDER_PT_ProgressivePanel(SORTRenderPanel, bpy.types.Panel):
+    bl_label = 'Progressive'
+    def draw_header(self, context):
+        self.layout.prop(context.scene.sort_data,"progressive_rendering", text="")
+    def draw(self, context):
+        data = context.scene.sort_data
+        self.layout.active = data.progressive_rendering
+        self.layout.prop(data,"progressive_time_budget")
+        self.layout.prop(data,"progressive_noise_target")
+
+@base.register_class
+class RENDER_PT_AnimationPanel(SORTRenderPanel, bpy.types.Panel):
+    bl_label = 'Animation'
+    def draw(self, context):
+        self.layout.operator("sort.render_animation", icon='RENDER_ANIMATION')
 
 @base.register_class
 class SORT_export_debug_scene(bpy.types.Operator):
@@ -0,0 +1,325 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+
+import bpy
+import bgl
+import math
+import time
+import numpy
+import struct
+import shutil
+import threading
+from .log import log
+from . import exporter
+from .supervisor import RenderSupervisor
+from .framebuffer import Framebuffer
+
+# Updates of these data blocks always change what a viewport render looks like, no matter how they are flagged.
+# Cameras are not among them, the view of a viewport tells whether they change anything.
+VISIBLE_ID_TYPES = ( bpy.types.Mesh , bpy.types.Light , bpy.types.World , bpy.types.Material ,
+                     bpy.types.NodeTree , bpy.types.Image )
+
+# A viewport render starts at this fraction of the resolution, halving the size of pixels until it is at full resolution.
+VIEWPORT_DOWNSAMPLE = 8
+
+# Blender is asked to draw the viewport at most once in this many seconds, no matter how fast tiles arrive.
+REDRAW_INTERVAL = 0.05
+
+# Views sent to an interactive render start with the size of the serialized camera that follows.
+VIEW_HEADER = struct.Struct('<i')
+
+# The sensor of a viewport, which is not a camera. This is the sensor Blender uses for drawing viewports.
+VIEWPORT_SENSOR = ( 36.0 , 24.0 )
+
+# The view of a viewport. It is the scene camera if the viewport looks through it, otherwise it is the view matrix
+# of the viewport. The resolution is always the size of the viewport.
+class ViewportCamera:
+    def __init__(self, context):
+        scene = context.scene
+        region = context.region
+        region_data = context.region_data
+
+        self.resolution = ( region.width , region.height )
+        if region_data.view_perspective == 'CAMERA' and scene.camera is not None:
+            camera = scene.camera
+            self.pos, self.target, self.up = exporter.lookat_camera(camera)
+            self.sensor = ( camera.data.sensor_width , camera.data.sensor_height )
+            self.sensor_fit = { 'HORIZONTAL' : 1 , 'VERTICAL' : 2 }.get(camera.data.sensor_fit, 0)
+            self.fov = camera.data.angle
+            self.lens_size = camera.data.sort_data.lens_size
+        else:
+            self.pos, self.target, self.up = exporter.lookat_view(region_data.view_matrix, region_data.view_distance)
+            self.sensor = VIEWPORT_SENSOR
+            self.sensor_fit = 0
+            self.fov = 2.0 * math.atan( VIEWPORT_SENSOR[0] / context.space_data.lens )
+            self.lens_size = 0.0
+
+        # anything changing here needs a new render
+        self.key = ( self.resolution , tuple(self.pos) , tuple(self.target) , tuple(self.up) , self.sensor ,
+                     self.sensor_fit , self.fov , self.lens_size )
+
+# Settings of SORT that a viewport render depends on, the scene itself is also updated when any of them changes.
+def render_settings_key(scene):
+    sort_data = scene.sort_data
+    return tuple( str(getattr(sort_data, prop.identifier)) for prop in sort_data.bl_rna.properties if prop.identifier != 'rna_type' )
+
+# Whether any update of the depsgraph changes what a viewport render looks like. Selecting an object also updates
+# the depsgraph, which is not worth a new render. Cameras only change the view, which is checked separately.
+def has_visible_updates(depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Camera) or ( isinstance(update.id, bpy.types.Object) and update.id.type == 'CAMERA' ):
+            continue
+        if update.is_updated_geometry or update.is_updated_shading or update.is_updated_transform:
+            return True
+        if isinstance(update.id, VISIBLE_ID_TYPES):
+            return True
+    return False
+
+# The render engine that a viewport render looks like to a supervisor. Tiles are copied to the image of the viewport.
+class ViewportJob:
+    def __init__(self, viewport):
+        self.viewport = viewport
+
+    # the supervisor polls this every now and then, a redraw held back by throttling is done by then
+    def test_break(self):
+        self.viewport.redraw()
+        return self.viewport.cancelled
+
+    def update_result(self, x, y, w, h, pixels):
+        self.viewport.update_image(x, y, w, h, pixels)
+
+# A viewport render is a single progressive render job in a background thread, Blender only draws whatever is
+# rendered so far. SORT loads the scene and builds the acceleration structure only once for it. The first passes
+# take one sample per block of pixels at increasing resolution, each pass after them refines the whole image,
+# starting from one sample per pixel. Changing the scene restarts it, the old render is cancelled and cleans up after
+# itself. An interactive render takes a new view without restarting, SORT starts over with the new camera and the rest
+# of the scene as it is, the view is only exported again if the resolution changes.
+class ViewportRender:
+    def __init__(self, render_engine, settings, scene_dir, view, interactive, last_pixels=None):
+        self.render_engine = render_engine
+        self.settings = settings
+        self.scene_dir = scene_dir
+        self.view = view
+        self.interactive = interactive
+        self.view_packet = None
+        self.cancelled = False
+        self.supervisor = None
+        self.lock = threading.Lock()
+
+        # the image drawn in the viewport and the region of it updated since it was last taken, as ( x0 , y0 , x1 , y1 ).
+        # The image of the last render is drawn until tiles of this one cover it, which is better than a black viewport.
+        width, height = view.resolution
+        self.pixels = None
+        if last_pixels is not None and last_pixels.shape[:2] == ( height , width ):
+            self.pixels = last_pixels.copy()
+        self.dirty = None
+        self.redraw_pending = False
+        self.last_redraw = 0.0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # stop rendering, this doesn't wait for the render thread to quit
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.supervisor is not None:
+                self.supervisor.cancel()
+
+    # go on with a different view without exporting the scene, returns False if the render has to be restarted for it
+    def update_view(self, scene, view):
+        if not self.interactive or view.resolution != self.view.resolution:
+            return False
+        camera = exporter.serialize_view(scene, view)
+        with self.lock:
+            if self.cancelled or not self.thread.is_alive():
+                return False
+            self.view = view
+            self.view_packet = VIEW_HEADER.pack(len(camera)) + camera
+            if self.supervisor is not None:
+                self.supervisor.send_view(self.view_packet)
+        return True
+
+    def run(self):
+        try:
+            self.render()
+        except Exception as exc:
+            log('Viewport rendering failed: %s' % exc)
+        finally:
+            shutil.rmtree(self.scene_dir, ignore_errors=True)
+
+    # render until all samples of the scene are taken or the viewport render is cancelled
+    def render(self):
+        width, height = self.view.resolution
+        binary_path, binary_dir, shared_memory, render_daemon, arguments = self.settings
+
+        framebuffer = Framebuffer(width, height, shared_memory)
+        supervisor = RenderSupervisor(ViewportJob(self), self.render_engine.ip_addr, framebuffer)
+        server = self.render_engine.ip_addr + ':' + str(supervisor.port)
+
+        cmd_argument = [ binary_path ]
+        cmd_argument.append( '--input:' + self.scene_dir + 'scene.sort' )
+        cmd_argument.append( '--displayserver:' + server )
+        cmd_argument.append( '--blendermode' )
+        cmd_argument.append( '--interactive' if self.interactive else '--progressive' )
+        cmd_argument.append( '--downsample:' + str(VIEWPORT_DOWNSAMPLE) )
+        if framebuffer.is_shared():
+            cmd_argument.append( '--displaymemory:' + framebuffer.path )
+        cmd_argument += arguments
+
+        with self.lock:
+            if self.cancelled:
+                supervisor.close()
+                return
+            self.supervisor = supervisor
+
+            # the view may have changed since the scene was exported
+            if self.view_packet is not None:
+                supervisor.send_view(self.view_packet)
+
+        try:
+            if render_daemon is None or not supervisor.submit(render_daemon, cmd_argument, binary_dir):
+                supervisor.launch(cmd_argument, binary_dir)
+            supervisor.run()
+        finally:
+            with self.lock:
+                self.supervisor = None
+            supervisor.close()
+
+    # every pass covers the whole image, tiles are drawn soon after they arrive
+    def update_image(self, x, y, w, h, pixels):
+        with self.lock:
+            if self.pixels is None:
+                width, height = self.view.resolution
+                self.pixels = numpy.zeros((height, width, 4), dtype=numpy.float32)
+            self.pixels[y:y+h, x:x+w] = pixels
+            if self.dirty is None:
+                self.dirty = ( x , y , x + w , y + h )
+            else:
+                self.dirty = ( min(self.dirty[0], x) , min(self.dirty[1], y) , max(self.dirty[2], x + w) , max(self.dirty[3], y + h) )
+        self.redraw_pending = True
+        self.redraw()
+
+    # ask Blender to draw the viewport again if anything is updated, this is only called from the render thread
+    def redraw(self):
+        now = time.monotonic()
+        if not self.redraw_pending or now - self.last_redraw < REDRAW_INTERVAL:
+            return
+        self.redraw_pending = False
+        self.last_redraw = now
+        self.render_engine.tag_redraw()
+
+    # the latest image, None if nothing is rendered yet
+    def latest_image(self):
+        with self.lock:
+            return self.pixels
+
+    # the latest image and the region of it updated since last time it is taken, the region is None if nothing is updated
+    def take_image(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, None
+            return self.pixels, dirty
+
+# Blender wraps the memory of a float32 array in a bgl buffer without copying it, as long as the type and the shape
+# match. The array has to be kept alive as long as the buffer is used.
+def gl_buffer(pixels):
+    data = numpy.ascontiguousarray(pixels, dtype=numpy.float32).reshape(-1)
+    return bgl.Buffer(bgl.GL_FLOAT, data.size, data), data
+
+# The image of a viewport render on GPU, it is stretched over the whole viewport no matter what resolution it has.
+class ViewportImage:
+    def __init__(self):
+        self.texture = bgl.Buffer(bgl.GL_INT, 1)
+        bgl.glGenTextures(1, self.texture)
+        bgl.glActiveTexture(bgl.GL_TEXTURE0)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, self.texture[0])
+        bgl.glTexParameteri(bgl.GL_TEXTURE_2D, bgl.GL_TEXTURE_MIN_FILTER, bgl.GL_LINEAR)
+        bgl.glTexParameteri(bgl.GL_TEXTURE_2D, bgl.GL_TEXTURE_MAG_FILTER, bgl.GL_LINEAR)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, 0)
+        self.pixels = None
+        self.dimensions = None
+        self.vertex_array = None
+        self.vertex_buffer = None
+
+    def __del__(self):
+        self.release_vertices()
+        bgl.glDeleteTextures(1, self.texture)
+
+    # upload the image if it is not uploaded yet, only the updated region of it if it is
+    def update(self, pixels, dirty):
+        if pixels is self.pixels and dirty is None:
+            return
+        bgl.glActiveTexture(bgl.GL_TEXTURE0)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, self.texture[0])
+        if pixels is not self.pixels:
+            height, width = pixels.shape[:2]
+            buffer, data = gl_buffer(pixels)
+            bgl.glTexImage2D(bgl.GL_TEXTURE_2D, 0, bgl.GL_RGBA16F, width, height, 0, bgl.GL_RGBA, bgl.GL_FLOAT, buffer)
+            self.pixels = pixels
+        else:
+            # rows of the region are packed together first, this only copies the region itself
+            x0, y0, x1, y1 = dirty
+            buffer, data = gl_buffer(pixels[y0:y1, x0:x1])
+            bgl.glTexSubImage2D(bgl.GL_TEXTURE_2D, 0, x0, y0, x1 - x0, y1 - y0, bgl.GL_RGBA, bgl.GL_FLOAT, buffer)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, 0)
+
+    # draw the image over a viewport, the display space shader has to be bound already
+    def draw(self, width, height):
+        if self.dimensions != ( width , height ):
+            self.create_vertices(width, height)
+        bgl.glActiveTexture(bgl.GL_TEXTURE0)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, self.texture[0])
+        bgl.glBindVertexArray(self.vertex_array[0])
+        bgl.glDrawArrays(bgl.GL_TRIANGLE_FAN, 0, 4)
+        bgl.glBindVertexArray(0)
+        bgl.glBindTexture(bgl.GL_TEXTURE_2D, 0)
+
+    def create_vertices(self, width, height):
+        self.release_vertices()
+        self.dimensions = ( width , height )
+
+        shader_program = bgl.Buffer(bgl.GL_INT, 1)
+        bgl.glGetIntegerv(bgl.GL_CURRENT_PROGRAM, shader_program)
+        position_location = bgl.glGetAttribLocation(shader_program[0], "pos")
+        texcoord_location = bgl.glGetAttribLocation(shader_program[0], "texCoord")
+
+        self.vertex_array = bgl.Buffer(bgl.GL_INT, 1)
+        bgl.glGenVertexArrays(1, self.vertex_array)
+        bgl.glBindVertexArray(self.vertex_array[0])
+        bgl.glEnableVertexAttribArray(texcoord_location)
+        bgl.glEnableVertexAttribArray(position_location)
+
+        position = bgl.Buffer(bgl.GL_FLOAT, 8, [0.0, 0.0, width, 0.0, width, height, 0.0, height])
+        texcoord = bgl.Buffer(bgl.GL_FLOAT, 8, [0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0])
+        self.vertex_buffer = bgl.Buffer(bgl.GL_INT, 2)
+        bgl.glGenBuffers(2, self.vertex_buffer)
+        bgl.glBindBuffer(bgl.GL_ARRAY_BUFFER, self.vertex_buffer[0])
+        bgl.glBufferData(bgl.GL_ARRAY_BUFFER, 32, position, bgl.GL_STATIC_DRAW)
+        bgl.glVertexAttribPointer(position_location, 2, bgl.GL_FLOAT, bgl.GL_FALSE, 0, None)
+        bgl.glBindBuffer(bgl.GL_ARRAY_BUFFER, self.vertex_buffer[1])
+        bgl.glBufferData(bgl.GL_ARRAY_BUFFER, 32, texcoord, bgl.GL_STATIC_DRAW)
+        bgl.glVertexAttribPointer(texcoord_location, 2, bgl.GL_FLOAT, bgl.GL_FALSE, 0, None)
+        bgl.glBindBuffer(bgl.GL_ARRAY_BUFFER, 0)
+        bgl.glBindVertexArray(0)
+
+    def release_vertices(self):
+        if self.vertex_array is None:
+            return
+        bgl.glDeleteBuffers(2, self.vertex_buffer)
+        bgl.glDeleteVertexArrays(1, self.vertex_array)
+        self.vertex_array = None
+        self.vertex_buffer = None
+        self.dimensions = None
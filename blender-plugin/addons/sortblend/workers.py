@@ -0,0 +1,133 @@
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+
+
+import os
+import glob
+import shlex
+import shutil
+import struct
+import collections
+from .log import log
+
+# Size of the tiles handed out to workers, it is the same as the tile size of a single SORT process.
+TILE_SIZE = 64
+
+# A worker asks for the next tile with an integer of any value, the reply is x, y, width and height of the tile.
+TILE_REQUEST = struct.Struct('<i')
+TILE_REPLY = struct.Struct('<4i')
+
+# Integrators that splat radiance all over the image, every process would need the whole image.
+WHOLE_IMAGE_INTEGRATORS = { 'BidirPathTracing', 'LightTracing' }
+
+# Tiles of an image shared by several SORT processes. Each worker owns a contiguous region of the image so that it
+# mostly touches the same part of the scene. Once a worker runs out of tiles in its own region, it steals tiles from
+# the region with the most tiles left, starting from the far end of that region.
+# Only tiles inside the render border, ( x , y , width , height ) in the coordinate system of SORT, are handed out.
+class TileScheduler:
+    def __init__(self, border, region_cnt):
+        bx, by, bw, bh = border
+        tiles = [ ( bx + x , by + y , min(TILE_SIZE, bw - x) , min(TILE_SIZE, bh - y) )
+                  for y in range(0, bh, TILE_SIZE) for x in range(0, bw, TILE_SIZE) ]
+        region_cnt = max( 1 , min( region_cnt , len(tiles) ) )
+        self.regions = [ collections.deque( tiles[ i * len(tiles) // region_cnt : ( i + 1 ) * len(tiles) // region_cnt ] )
+                         for i in range(region_cnt) ]
+        self.stolen = 0
+
+    # the next tile for the worker owning a region, None if there is no tile left at all
+    def next_tile(self, region):
+        own = self.regions[region % len(self.regions)]
+        if own:
+            return own.popleft()
+        victim = max(self.regions, key=len)
+        if not victim:
+            return None
+        self.stolen += 1
+        return victim.pop()
+
+# A connection to a worker asking for tiles.
+class TileConnection:
+    def __init__(self, connection, scheduler, region):
+        self.connection = connection
+        self.scheduler = scheduler
+        self.region = region
+        self.request = bytearray(TILE_REQUEST.size)
+        self.received = 0
+
+    # serve whatever is requested, returns False once the connection is closed
+    def on_readable(self):
+        try:
+            while True:
+                cnt = self.connection.recv_into(memoryview(self.request)[self.received:])
+                if cnt == 0:
+                    return False
+                self.received += cnt
+                if self.received < TILE_REQUEST.size:
+                    continue
+                self.received = 0
+                tile = self.scheduler.next_tile(self.region)
+                self.connection.sendall(TILE_REPLY.pack(*(tile or (0, 0, 0, 0))))
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError as e:
+            log('socket error\t ')
+            log(str(e))
+            return False
+
+    def close(self):
+        self.connection.close()
+
+# NUMA nodes of this machine as lists of cpus, there is only one node if there is no way to tell
+def numa_nodes():
+    nodes = []
+    for path in sorted(glob.glob('/sys/devices/system/node/node[0-9]*/cpulist')):
+        try:
+            with open(path) as f:
+                cpulist = f.read().strip()
+        except OSError:
+            continue
+        cpus = []
+        for part in filter(None, cpulist.split(',')):
+            first, _, last = part.partition('-')
+            cpus.extend(range(int(first), int(last or first) + 1))
+        if cpus:
+            nodes.append((int(os.path.basename(os.path.dirname(path))[4:]), cpus))
+    return nodes if nodes else [ ( 0 , list(range(os.cpu_count() or 1)) ) ]
+
+# Command lines of the workers rendering an image together. Workers are spread over NUMA nodes and pinned to them
+# through numactl, unless there is a launcher, which is a command prefix like 'ssh node{worker}' or a local stand-in
+# of it. '{worker}' and '{node}' in the launcher are replaced with the index of the worker and its NUMA node.
+def worker_commands(cmd_argument, worker_cnt, launcher, tile_server):
+    nodes = numa_nodes()
+    pin = len(nodes) > 1 and not launcher and shutil.which('numactl') is not None
+
+    commands = []
+    for i in range(worker_cnt):
+        node, cpus = nodes[i % len(nodes)]
+
+        # cpus of a node are shared by the workers on it
+        workers_on_node = len(range(i % len(nodes), worker_cnt, len(nodes)))
+        threads = max( 1 , len(cpus) // workers_on_node )
+
+        command = []
+        if launcher:
+            command += shlex.split(launcher.format(worker=i, node=node))
+        elif pin:
+            command += [ 'numactl' , '--cpunodebind=%d' % node , '--membind=%d' % node ]
+        command += cmd_argument
+        command.append( '--threads:%d' % threads )
+        command.append( '--tileserver:' + tile_server )
+        commands.append(command)
+    return commands
@@ -0,0 +1,562 @@
+#
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+#
+
+# Convert OBJ and PLY meshes to a scene for SORT without going through Blender.
+#
+# Input files are read in chunks and vertex and index buffers are built with array operations, the meshes are written
+# with the same layout as 'Mesh::Serialize' reads, along with a camera looking at all of them, an area light above them
+# and a diffuse material for each material of the input, or a default one. For example
+#
+#     python scripts/convert_mesh.py scan.ply scene.sort --samples 64
+#     ./bin/sort_r --input:scene.sort
+#
+# OBJ and PLY are y-up, which is the same as SORT, '--z-up' converts z-up meshes the same way the plugin does.
+
+import os
+import re
+import sys
+import math
+import time
+import argparse
+import numpy as np
+
+# the encoding of the scene and the serialization of everything but the meshes are shared with the scene generator
+from generate_scene import SID, stream, serialize_global_config, serialize_materials, serialize_mesh, serialize_accelerator
+from generate_scene import matrix_to_tuple, translation, FACING_DOWN, INTEGRATORS, ACCELERATOR_CANDIDATES, CHUNK_SIZE
+
+# bytes of an input file read at a time
+READ_CHUNK_SIZE = 64 * 1024 * 1024
+
+# color of the default material and of materials without a diffuse color in their MTL file
+DEFAULT_COLOR = ( 0.8 , 0.8 , 0.8 )
+
+# the same conversion as 'MatrixBlenderToSort' in the exporter, it swaps y and z
+Z_UP_TO_SORT = np.array(((1.0, 0.0, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 1.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0)))
+
+# avoid having space in material name, the same as 'name_compat' in the exporter
+def name_compat(name):
+    return name.replace(' ', '_')
+
+# Materials of all converted meshes, a material is identified by its name across input files.
+class MaterialTable:
+    def __init__(self):
+        self.ids = {}
+        self.materials = []
+
+    def get(self, name, color = DEFAULT_COLOR):
+        name = name_compat(name)
+        if name not in self.ids:
+            self.ids[name] = len(self.materials)
+            self.materials.append(( name , 'lambert' , color ))
+        return self.ids[name]
+
+# A converted mesh, every vertex refers to a position and optionally to a normal and an uv of the input.
+#
+# PLY has all attributes of a vertex together, so vertices are just the positions. Corners of OBJ faces refer to each
+# attribute separately, each distinct combination of them is a vertex. Positions without normals get the area weighted
+# normal of the faces around them.
+class ConvertedMesh:
+    def __init__(self, name, positions, triangles, material_ids, normals = None, uvs = None, corners = None):
+        self.name = name
+        self.positions = positions
+        self.triangles = triangles
+        self.material_ids = material_ids
+        self.normals = normals
+        self.uvs = uvs
+        self.corners = corners          # ( position , uv , normal ) indices of each vertex, None if vertices are positions
+        self.has_uv = uvs is not None
+        self.vertex_normals = None
+        if normals is None or ( corners is not None and np.any(corners[:, 2] < 0) ):
+            self.vertex_normals = smooth_normals(positions, self.position_triangles())
+
+    def vertex_count(self):
+        return len(self.positions) if self.corners is None else len(self.corners)
+
+    def triangle_count(self):
+        return len(self.triangles)
+
+    # triangles in terms of positions instead of vertices
+    def position_triangles(self):
+        return self.triangles if self.corners is None else self.corners[:, 0][self.triangles]
+
+    def vertex_chunks(self):
+        for first in range(0, self.vertex_count(), CHUNK_SIZE):
+            last = min(first + CHUNK_SIZE, self.vertex_count())
+            verts = np.zeros((last - first, 8), dtype=np.float32)
+            if self.corners is None:
+                verts[:, 0:3] = self.positions[first:last]
+                verts[:, 3:6] = self.normals[first:last] if self.normals is not None else self.vertex_normals[first:last]
+                if self.uvs is not None:
+                    verts[:, 6:8] = self.uvs[first:last]
+            else:
+                corners = self.corners[first:last]
+                verts[:, 0:3] = self.positions[corners[:, 0]]
+                if self.vertex_normals is not None:
+                    verts[:, 3:6] = self.vertex_normals[corners[:, 0]]
+                if self.normals is not None:
+                    has_normal = corners[:, 2] >= 0
+                    verts[has_normal, 3:6] = self.normals[corners[has_normal, 2]]
+                if self.uvs is not None:
+                    has_uv = corners[:, 1] >= 0
+                    verts[has_uv, 6:8] = self.uvs[corners[has_uv, 1]]
+            yield verts
+
+    def triangle_chunks(self):
+        for first in range(0, self.triangle_count(), CHUNK_SIZE):
+            last = min(first + CHUNK_SIZE, self.triangle_count())
+            tris = np.empty((last - first, 4), dtype=np.int32)
+            tris[:, 0:3] = self.triangles[first:last]
+            tris[:, 3] = self.material_ids[first:last]
+            yield tris
+
+# area weighted normal of each position, the normal of positions not used by any triangle points up
+def smooth_normals(positions, triangles):
+    normals = np.zeros((len(positions), 3), dtype=np.float64)
+    for first in range(0, len(triangles), CHUNK_SIZE):
+        tris = triangles[first:first + CHUNK_SIZE]
+        p0, p1, p2 = positions[tris[:, 0]], positions[tris[:, 1]], positions[tris[:, 2]]
+        face_normals = np.cross(p1 - p0, p2 - p0).astype(np.float64)
+        for corner in range(3):
+            for axis in range(3):
+                normals[:, axis] += np.bincount(tris[:, corner], weights=face_normals[:, axis], minlength=len(positions))
+    length = np.linalg.norm(normals, axis=1)
+    normals[length == 0.0] = ( 0.0 , 1.0 , 0.0 )
+    length[length == 0.0] = 1.0
+    return ( normals / length[:, np.newaxis] ).astype(np.float32)
+
+# Split polygons as a fan starting from the first corner, the same way the exporter splits triangles and quads.
+# It returns the triangles as indices of corners and the polygon of each triangle.
+def triangulate(corner_cnts):
+    corner_cnts = np.asarray(corner_cnts, dtype=np.int64)
+    first_corners = np.cumsum(corner_cnts) - corner_cnts
+    tri_cnts = np.maximum(corner_cnts - 2, 0)
+    tri_polys = np.repeat(np.arange(len(corner_cnts)), tri_cnts)
+    tri_offsets = np.arange(len(tri_polys)) - np.repeat(np.cumsum(tri_cnts) - tri_cnts, tri_cnts)
+    tri_bases = first_corners[tri_polys]
+    return np.stack((tri_bases, tri_bases + tri_offsets + 1, tri_bases + tri_offsets + 2), axis=1), tri_polys
+
+# numbers of all lines, the first 'columns' numbers of each line are taken
+def parse_numbers(lines, columns, dtype):
+    if not lines:
+        return np.empty((0, columns), dtype=dtype)
+    values = np.fromstring(b' '.join(lines), dtype=dtype, sep=' ')
+    line_columns = len(lines[0].split())
+    if len(values) == len(lines) * line_columns and line_columns >= columns:
+        return values.reshape(len(lines), line_columns)[:, :columns]
+
+    # lines have different numbers of values, like vertices with colors mixed with vertices without them
+    values = [ line.split()[:columns] for line in lines ]
+    if any( len(v) < columns for v in values ):
+        raise ValueError('Lines with less than %d values.' % columns)
+    return np.array(values).astype(dtype)
+
+# read a file in chunks, each chunk ends at the end of a line
+def read_lines_in_chunks(file):
+    rest = b''
+    while True:
+        data = file.read(READ_CHUNK_SIZE)
+        if not data:
+            if rest:
+                yield rest
+            return
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            rest = data
+            continue
+        rest = data[end:]
+        yield data[:end]
+
+# diffuse color of each material in MTL files
+def read_mtl(path):
+    colors = {}
+    name = None
+    try:
+        with open(path, 'rb') as file:
+            for line in file:
+                tokens = line.split()
+                if len(tokens) >= 2 and tokens[0] == b'newmtl':
+                    name = line.strip()[len(b'newmtl'):].strip().decode('utf-8', errors='replace')
+                    colors[name] = DEFAULT_COLOR
+                elif len(tokens) >= 4 and tokens[0] == b'Kd' and name is not None:
+                    colors[name] = tuple( float(t) for t in tokens[1:4] )
+    except OSError:
+        print('Failed to read material library %s.' % path)
+    return colors
+
+# patterns start from the line break before a line instead of '^', which is a lot faster to search for
+OBJ_SEGMENT = re.compile(rb'\n(usemtl|o|g)(?:[ \t]+([^\r\n]*))?(?=\r?\n|$)')
+OBJ_MTLLIB = re.compile(rb'\nmtllib[ \t]+([^\r\n]*)')
+OBJ_POSITION = re.compile(rb'\nv[ \t]+([^\r\n]*)')
+OBJ_UV = re.compile(rb'\nvt[ \t]+([^\r\n]*)')
+OBJ_NORMAL = re.compile(rb'\nvn[ \t]+([^\r\n]*)')
+OBJ_FACE = re.compile(rb'\nf[ \t]+([^\r\n]*)')
+
+# Convert an OBJ file. Files are split at 'usemtl', 'o' and 'g' lines, negative indices in a part are relative to the
+# end of the part, which is exact as long as faces of an object come after its vertices, like any exporter does.
+def read_obj(path, material_table):
+    positions, uvs, normals = [], [], []
+    position_cnt, uv_cnt, normal_cnt = 0, 0, 0
+    corner_cnts, corners, face_materials = [], [], []
+    mtl_colors = {}
+    material_name = 'Default'
+
+    # corners of faces are v, v/vt, v/vt/vn or v//vn, indices that are not there are -1
+    def parse_corners(tokens):
+        first = tokens[0]
+        fields = first.count(b'/') + 1
+        text = b' '.join(tokens).replace(b'//', b' ').replace(b'/', b' ')
+        layout = ( 0 , 2 ) if b'//' in first else ( 0 , 1 , 2 )[:fields]
+        values = np.fromstring(text, dtype=np.int64, sep=' ')
+        if len(values) != len(tokens) * len(layout):
+            # corners of different layouts are mixed, each of them is parsed separately
+            values = np.full((len(tokens), 3), 0, dtype=np.int64)
+            for i, token in enumerate(tokens):
+                for j, index in enumerate(token.split(b'/')[:3]):
+                    if index:
+                        values[i, j] = int(index)
+            return values
+        result = np.zeros((len(tokens), 3), dtype=np.int64)
+        result[:, layout] = values.reshape(len(tokens), len(layout))
+        return result
+
+    # OBJ indices start from 1 and negative ones go backward from the end, 0 means there is no such attribute
+    def resolve(indices, cnt):
+        return np.where(indices > 0, indices - 1, np.where(indices < 0, cnt + indices, -1))
+
+    with open(path, 'rb') as file:
+        for chunk in read_lines_in_chunks(file):
+            chunk = b'\n' + chunk
+            for library in OBJ_MTLLIB.findall(chunk):
+                mtl_colors.update(read_mtl(os.path.join(os.path.dirname(path), library.strip().decode('utf-8', errors='replace'))))
+
+            parts = OBJ_SEGMENT.split(chunk)
+            for i in range(0, len(parts), 3):
+                if i > 0 and parts[i - 2] == b'usemtl':
+                    material_name = ( parts[i - 1] or b'' ).strip().decode('utf-8', errors='replace') or 'Default'
+                part = parts[i] if i == 0 else b'\n' + parts[i]
+
+                positions.append(parse_numbers(OBJ_POSITION.findall(part), 3, np.float32))
+                uvs.append(parse_numbers(OBJ_UV.findall(part), 2, np.float32))
+                normals.append(parse_numbers(OBJ_NORMAL.findall(part), 3, np.float32))
+                position_cnt += len(positions[-1])
+                uv_cnt += len(uvs[-1])
+                normal_cnt += len(normals[-1])
+
+                faces = OBJ_FACE.findall(part)
+                if not faces:
+                    continue
+                cnts = np.fromiter(map(len, map(bytes.split, faces)), dtype=np.int64, count=len(faces))
+                face_corners = parse_corners(b' '.join(faces).split())
+                face_corners[:, 0] = resolve(face_corners[:, 0], position_cnt)
+                face_corners[:, 1] = resolve(face_corners[:, 1], uv_cnt)
+                face_corners[:, 2] = resolve(face_corners[:, 2], normal_cnt)
+                corner_cnts.append(cnts)
+                corners.append(face_corners)
+                face_materials.append(np.full(len(faces), material_table.get(material_name, mtl_colors.get(material_name, DEFAULT_COLOR)), dtype=np.int32))
+
+    positions = np.concatenate(positions)
+    uvs = np.concatenate(uvs) if uv_cnt > 0 else None
+    normals = np.concatenate(normals) if normal_cnt > 0 else None
+    if not corners:
+        return ConvertedMesh(path, positions, np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int32))
+
+    corner_cnts = np.concatenate(corner_cnts)
+    corners = np.concatenate(corners)
+    face_materials = np.concatenate(face_materials)
+    if corners[:, 0].min() < 0 or corners[:, 0].max() >= position_cnt or corners[:, 1].max() >= uv_cnt or corners[:, 2].max() >= normal_cnt:
+        raise ValueError('%s has faces referring to vertices that don\'t exist.' % path)
+
+    triangles, tri_faces = triangulate(corner_cnts)
+    material_ids = face_materials[tri_faces]
+
+    # every distinct combination of position, uv and normal is a vertex
+    if uvs is None and normals is None:
+        return ConvertedMesh(path, positions, corners[:, 0][triangles], material_ids)
+    keys = ( corners[:, 0] * ( uv_cnt + 1 ) + corners[:, 1] + 1 ) * ( normal_cnt + 1 ) + corners[:, 2] + 1
+    if ( position_cnt + 1 ) * ( uv_cnt + 1 ) * ( normal_cnt + 1 ) < 2 ** 63:
+        _, first_corners, vertex_ids = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        _, first_corners, vertex_ids = np.unique(corners, axis=0, return_index=True, return_inverse=True)
+    vertex_ids = vertex_ids.reshape(-1)
+    return ConvertedMesh(path, positions, vertex_ids[triangles], material_ids, normals, uvs, corners[first_corners])
+
+PLY_TYPES = { 'char' : 'i1' , 'int8' : 'i1' , 'uchar' : 'u1' , 'uint8' : 'u1' , 'short' : 'i2' , 'int16' : 'i2' ,
+              'ushort' : 'u2' , 'uint16' : 'u2' , 'int' : 'i4' , 'int32' : 'i4' , 'uint' : 'u4' , 'uint32' : 'u4' ,
+              'float' : 'f4' , 'float32' : 'f4' , 'double' : 'f8' , 'float64' : 'f8' }
+PLY_UV_NAMES = [ ( 'u' , 'v' ) , ( 's' , 't' ) , ( 'texture_u' , 'texture_v' ) , ( 'texture_s' , 'texture_t' ) ]
+
+# Read the records of a PLY element with a list property, like faces. Records with the same number of items are read
+# together, which is the case for all records of most files.
+def read_ply_list_element(file, byte_order, props, record_cnt):
+    list_index = [ i for i, prop in enumerate(props) if prop[1] == 'list' ]
+    if len(list_index) != 1:
+        raise ValueError('Elements with more than one list property are not supported.')
+    list_index = list_index[0]
+    _, _, cnt_type, item_type = props[list_index]
+    prefix = [ ( name , byte_order + PLY_TYPES[t] ) for name, t in props[:list_index] ]
+    suffix = [ ( name , byte_order + PLY_TYPES[t] ) for name, t in props[list_index + 1:] ]
+    cnt_dtype = np.dtype(byte_order + PLY_TYPES[cnt_type])
+    prefix_size = np.dtype(prefix).itemsize if prefix else 0
+
+    cnts, items = [], []
+    while record_cnt > 0:
+        start = file.tell()
+        file.seek(prefix_size, os.SEEK_CUR)
+        item_cnt = int(np.frombuffer(file.read(cnt_dtype.itemsize), dtype=cnt_dtype)[0])
+        file.seek(start)
+
+        dtype = np.dtype(prefix + [ ( 'cnt' , cnt_dtype ) , ( 'items' , byte_order + PLY_TYPES[item_type] , ( item_cnt , ) ) ] + suffix)
+        records = np.fromfile(file, dtype=dtype, count=min(record_cnt, CHUNK_SIZE))
+        same = np.flatnonzero(records['cnt'] != item_cnt)
+        run = len(records) if len(same) == 0 else int(same[0])
+        file.seek(start + run * dtype.itemsize)
+
+        cnts.append(np.full(run, item_cnt, dtype=np.int64))
+        items.append(records['items'][:run].reshape(-1).astype(np.int64))
+        record_cnt -= run
+    return np.concatenate(cnts) if cnts else np.empty(0, dtype=np.int64), np.concatenate(items) if items else np.empty(0, dtype=np.int64)
+
+# Read the records of a PLY element in ascii, list properties have their count first in a line.
+def read_ply_ascii_element(file, props, record_cnt):
+    has_list = any( prop[1] == 'list' for prop in props )
+    scalars, cnts, items = [], [], []
+    while record_cnt > 0:
+        lines = []
+        for _ in range(min(record_cnt, CHUNK_SIZE)):
+            line = file.readline()
+            if not line:
+                raise ValueError('PLY file ends before all elements are read.')
+            lines.append(line.strip())
+        record_cnt -= len(lines)
+        if not has_list:
+            scalars.append(parse_numbers(lines, len(props), np.float64))
+            continue
+
+        # only the list property itself is needed, which is the only one that faces usually have
+        list_index = [ i for i, prop in enumerate(props) if prop[1] == 'list' ][0]
+        tokens = [ line.split() for line in lines ]
+        chunk_cnts = np.array([ int(t[list_index]) for t in tokens ], dtype=np.int64)
+        cnts.append(chunk_cnts)
+        items.append(np.array([ v for t, c in zip(tokens, chunk_cnts) for v in t[list_index + 1:list_index + 1 + c] ], dtype=np.int64))
+    if not has_list:
+        return np.concatenate(scalars) if scalars else np.empty((0, len(props)))
+    return np.concatenate(cnts) if cnts else np.empty(0, dtype=np.int64), np.concatenate(items) if items else np.empty(0, dtype=np.int64)
+
+def read_ply(path, material_table):
+    with open(path, 'rb') as file:
+        if file.readline().strip() != b'ply':
+            raise ValueError('%s is not a PLY file.' % path)
+
+        # header, each element is its name, number of records and properties
+        file_format = None
+        elements = []
+        while True:
+            line = file.readline()
+            if not line:
+                raise ValueError('%s has no end of header.' % path)
+            tokens = line.decode('ascii', errors='replace').split()
+            if not tokens:
+                continue
+            if tokens[0] == 'end_header':
+                break
+            if tokens[0] == 'format':
+                file_format = tokens[1]
+            elif tokens[0] == 'element':
+                elements.append(( tokens[1] , int(tokens[2]) , [] ))
+            elif tokens[0] == 'property' and elements:
+                if tokens[1] == 'list':
+                    elements[-1][2].append(( tokens[4] , 'list' , tokens[2] , tokens[3] ))
+                else:
+                    elements[-1][2].append(( tokens[2] , tokens[1] ))
+
+        if file_format not in ( 'ascii' , 'binary_little_endian' , 'binary_big_endian' ):
+            raise ValueError('%s has unsupported format %s.' % (path, file_format))
+        byte_order = '<' if file_format == 'binary_little_endian' else '>'
+
+        positions = normals = uvs = None
+        corner_cnts = corners = None
+        for name, record_cnt, props in elements:
+            prop_names = [ prop[0] for prop in props ]
+            has_list = any( prop[1] == 'list' for prop in props )
+            if name == 'vertex' and not has_list:
+                if file_format == 'ascii':
+                    values = read_ply_ascii_element(file, props, record_cnt)
+                    columns = { prop : values[:, i] for i, prop in enumerate(prop_names) }
+                else:
+                    dtype = np.dtype([ ( prop[0] , byte_order + PLY_TYPES[prop[1]] ) for prop in props ])
+                    values = np.fromfile(file, dtype=dtype, count=record_cnt)
+                    if len(values) != record_cnt:
+                        raise ValueError('%s ends before all vertices are read.' % path)
+                    columns = { prop : values[prop] for prop in prop_names }
+
+                def attribute(names):
+                    if not all( n in columns for n in names ):
+                        return None
+                    return np.stack([ columns[n] for n in names ], axis=1).astype(np.float32)
+                positions = attribute(( 'x' , 'y' , 'z' ))
+                if positions is None:
+                    raise ValueError('%s has vertices without positions.' % path)
+                normals = attribute(( 'nx' , 'ny' , 'nz' ))
+                for uv_names in PLY_UV_NAMES:
+                    uvs = attribute(uv_names)
+                    if uvs is not None:
+                        break
+            elif file_format == 'ascii':
+                result = read_ply_ascii_element(file, props, record_cnt)
+                if name == 'face' and has_list:
+                    corner_cnts, corners = result
+            elif has_list:
+                result = read_ply_list_element(file, byte_order, props, record_cnt)
+                if name == 'face':
+                    corner_cnts, corners = result
+            else:
+                # other elements are skipped
+                dtype = np.dtype([ ( prop[0] , byte_order + PLY_TYPES[prop[1]] ) for prop in props ])
+                file.seek(dtype.itemsize * record_cnt, os.SEEK_CUR)
+
+    if positions is None:
+        raise ValueError('%s has no vertex.' % path)
+    if corners is None:
+        corner_cnts = corners = np.empty(0, dtype=np.int64)
+    if len(corners) > 0 and ( corners.min() < 0 or corners.max() >= len(positions) ):
+        raise ValueError('%s has faces referring to vertices that don\'t exist.' % path)
+
+    triangles, _ = triangulate(corner_cnts)
+    triangles = corners[triangles] if len(triangles) > 0 else np.empty((0, 3), dtype=np.int64)
+    material_ids = np.full(len(triangles), material_table.get('Default'), dtype=np.int32)
+    return ConvertedMesh(path, positions, triangles, material_ids, normals, uvs)
+
+# the camera looks at the center of all meshes from the front, far enough to see all of them
+def serialize_camera(args, center, radius, fs):
+    xres, yres = args.resolution
+    fov = 2.0 * math.atan(18.0 / 50.0)
+    direction = np.array((0.5, 0.5, -1.0)) / np.linalg.norm((0.5, 0.5, -1.0))
+    pos = center + direction * radius / math.sin(fov * 0.5)
+    fs.serialize(SID('PerspectiveCameraEntity'))
+    fs.serialize(tuple( float(v) for v in pos ))
+    fs.serialize((0.0, 1.0, 0.0))
+    fs.serialize(tuple( float(v) for v in center ))
+    fs.serialize((xres, yres))
+    fs.serialize(0.0)           # lens size
+    fs.serialize((36.0, 24.0))  # sensor size
+    fs.serialize(0)             # sensor fit, auto
+    fs.serialize((1.0, 1.0))    # pixel aspect ratio
+    fs.serialize(fov)
+
+# a square area light above the meshes, its default power lights a diffuse white surface below it to about one
+def serialize_lights(args, center, radius, fs):
+    height = radius * 2.0
+    power = args.light_power if args.light_power is not None else 12.3 * height * height
+    fs.serialize( SID('AreaLightEntity') )
+    fs.serialize( matrix_to_tuple( translation(center[0], center[1] + height, center[2]) @ FACING_DOWN ) )
+    fs.serialize( float(power) )
+    fs.serialize( ( 1.0 , 1.0 , 1.0 ) )
+    fs.serialize( SID('SQUARE') )
+    fs.serialize( float(radius) )
+
+    if args.sky is not None:
+        fs.serialize( SID('SkyLightEntity') )
+        fs.serialize( matrix_to_tuple( np.identity(4) ) )
+        fs.serialize( ( 1.0 , 1.0 , 1.0 ) )     # light tint color
+        fs.serialize( 1.0 )                     # sky light scaling
+        fs.serialize( os.path.abspath(args.sky) )
+
+def convert(args):
+    material_table = MaterialTable()
+    meshes = []
+    for path in args.inputs:
+        current_time = time.time()
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.obj':
+            mesh = read_obj(path, material_table)
+        elif extension == '.ply':
+            mesh = read_ply(path, material_table)
+        else:
+            raise ValueError('%s is neither an OBJ nor a PLY file.' % path)
+        print('Read %s in %.2f(s), %d vertices, %d triangles.' % (path, time.time() - current_time, mesh.vertex_count(), mesh.triangle_count()))
+        meshes.append(mesh)
+
+    # everything is converted to y-up, which is what SORT uses
+    matrix = Z_UP_TO_SORT if args.z_up else np.identity(4)
+    bbox_min = np.full(3, np.inf)
+    bbox_max = np.full(3, -np.inf)
+    for mesh in meshes:
+        if len(mesh.positions) > 0:
+            bbox_min = np.minimum(bbox_min, mesh.positions.min(axis=0))
+            bbox_max = np.maximum(bbox_max, mesh.positions.max(axis=0))
+    if np.any(bbox_min > bbox_max):
+        raise ValueError('There is no vertex to render.')
+    bbox_min, bbox_max = ( matrix[:3, :3] @ bbox_min , matrix[:3, :3] @ bbox_max )
+    center = ( bbox_min + bbox_max ) * 0.5
+    radius = max( float(np.linalg.norm(bbox_max - bbox_min)) * 0.5 , 1e-3 )
+
+    current_time = time.time()
+    if args.no_sections:
+        fs = stream.FileStream( args.output )
+    else:
+        fs = stream.SectionedFileStream( args.output )
+
+    serialize_global_config(args, fs)
+    serialize_materials(material_table.materials, fs)
+
+    # this is a special code for the render to identify that the serialized input is still valid.
+    fs.serialize( SID('verification bits') )
+    serialize_camera(args, center, radius, fs)
+
+    for mesh in meshes:
+        fs.serialize( SID('VisualEntity') )
+        fs.serialize( matrix_to_tuple( matrix ) )
+        fs.serialize( 1 )   # only one mesh for each mesh entity
+        serialize_mesh(mesh, fs)
+
+    serialize_lights(args, center, radius, fs)
+
+    # to indicate the scene stream comes to an end
+    fs.serialize(SID('End of Entities'))
+
+    serialize_accelerator(args, fs)
+    fs.close()
+
+    print( 'Generated %s in %.2f(s), %d bytes.' % (args.output, time.time() - current_time, os.path.getsize(args.output)) )
+    print( 'Total vertices: %d.' % sum( mesh.vertex_count() for mesh in meshes ) )
+    print( 'Total primitives: %d.' % sum( mesh.triangle_count() for mesh in meshes ) )
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert OBJ and PLY meshes to a scene for SORT.')
+    parser.add_argument('inputs', nargs='+', help='OBJ or PLY files to convert')
+    parser.add_argument('output', help='path of the converted scene, like scene.sort')
+    parser.add_argument('--z-up', action='store_true', help='the meshes are z-up instead of y-up')
+    parser.add_argument('--light-power', type=float, default=None, help='power of the area light above the meshes')
+    parser.add_argument('--sky', default=None, help='HDR image lighting the scene from all directions')
+    parser.add_argument('--resolution', type=int, nargs=2, default=[640, 480], metavar=('WIDTH', 'HEIGHT'), help='resolution of the image')
+    parser.add_argument('--samples', type=int, default=16, help='samples per pixel')
+    parser.add_argument('--threads', type=int, default=0, help='number of threads, 0 means the number of physical cores')
+    parser.add_argument('--integrator', choices=INTEGRATORS, default='PathTracing', help='integrator used to render the scene')
+    parser.add_argument('--max-depth', type=int, default=16, help='maximum recursive depth of the integrator')
+    parser.add_argument('--accelerator', choices=ACCELERATOR_CANDIDATES + ['Auto'], default='Qbvh', help='spatial accelerator of the scene')
+    parser.add_argument('--no-sections', action='store_true', help='embed meshes in the scene instead of separate sections, like a streamed scene')
+    args = parser.parse_args()
+
+    try:
+        convert(args)
+    except (OSError, ValueError) as exc:
+        print('Failed to convert: %s' % exc)
+        sys.exit(1)
+
+if __name__=="__main__":
+    main()
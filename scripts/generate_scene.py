@@ -0,0 +1,634 @@
+#
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+#
+
+# Generate synthetic scenes for benchmarking SORT without Blender.
+#
+# The scene is made of parametric grids of triangles, instanced meshes, hair strands, a smoke volume, lights and a mix
+# of materials, the size of each part is controlled from command line so that loading, building accelerators and
+# rendering can be measured at any scale, from a thousand to hundreds of millions of primitives. For example
+#
+#     python scripts/generate_scene.py scene.sort --triangles 10M --meshes 16 --instances 1K --hair 100K --lights 64
+#     ./bin/sort_r --input:scene.sort
+#
+# Geometry is generated and written chunk by chunk, the memory needed doesn't grow with the size of the scene.
+
+import os
+import sys
+import math
+import time
+import types
+import struct
+import argparse
+import tempfile
+import numpy as np
+
+# The scene is written through the stream of the Blender plugin so that it is encoded exactly the same way as an exported
+# one. The plugin can't be imported as a whole without Blender, only the modules that don't depend on it are loaded here.
+addon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blender-plugin', 'addons', 'sortblend')
+sortblend = types.ModuleType('sortblend')
+sortblend.__path__ = [addon_dir]
+sys.modules.setdefault('sortblend', sortblend)
+
+from sortblend.strid import SID
+from sortblend.stream import stream
+
+LENFMT = struct.Struct('=i')
+
+# same brick size as the one used by the exporter of the plugin
+VOLUME_BRICK_SIZE = 8
+
+# number of vertices, triangles or hair generated at a time, this bounds the temporary memory for huge scenes
+CHUNK_SIZE = 1024 * 1024
+
+# the ground covers a square of this size centered at the origin, y goes up in SORT
+SCENE_EXTENT = 20.0
+
+# height of the waves of the grids, it keeps the accelerators from seeing a flat plane
+WAVE_HEIGHT = 0.25
+WAVE_FREQUENCY = 3.0
+
+# triangles in a square patch of this many quads share the same material
+MATERIAL_PATCH = 8
+
+# no material, the renderer falls back to the default one
+NO_MATERIAL = 0xffffffff
+
+INTEGRATORS = [ 'PathTracing' , 'BidirPathTracing' , 'LightTracing' , 'InstantRadiosity' , 'AmbientOcclusion' , 'DirectLight' , 'WhittedRT' ]
+
+# default maximum depth and primitives in leaf of each accelerator, the same as the default settings in the plugin
+ACCELERATOR_SETTINGS = { 'Qbvh' : (28, 16) , 'Obvh' : (28, 16) , 'Bvh' : (28, 8) , 'KDTree' : (28, 8) , 'OcTree' : (16, 16) , 'UniGrid' : None }
+ACCELERATOR_CANDIDATES = [ 'Qbvh' , 'Obvh' , 'Bvh' , 'KDTree' , 'OcTree' , 'UniGrid' ]
+
+LIGHT_TYPES = [ 'point' , 'spot' , 'area' ]
+
+# Shader nodes used by generated materials, the type and the source are the same as the nodes in the plugin so that
+# shader units compiled for a generated scene are shared with exported ones.
+SHADER_OUTPUT_TYPE = 'SORTNodeOutput'
+SHADER_NODES = {
+    'lambert' : ( 'SORTNode_Material_DiffuseLambert' , 'Diffuse' , '''
+        shader bxdf_lambert(color Diffuse, vector Normal, out closure Result){
+            Result = make_closure<lambert>( Diffuse , Normal );
+        }
+    ''' ),
+    'mirror' : ( 'SORTNode_Material_Mirror' , 'Color' , '''
+        shader Mirror( color Color ,
+                       vector Normal ,
+                       out closure Result ){
+            Result = make_closure<mirror>( Color , Normal );
+        }
+    ''' ),
+    'smoke' : ( 'SORTNodeHeterogeneous' , 'Color' , '''
+        shader HeterogeneousMedium( color Color ,
+                                    float Emission ,
+                                    float Absorption ,
+                                    float Scattering ,
+                                    float Anisotropy ,
+                                    out closure Result ){
+            Result = make_closure<medium_heterogeneous>(Color, Emission, Absorption, Scattering, Anisotropy );
+        }
+    ''' ),
+}
+
+# parse a count with an optional suffix, like '1K', '2.5M' or '1G'
+def parse_count(text):
+    suffixes = { 'K' : 10 ** 3 , 'M' : 10 ** 6 , 'G' : 10 ** 9 }
+    text = text.strip().upper()
+    scale = suffixes.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    try:
+        count = int(float(text) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid count %s' % text)
+    if count < 0:
+        raise argparse.ArgumentTypeError('count can\'t be negative')
+    return count
+
+# helper function to convert a 4x4 matrix to a tuple, row by row like the exporter does
+def matrix_to_tuple(matrix):
+    return tuple( float(v) for v in matrix.reshape(-1) )
+
+def translation(x, y, z):
+    matrix = np.identity(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+# lights face Y+ in SORT, this turns them upside down so that they light the ground
+FACING_DOWN = np.diag((1.0, -1.0, -1.0, 1.0))
+
+# height of the waves at a position of the ground, along with the normal there
+def wave(x, z):
+    k = WAVE_FREQUENCY * 2.0 * math.pi / SCENE_EXTENT
+    y = WAVE_HEIGHT * np.sin(k * x) * np.sin(k * z)
+    dx = WAVE_HEIGHT * k * np.cos(k * x) * np.sin(k * z)
+    dz = WAVE_HEIGHT * k * np.sin(k * x) * np.cos(k * z)
+    normal = np.stack((-dx, np.ones_like(dx), -dz), axis=-1)
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    return y, normal
+
+# A grid of quads, each of which is split into two triangles, on top of the waves of the ground.
+class Grid:
+    has_uv = True
+
+    def __init__(self, triangle_cnt, origin, size, material_ids):
+        quad_cnt = max( ( triangle_cnt + 1 ) // 2 , 1 )
+        self.cols = max( int(math.ceil(math.sqrt(quad_cnt))) , 1 )
+        self.rows = ( quad_cnt + self.cols - 1 ) // self.cols
+        self.origin = origin
+        self.size = size
+        self.material_ids = material_ids
+
+    def vertex_count(self):
+        return ( self.cols + 1 ) * ( self.rows + 1 )
+
+    def triangle_count(self):
+        return self.cols * self.rows * 2
+
+    # vertices are generated row by row, each vertex is position, normal and uv
+    def vertex_chunks(self):
+        rows_per_chunk = max( CHUNK_SIZE // ( self.cols + 1 ) , 1 )
+        u = np.arange(self.cols + 1, dtype=np.float32) / self.cols
+        for first in range(0, self.rows + 1, rows_per_chunk):
+            v = np.arange(first, min(first + rows_per_chunk, self.rows + 1), dtype=np.float32) / self.rows
+            uu, vv = np.meshgrid(u, v)
+            x = self.origin[0] + uu * self.size[0]
+            z = self.origin[1] + vv * self.size[1]
+            y, normal = wave(x, z)
+
+            verts = np.empty(uu.shape + (8,), dtype=np.float32)
+            verts[..., 0] = x
+            verts[..., 1] = y
+            verts[..., 2] = z
+            verts[..., 3:6] = normal
+            verts[..., 6] = uu
+            verts[..., 7] = vv
+            yield verts
+
+    # triangles are generated row of quads by row of quads, each triangle is three vertex indices and a material id
+    def triangle_chunks(self):
+        rows_per_chunk = max( CHUNK_SIZE // ( self.cols * 2 ) , 1 )
+        c = np.arange(self.cols, dtype=np.int64)[np.newaxis, :]
+        for first in range(0, self.rows, rows_per_chunk):
+            r = np.arange(first, min(first + rows_per_chunk, self.rows), dtype=np.int64)[:, np.newaxis]
+            v00 = r * ( self.cols + 1 ) + c
+            v01 = v00 + 1
+            v10 = v00 + self.cols + 1
+            v11 = v10 + 1
+
+            tris = np.empty(v00.shape + (2, 4), dtype=np.int32)
+            tris[..., 0, 0] = v00
+            tris[..., 0, 1] = v10
+            tris[..., 0, 2] = v11
+            tris[..., 1, 0] = v00
+            tris[..., 1, 1] = v11
+            tris[..., 1, 2] = v01
+            if len(self.material_ids) == 0:
+                tris[..., 3] = -1
+            else:
+                patch = ( r // MATERIAL_PATCH + c // MATERIAL_PATCH ) % len(self.material_ids)
+                tris[..., 3] = np.asarray(self.material_ids, dtype=np.int32)[patch][..., np.newaxis]
+            yield tris
+
+# A box with a smoke volume inside, the density is a noisy ball filling most of the box.
+class SmokeBox:
+    has_uv = True
+
+    def __init__(self, resolution, center, size, material_id, seed):
+        self.resolution = resolution
+        self.center = np.asarray(center, dtype=np.float32)
+        self.size = size
+        self.material_id = material_id
+        self.seed = seed
+
+    def vertex_count(self):
+        return 24
+
+    def triangle_count(self):
+        return 12
+
+    # four vertices for each face so that the faces have their own normals
+    def vertex_chunks(self):
+        verts = []
+        for axis in range(3):
+            for sign in (-1.0, 1.0):
+                normal = np.zeros(3)
+                normal[axis] = sign
+                u_axis, v_axis = [ a for a in range(3) if a != axis ]
+                for u, v in ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)):
+                    pos = np.zeros(3)
+                    pos[axis] = sign * 0.5
+                    pos[u_axis] = u - 0.5
+                    pos[v_axis] = v - 0.5
+                    verts.append(tuple(self.center + pos * self.size) + tuple(normal) + (u, v))
+        yield np.array(verts, dtype=np.float32)
+
+    def triangle_chunks(self):
+        faces = np.arange(6, dtype=np.int32)[:, np.newaxis] * 4
+        tris = np.empty((6, 2, 4), dtype=np.int32)
+        tris[:, 0, :3] = faces + ( 0 , 1 , 2 )
+        tris[:, 1, :3] = faces + ( 0 , 2 , 3 )
+        tris[..., 3] = self.material_id
+        yield tris
+
+    def serialize_volume(self, fs):
+        fs.serialize( SID('has_volume') )
+
+        # voxels are ordered the same way as Blender does, x goes first, then y and z
+        res = self.resolution
+        axis = ( np.arange(res, dtype=np.float32) + 0.5 ) / res * 2.0 - 1.0
+        z, y, x = np.meshgrid(axis, axis, axis, indexing='ij')
+        noise = np.random.default_rng(self.seed).random((res, res, res), dtype=np.float32)
+        density = np.clip( 1.0 - np.sqrt(x * x + y * y + z * z) , 0.0 , 1.0 ) * ( 0.5 + noise )
+        serialize_volume_grid(density.astype(np.float32), (res, res, res), 1, fs)
+
+        color = np.empty((res, res, res, 3), dtype=np.float32)
+        color[..., 0] = 0.5 + 0.5 * x
+        color[..., 1] = 0.5 + 0.5 * y
+        color[..., 2] = 0.5 + 0.5 * z
+        serialize_volume_grid(color, (res, res, res), 3, fs)
+
+# export a volume grid as sparse bricks, exactly the same way as 'export_volume_grid' in the exporter
+def serialize_volume_grid(grid, resolution, channels, fs):
+    x, y, z = resolution
+    fs.serialize((x, y, z))
+
+    # pad the grid to whole bricks
+    bx, by, bz = ( ( d + VOLUME_BRICK_SIZE - 1 ) // VOLUME_BRICK_SIZE for d in resolution )
+    padded = np.zeros((bz * VOLUME_BRICK_SIZE, by * VOLUME_BRICK_SIZE, bx * VOLUME_BRICK_SIZE, channels), dtype=np.float32)
+    padded[:z, :y, :x] = grid.reshape(z, y, x, channels)
+
+    bricks = padded.reshape(bz, VOLUME_BRICK_SIZE, by, VOLUME_BRICK_SIZE, bx, VOLUME_BRICK_SIZE, channels)
+    bricks = bricks.transpose(0, 2, 4, 1, 3, 5, 6).reshape(bz * by * bx, -1)
+
+    occupied = np.any(bricks != 0.0, axis=1)
+    brick_indices = np.full(len(occupied), -1, dtype=np.int32)
+    brick_indices[occupied] = np.arange(np.count_nonzero(occupied), dtype=np.int32)
+
+    fs.serialize(int(np.count_nonzero(occupied)))
+    fs.serialize_ints(brick_indices)
+    fs.serialize_floats(bricks[occupied])
+
+# serialize a mesh with the same layout as 'export_mesh' in the exporter, meshes go to their own sections if the stream has any
+def serialize_mesh(shape, fs):
+    def serialize(stream):
+        stream.serialize(bool(shape.has_uv))
+        stream.serialize(LENFMT.pack(shape.vertex_count()))
+        for chunk in shape.vertex_chunks():
+            stream.serialize_floats(chunk)
+        stream.serialize(LENFMT.pack(shape.triangle_count()))
+        for chunk in shape.triangle_chunks():
+            stream.serialize_ints(chunk)
+
+        if isinstance(shape, SmokeBox):
+            shape.serialize_volume(stream)
+        else:
+            stream.serialize(SID('no_volume'))
+
+        stream.serialize(SID('end of mesh'))
+
+    section = fs.serialize_section(SID('mesh'), serialize)
+    if section is None:
+        fs.serialize(SID('MeshVisual'))
+        serialize(fs)
+    else:
+        fs.serialize(SID('SectionMeshVisual'))
+        fs.serialize(section)
+
+# global settings for the renderer, the same layout as 'export_global_config' in the exporter
+def serialize_global_config(args, fs):
+    xres, yres = args.resolution
+
+    fs.serialize( 2 )
+    fs.serialize( os.path.join(os.path.dirname(os.path.abspath(args.output)), '') )
+    fs.serialize( args.threads )
+    fs.serialize( args.samples )
+    fs.serialize( xres )
+    fs.serialize( yres )
+    fs.serialize( 0.0 )                     # clampping
+    fs.serialize( ( 0 , 0 , xres , yres ) ) # render border
+    fs.serialize( False )                   # adaptive sampling
+    fs.serialize( 0.01 )                    # noise threshold
+    fs.serialize( 16 )                      # min samples
+    fs.serialize( 1024 )                    # max samples
+    fs.serialize( False )                   # show sample count
+
+    fs.serialize( SID(args.integrator) )
+    fs.serialize( args.max_depth )
+    if args.integrator == "PathTracing":
+        fs.serialize( 4 )                   # maximum bounces in sss path
+    if args.integrator == "AmbientOcclusion":
+        fs.serialize( 3.0 )                 # maximum distance
+    if args.integrator == "BidirPathTracing" or args.integrator == "LightTracing":
+        fs.serialize( True )                # multiple importance sampling
+    if args.integrator == "InstantRadiosity":
+        fs.serialize( 1 )                   # light path set num
+        fs.serialize( 64 )                  # light path num
+        fs.serialize( 1.0 )                 # minimum distance
+
+# Materials alternate between diffuse and mirror ones with different colors, the smoke material only has a volume shader.
+# Each material is the shader node connected to the output node, serialized the same way as 'export_materials' does.
+def serialize_materials(materials, fs):
+    fs.serialize( 0 )   # no shader resources
+
+    # each shader unit type is serialized only once, before any material refers to it
+    for kind in sorted(set( kind for _, kind, _ in materials )):
+        node_type, _, source = SHADER_NODES[kind]
+        fs.serialize(SID('ShaderUnitTemplate'))
+        fs.serialize(node_type)
+        fs.serialize(source)
+        fs.serialize(0)
+    if materials:
+        fs.serialize(SID('ShaderUnitTemplate'))
+        fs.serialize(SHADER_OUTPUT_TYPE)
+        fs.serialize('')
+        fs.serialize(0)
+
+    def serialize_shader(name, kind, color, output_socket):
+        node_type, color_socket, _ = SHADER_NODES[kind]
+        node_name = node_type + '_' + name
+
+        fs.serialize(2)
+        fs.serialize('ShaderOutput_')
+        fs.serialize(SHADER_OUTPUT_TYPE)
+        fs.serialize(0)
+        fs.serialize(node_name)
+        fs.serialize(node_type)
+        if kind == 'smoke':
+            fs.serialize(5)
+            fs.serialize('Color')
+            fs.serialize(3)
+            fs.serialize(color)
+            for param, value in (('Emission', 0.0), ('Absorption', 1.0), ('Scattering', 4.0), ('Anisotropy', 0.0)):
+                fs.serialize(param)
+                fs.serialize(1)
+                fs.serialize(value)
+        else:
+            fs.serialize(2)
+            fs.serialize(color_socket)
+            fs.serialize(3)
+            fs.serialize(color)
+            fs.serialize('Normal')
+            fs.serialize(3)
+            fs.serialize((0.0, 1.0, 0.0))
+
+        fs.serialize(1)
+        fs.serialize(node_name)
+        fs.serialize('Result')
+        fs.serialize('ShaderOutput_' + name)
+        fs.serialize(output_socket)
+
+    for name, kind, color in materials:
+        fs.serialize(SID('Material'))
+        fs.serialize(name)
+        if kind == 'smoke':
+            fs.serialize(SID('Invalid Surface Shader'))
+            fs.serialize(SID('Volume Shader'))
+            serialize_shader(name, kind, color, 'Volume')
+        else:
+            fs.serialize(SID('Surface Shader'))
+            serialize_shader(name, kind, color, 'Surface')
+            fs.serialize(SID('Invalid Volume Shader'))
+        fs.serialize(False)     # transparent
+        fs.serialize(False)     # sss
+        fs.serialize(0.1)       # volume step
+        fs.serialize(1024)      # volume step count
+
+    fs.serialize(SID('End of Material'))
+
+# the camera looks at the center of the scene from above
+def serialize_camera(args, fs):
+    xres, yres = args.resolution
+    fs.serialize(SID('PerspectiveCameraEntity'))
+    fs.serialize((0.0, SCENE_EXTENT * 0.6, -SCENE_EXTENT * 1.1))
+    fs.serialize((0.0, 1.0, 0.0))
+    fs.serialize((0.0, 0.0, 0.0))
+    fs.serialize((xres, yres))
+    fs.serialize(0.0)           # lens size
+    fs.serialize((36.0, 24.0))  # sensor size
+    fs.serialize(0)             # sensor fit, auto
+    fs.serialize((1.0, 1.0))    # pixel aspect ratio
+    fs.serialize(2.0 * math.atan(18.0 / 50.0))
+
+# hair strands growing on the center of the ground, each of them is its segment count followed by all of its points
+def serialize_hair(args, material_id, fs):
+    segments = args.hair_segments
+    rng = np.random.default_rng(args.seed + 1)
+
+    fs.serialize( SID('VisualEntity') )
+    fs.serialize( matrix_to_tuple( np.identity(4) ) )
+    fs.serialize( 1 )
+    fs.serialize( SID('HairVisual') )
+    fs.serialize( args.hair )
+    fs.serialize( 0.001 )   # width of tip
+    fs.serialize( 0.01 )    # width of bottom
+    fs.serialize( material_id )
+
+    t = np.linspace(0.0, 1.0, segments + 1, dtype=np.float32)
+    for first in range(0, args.hair, CHUNK_SIZE // ( segments + 1 ) + 1):
+        cnt = min(CHUNK_SIZE // ( segments + 1 ) + 1, args.hair - first)
+        radius = SCENE_EXTENT * 0.25 * np.sqrt(rng.random(cnt, dtype=np.float32))
+        angle = rng.random(cnt, dtype=np.float32) * 2.0 * math.pi
+        x = radius * np.cos(angle)
+        z = radius * np.sin(angle)
+        y, _ = wave(x, z)
+        length = 0.3 + 0.4 * rng.random(cnt, dtype=np.float32)
+        phase = rng.random(cnt, dtype=np.float32) * 2.0 * math.pi
+
+        records = np.empty((cnt, 1 + 3 * ( segments + 1 )), dtype=np.float32)
+        records.view(np.int32)[:, 0] = segments
+        points = records[:, 1:].reshape(cnt, segments + 1, 3)
+        curl = 0.1 * length[:, np.newaxis] * t
+        points[..., 0] = x[:, np.newaxis] + curl * np.cos(phase[:, np.newaxis] + t * math.pi)
+        points[..., 1] = y[:, np.newaxis] + length[:, np.newaxis] * t
+        points[..., 2] = z[:, np.newaxis] + curl * np.sin(phase[:, np.newaxis] + t * math.pi)
+        fs.serialize_array(records)
+
+# lights are spread evenly above the ground, the total power doesn't change with the number of lights
+def serialize_lights(args, fs):
+    cnt = args.lights
+    side = max( int(math.ceil(math.sqrt(cnt))) , 1 )
+    for i in range(cnt):
+        x = ( ( i % side + 0.5 ) / side - 0.5 ) * SCENE_EXTENT
+        z = ( ( i // side + 0.5 ) / side - 0.5 ) * SCENE_EXTENT
+        light_type = LIGHT_TYPES[i % len(LIGHT_TYPES)] if args.light_type == 'mixed' else args.light_type
+        energy = args.light_power / cnt
+
+        if light_type == 'point':
+            fs.serialize( SID('PointLightEntity') )
+            fs.serialize( matrix_to_tuple( translation(x, SCENE_EXTENT * 0.5, z) ) )
+        elif light_type == 'spot':
+            fs.serialize( SID('SpotLightEntity') )
+            fs.serialize( matrix_to_tuple( translation(x, SCENE_EXTENT * 0.5, z) @ FACING_DOWN ) )
+        else:
+            fs.serialize( SID('AreaLightEntity') )
+            fs.serialize( matrix_to_tuple( translation(x, SCENE_EXTENT * 0.5, z) @ FACING_DOWN ) )
+        fs.serialize( float(energy) )
+        fs.serialize( ( 1.0 , 1.0 , 1.0 ) )
+
+        if light_type == 'spot':
+            fs.serialize( 30.0 )    # falloff start
+            fs.serialize( 45.0 )    # falloff range
+        elif light_type == 'area':
+            fs.serialize( SID('SQUARE') )
+            fs.serialize( SCENE_EXTENT / side * 0.5 )
+
+# the accelerator, along with its default settings
+def serialize_accelerator(args, fs):
+    def serialize_settings(accelerator):
+        settings = ACCELERATOR_SETTINGS[accelerator]
+        if settings is not None:
+            fs.serialize( settings[0] )
+            fs.serialize( settings[1] )
+
+    if args.accelerator == 'Auto':
+        xres, yres = args.resolution
+        fs.serialize( SID('Auto') )
+        fs.serialize( os.path.join(tempfile.gettempdir(), 'sort_accelerator_cache.txt') )
+        fs.serialize( float(xres * yres * args.samples) )
+        fs.serialize( len(ACCELERATOR_CANDIDATES) )
+        for candidate in ACCELERATOR_CANDIDATES:
+            fs.serialize( candidate )
+            serialize_settings(candidate)
+    else:
+        fs.serialize( SID(args.accelerator) )
+        serialize_settings(args.accelerator)
+
+def generate(args):
+    rng = np.random.default_rng(args.seed)
+
+    # surface materials, followed by the smoke material if there is smoke
+    materials = []
+    for i in range(args.materials):
+        kind = 'mirror' if args.material_mix == 'mirror' or ( args.material_mix == 'mixed' and i % 2 == 1 ) else 'lambert'
+        color = tuple( float(c) for c in 0.2 + 0.8 * rng.random(3) )
+        materials.append(( 'Material_%d' % i , kind , color ))
+    surface_material_ids = list(range(args.materials))
+    if args.smoke > 0:
+        materials.append(( 'Smoke' , 'smoke' , ( 0.8 , 0.8 , 0.8 ) ))
+
+    if args.no_sections:
+        fs = stream.FileStream( args.output )
+    else:
+        fs = stream.SectionedFileStream( args.output )
+
+    serialize_global_config(args, fs)
+    serialize_materials(materials, fs)
+
+    # this is a special code for the render to identify that the serialized input is still valid.
+    fs.serialize( SID('verification bits') )
+    serialize_camera(args, fs)
+
+    total_vert_cnt = 0
+    total_prim_cnt = 0
+
+    # the ground is split into a square layout of grids, triangles are spread evenly among them
+    if args.triangles > 0:
+        mesh_cnt = max( min( args.meshes , args.triangles ) , 1 )
+        side = int(math.ceil(math.sqrt(mesh_cnt)))
+        tile = SCENE_EXTENT / side
+        for i in range(mesh_cnt):
+            triangle_cnt = args.triangles // mesh_cnt + ( 1 if i < args.triangles % mesh_cnt else 0 )
+            origin = ( ( i % side ) * tile - SCENE_EXTENT * 0.5 , ( i // side ) * tile - SCENE_EXTENT * 0.5 )
+            grid = Grid(triangle_cnt, origin, (tile, tile), surface_material_ids)
+
+            fs.serialize( SID('VisualEntity') )
+            fs.serialize( matrix_to_tuple( np.identity(4) ) )
+            fs.serialize( 1 )   # only one mesh for each mesh entity
+            serialize_mesh(grid, fs)
+            total_vert_cnt += grid.vertex_count()
+            total_prim_cnt += grid.triangle_count()
+
+    # a small wavy patch instanced all over the place above the ground, with random orientation and size
+    if args.instances > 0:
+        patch = Grid(args.instance_triangles, (-0.5, -0.5), (1.0, 1.0), surface_material_ids)
+        fs.serialize( SID('SharedGeometryEntity') )
+        fs.serialize( 0 )
+        serialize_mesh(patch, fs)
+
+        for _ in range(args.instances):
+            yaw, pitch = rng.random(2) * 2.0 * math.pi
+            scale = 0.2 + 0.8 * rng.random()
+            rotation = np.identity(4)
+            rotation[:3, :3] = np.array(((math.cos(yaw), 0.0, math.sin(yaw)), (0.0, 1.0, 0.0), (-math.sin(yaw), 0.0, math.cos(yaw)))) @ \
+                               np.array(((1.0, 0.0, 0.0), (0.0, math.cos(pitch), -math.sin(pitch)), (0.0, math.sin(pitch), math.cos(pitch)))) * scale
+            x, z = ( rng.random(2) - 0.5 ) * SCENE_EXTENT
+            y = 1.0 + 2.0 * rng.random()
+
+            fs.serialize( SID('InstanceEntity') )
+            fs.serialize( matrix_to_tuple( translation(x, y, z) @ rotation ) )
+            fs.serialize( 0 )
+        total_vert_cnt += patch.vertex_count()
+        total_prim_cnt += patch.triangle_count()
+
+    if args.hair > 0:
+        serialize_hair(args, surface_material_ids[0] if surface_material_ids else NO_MATERIAL, fs)
+        total_vert_cnt += args.hair * ( args.hair_segments + 1 )
+        total_prim_cnt += args.hair * args.hair_segments
+
+    if args.smoke > 0:
+        smoke = SmokeBox(args.smoke, (0.0, 3.0, 0.0), 4.0, len(materials) - 1, args.seed + 2)
+        fs.serialize( SID('VisualEntity') )
+        fs.serialize( matrix_to_tuple( np.identity(4) ) )
+        fs.serialize( 1 )
+        serialize_mesh(smoke, fs)
+        total_vert_cnt += smoke.vertex_count()
+        total_prim_cnt += smoke.triangle_count()
+
+    serialize_lights(args, fs)
+
+    # to indicate the scene stream comes to an end
+    fs.serialize(SID('End of Entities'))
+
+    serialize_accelerator(args, fs)
+    fs.close()
+
+    return (total_vert_cnt, total_prim_cnt)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic scene for benchmarking SORT. Counts accept suffixes K, M and G, like 100M.')
+    parser.add_argument('output', help='path of the generated scene, like scene.sort')
+    parser.add_argument('--triangles', type=parse_count, default=parse_count('1K'), help='triangles in the grids covering the ground, rounded up to whole quads of each grid')
+    parser.add_argument('--meshes', type=parse_count, default=1, help='number of grids the triangles are split into')
+    parser.add_argument('--instances', type=parse_count, default=0, help='instances of a shared mesh above the ground')
+    parser.add_argument('--instance-triangles', type=parse_count, default=128, help='triangles in the shared mesh')
+    parser.add_argument('--hair', type=parse_count, default=0, help='hair strands growing on the ground')
+    parser.add_argument('--hair-segments', type=int, default=4, help='segments of each hair strand')
+    parser.add_argument('--smoke', type=int, default=0, help='resolution of the smoke volume, no smoke if it is 0')
+    parser.add_argument('--lights', type=parse_count, default=1, help='number of lights')
+    parser.add_argument('--light-type', choices=LIGHT_TYPES + ['mixed'], default='point', help='type of the lights')
+    parser.add_argument('--light-power', type=float, default=2000.0, help='total power of all lights')
+    parser.add_argument('--materials', type=int, default=0, help='number of surface materials, everything uses the default material if it is 0')
+    parser.add_argument('--material-mix', choices=['lambert', 'mirror', 'mixed'], default='mixed', help='kind of surface materials')
+    parser.add_argument('--resolution', type=int, nargs=2, default=[640, 480], metavar=('WIDTH', 'HEIGHT'), help='resolution of the image')
+    parser.add_argument('--samples', type=int, default=1, help='samples per pixel')
+    parser.add_argument('--threads', type=int, default=0, help='number of threads, 0 means the number of physical cores')
+    parser.add_argument('--integrator', choices=INTEGRATORS, default='PathTracing', help='integrator used to render the scene')
+    parser.add_argument('--max-depth', type=int, default=16, help='maximum recursive depth of the integrator')
+    parser.add_argument('--accelerator', choices=ACCELERATOR_CANDIDATES + ['Auto'], default='Qbvh', help='spatial accelerator of the scene')
+    parser.add_argument('--no-sections', action='store_true', help='embed meshes in the scene instead of separate sections, like a streamed scene')
+    parser.add_argument('--seed', type=int, default=0, help='seed of everything random in the scene')
+    args = parser.parse_args()
+
+    current_time = time.time()
+    total_vert_cnt, total_prim_cnt = generate(args)
+
+    print( 'Generated %s in %.2f(s), %d bytes.' % (args.output, time.time() - current_time, os.path.getsize(args.output)) )
+    print( 'Total vertices: %d.' % total_vert_cnt )
+    print( 'Total primitives: %d.' % total_prim_cnt )
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,666 @@
+#
+#    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+#    platform physically based renderer.
+#
+#    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+#
+#    SORT is a free software written for educational purpose. Anyone can distribute
+#    or modify it under the the terms of the GNU General Public License Version 3 as
+#    published by the Free Software Foundation. However, there is NO warranty that
+#    all components are functional in a perfect manner. Without even the implied
+#    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+#    General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along with
+#    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+#
+
+# Inspect and validate a .sort scene without running SORT.
+#
+# The scene is parsed in one pass the same way SORT does, following the writer side of the exporter in the plugin. The
+# file is memory mapped and vertex, index and volume buffers are only looked at through numpy views of the mapped
+# memory, nothing is copied or loaded as a whole, so that huge scenes can be inspected as well. For example
+#
+#     python scripts/inspect_scene.py scene.sort --top 10
+#
+# It reports the global configuration, materials and entities with their byte sizes, vertex and primitive counts,
+# duplicated meshes and how many primitives use each material. Anything that would break SORT or look suspicious is
+# reported as a problem, the exit code is 1 if there is any.
+
+import os
+import sys
+import mmap
+import types
+import struct
+import hashlib
+import argparse
+import numpy as np
+
+# The SID of tags is computed by the plugin, only the modules that don't depend on Blender are loaded here.
+addon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blender-plugin', 'addons', 'sortblend')
+sortblend = types.ModuleType('sortblend')
+sortblend.__path__ = [addon_dir]
+sys.modules.setdefault('sortblend', sortblend)
+
+from sortblend.strid import SID
+
+# version of the global configuration this script understands
+GLOBAL_CONFIGURATION_VERSION = 2
+
+# header of a sectioned scene file and each entry of its table of sections, the same as 'SectionedFileStream'
+SECTIONED_FILE_MAGIC = b'SORTSCN\0'
+SECTIONED_FILE_HEADER = struct.Struct('=8sIIQ')
+SECTION_ENTRY = struct.Struct('=IQQ')
+
+# same brick size as the one used by the exporter of the plugin
+VOLUME_BRICK_SIZE = 8
+
+# number of triangles or vertices looked at a time, this bounds the temporary memory for huge meshes
+CHUNK_SIZE = 1024 * 1024
+
+# material id of primitives using the default material
+NO_MATERIAL = -1
+
+INTEGRATORS = [ 'PathTracing' , 'BidirPathTracing' , 'LightTracing' , 'InstantRadiosity' , 'AmbientOcclusion' , 'DirectLight' , 'WhittedRT' ]
+ACCELERATORS = [ 'Qbvh' , 'Obvh' , 'Bvh' , 'KDTree' , 'OcTree' , 'UniGrid' ]
+LIGHTS = [ 'DirLightEntity' , 'PointLightEntity' , 'SpotLightEntity' , 'AreaLightEntity' , 'SkyLightEntity' ]
+
+# names of all tags, used to tell what an unexpected tag is
+TAG_NAMES = { SID(name) : name for name in INTEGRATORS + ACCELERATORS + LIGHTS + [ 'Auto' , 'scene' , 'mesh' ,
+    'End of Material' , 'ShaderUnitTemplate' , 'ShaderGroupTemplate' , 'Material' , 'Surface Shader' , 'Invalid Surface Shader' ,
+    'Volume Shader' , 'Invalid Volume Shader' , 'verification bits' , 'PerspectiveCameraEntity' , 'VisualEntity' ,
+    'SharedGeometryEntity' , 'InstanceEntity' , 'End of Entities' , 'MeshVisual' , 'SectionMeshVisual' , 'CachedMeshVisual' ,
+    'HairVisual' , 'has_volume' , 'no_volume' , 'end of mesh' , 'SQUARE' , 'RECTANGLE' , 'DISK' ] }
+
+def tag_name(tag):
+    return TAG_NAMES.get(tag, '0x%08x' % tag)
+
+# Anything that breaks parsing the scene, it is raised with where it happens.
+class SceneError(Exception):
+    pass
+
+# Sequential reader of a range of a memory mapped file, values are decoded the same way as SORT does.
+class Reader:
+    def __init__(self, data, start, end, name):
+        self.data = data
+        self.pos = start
+        self.end = end
+        self.name = name
+
+    # make sure there are enough bytes left and move forward, the position of the skipped bytes is returned
+    def skip(self, size):
+        if size < 0 or self.pos + size > self.end:
+            raise SceneError('%s is truncated at offset %d, %d bytes are needed but only %d are left.' % (self.name, self.pos, size, self.end - self.pos))
+        pos = self.pos
+        self.pos += size
+        return pos
+
+    def unpack(self, fmt):
+        return fmt.unpack_from(self.data, self.skip(fmt.size))
+
+    def uint(self):
+        return self.unpack(UINT)[0]
+
+    def int(self):
+        return self.unpack(INT)[0]
+
+    def float(self):
+        return self.unpack(FLOAT)[0]
+
+    def bool(self):
+        return self.unpack(BOOL)[0]
+
+    def floats(self, cnt):
+        return self.unpack(struct.Struct('=%df' % cnt))
+
+    def string(self):
+        end = self.data.find(b'\0', self.pos, self.end)
+        if end < 0:
+            raise SceneError('%s has an unterminated string at offset %d.' % (self.name, self.pos))
+        value = self.data[self.pos:end].decode('ascii', errors='replace')
+        self.pos = end + 1
+        return value
+
+    # a numpy view of the mapped memory, nothing is copied
+    def array(self, dtype, cnt):
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.data, dtype=dtype, count=cnt, offset=self.skip(cnt * dtype.itemsize))
+
+    # make sure the next tag is the expected one
+    def expect(self, name):
+        pos = self.pos
+        tag = self.uint()
+        if tag != SID(name):
+            raise SceneError('%s expects \'%s\' at offset %d, but it is \'%s\'.' % (self.name, name, pos, tag_name(tag)))
+
+UINT = struct.Struct('=I')
+INT = struct.Struct('=i')
+FLOAT = struct.Struct('=f')
+BOOL = struct.Struct('=?')
+
+# what is known about an entity in the scene
+class Entity:
+    def __init__(self, index, kind, offset):
+        self.index = index
+        self.kind = kind
+        self.offset = offset
+        self.size = 0           # bytes of the entity, including sections and cached meshes it refers to
+        self.vertices = 0
+        self.primitives = 0
+        self.detail = ''
+
+class SceneInspector:
+    def __init__(self, path):
+        self.path = path
+        self.problems = []
+        self.sections = []
+        self.referenced_sections = set()
+        self.mapped_files = []
+
+        self.config = {}
+        self.resources = []
+        self.shader_units = {}              # type of shader unit -> bytes of its source
+        self.materials = []                 # ( name , bytes , description )
+        self.camera = None
+        self.entities = []
+        self.accelerator = None
+
+        self.mesh_hashes = {}               # hash of mesh data -> list of ( entity index , bytes )
+        self.material_usage = {}            # material id -> primitives in the file
+        self.geometries = {}                # id of shared geometry -> entity
+        self.instance_counts = {}           # id of shared geometry -> number of instances
+
+    def problem(self, message):
+        self.problems.append(message)
+
+    def map_file(self, path):
+        file = open(path, 'rb')
+        try:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b''
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            file.close()
+        self.mapped_files.append(data)
+        return data
+
+    def inspect(self):
+        data = self.map_file(self.path)
+        self.file_size = len(data)
+
+        # a sectioned file has the main part of the scene in the last section, everything else is in one piece
+        if data[:len(SECTIONED_FILE_MAGIC)] == SECTIONED_FILE_MAGIC:
+            reader = Reader(data, 0, len(data), 'header')
+            _, version, section_cnt, table_offset = reader.unpack(SECTIONED_FILE_HEADER)
+            self.format = 'sectioned, version %d' % version
+            if table_offset + section_cnt * SECTION_ENTRY.size > len(data):
+                raise SceneError('The table of sections is beyond the end of the file, the file is probably not closed properly.')
+            for i in range(section_cnt):
+                section = SECTION_ENTRY.unpack_from(data, table_offset + i * SECTION_ENTRY.size)
+                if section[1] + section[2] > table_offset:
+                    self.problem('Section %d is beyond the table of sections.' % i)
+                self.sections.append(section)
+            scene_sections = [ i for i, section in enumerate(self.sections) if section[0] == SID('scene') ]
+            if not scene_sections:
+                raise SceneError('There is no scene section in the file.')
+            _, offset, size = self.sections[scene_sections[-1]]
+            self.referenced_sections.add(scene_sections[-1])
+            reader = Reader(data, offset, offset + size, 'scene')
+        else:
+            self.format = 'plain'
+            reader = Reader(data, 0, len(data), 'scene')
+
+        self.read_global_config(reader)
+        self.read_materials(reader)
+        self.read_entities(reader)
+        self.read_accelerator(reader)
+
+        if reader.pos != reader.end:
+            self.problem('%d bytes are left after the accelerator.' % (reader.end - reader.pos))
+        for i, section in enumerate(self.sections):
+            if i not in self.referenced_sections:
+                self.problem('Section %d of type \'%s\' with %d bytes is never referred to.' % (i, tag_name(section[0]), section[2]))
+
+        self.validate()
+
+    def read_global_config(self, reader):
+        start = reader.pos
+        version = reader.uint()
+        if version != GLOBAL_CONFIGURATION_VERSION:
+            raise SceneError('Version %d of global configuration is not supported, it should be %d.' % (version, GLOBAL_CONFIGURATION_VERSION))
+
+        config = self.config
+        config['resource path'] = reader.string()
+        config['threads'] = reader.uint()
+        config['samples'] = reader.uint()
+        config['resolution'] = ( reader.uint() , reader.uint() )
+        config['clampping'] = reader.float()
+        config['border'] = ( reader.uint() , reader.uint() , reader.uint() , reader.uint() )
+        config['adaptive sampling'] = reader.bool()
+        config['noise threshold'] = reader.float()
+        config['min samples'] = reader.uint()
+        config['max samples'] = reader.uint()
+        config['show sample count'] = reader.bool()
+
+        integrator = tag_name(reader.uint())
+        config['integrator'] = integrator
+        config['max recursive depth'] = reader.uint()
+        if integrator == 'PathTracing':
+            config['max bssrdf bounces'] = reader.uint()
+        elif integrator == 'AmbientOcclusion':
+            config['max distance'] = reader.float()
+        elif integrator == 'BidirPathTracing' or integrator == 'LightTracing':
+            config['mis'] = reader.bool()
+        elif integrator == 'InstantRadiosity':
+            config['light path set num'] = reader.uint()
+            config['light path num'] = reader.uint()
+            config['min distance'] = reader.float()
+        elif integrator not in INTEGRATORS:
+            raise SceneError('Unknown integrator \'%s\'.' % integrator)
+        self.config_size = reader.pos - start
+
+        x, y, w, h = config['border']
+        xres, yres = config['resolution']
+        if w == 0 or h == 0 or x + w > xres or y + h > yres:
+            self.problem('Render border %s is not inside the image of %dx%d.' % (config['border'], xres, yres))
+
+    def read_shader_params(self, reader):
+        for _ in range(reader.uint()):
+            reader.string()
+            channels = reader.int()
+            if channels == 1:
+                reader.float()
+            elif channels == 3:
+                reader.floats(3)
+            elif channels == 4:
+                reader.string()
+
+    # nodes and connections of a shader, the number of nodes is returned
+    def read_shader_nodes(self, reader):
+        node_cnt = reader.uint()
+        for _ in range(node_cnt):
+            reader.string()
+            node_type = reader.string()
+            if node_type not in self.shader_units:
+                self.problem('Shader unit \'%s\' is used before it is defined.' % node_type)
+            self.read_shader_params(reader)
+        for _ in range(reader.uint()):
+            reader.string(), reader.string(), reader.string(), reader.string()
+        return node_cnt
+
+    def read_materials(self, reader):
+        start = reader.pos
+        for _ in range(reader.uint()):
+            path = reader.string()
+            resource_type = tag_name(reader.uint())
+            self.resources.append(( path , resource_type ))
+            if not os.path.exists(path):
+                self.problem('Resource \'%s\' doesn\'t exist.' % path)
+
+        while True:
+            offset = reader.pos
+            tag = reader.uint()
+            if tag == SID('End of Material'):
+                break
+            elif tag == SID('ShaderUnitTemplate'):
+                unit_type = reader.string()
+                source = reader.string()
+                for _ in range(reader.uint()):
+                    reader.string(), reader.string()
+                self.shader_units[unit_type] = len(source)
+            elif tag == SID('ShaderGroupTemplate'):
+                unit_type = reader.string()
+                self.read_shader_nodes(reader)
+                reader.string()
+                for _ in range(reader.uint()):
+                    reader.string()
+                if reader.string():
+                    for _ in range(reader.uint()):
+                        reader.string()
+                self.shader_units[unit_type] = reader.pos - offset
+            elif tag == SID('Material'):
+                name = reader.string()
+                shaders = []
+                for shader in ('Surface', 'Volume'):
+                    shader_tag = reader.uint()
+                    if shader_tag == SID(shader + ' Shader'):
+                        shaders.append('%s shader of %d nodes' % (shader.lower(), self.read_shader_nodes(reader)))
+                    elif shader_tag != SID('Invalid ' + shader + ' Shader'):
+                        raise SceneError('Material \'%s\' has unknown %s shader tag \'%s\'.' % (name, shader.lower(), tag_name(shader_tag)))
+                transparent = reader.bool()
+                sss = reader.bool()
+                reader.float()
+                reader.uint()
+                if transparent:
+                    shaders.append('transparent')
+                if sss:
+                    shaders.append('sss')
+                self.materials.append(( name , reader.pos - offset , ', '.join(shaders) if shaders else 'no shader' ))
+            else:
+                raise SceneError('Unknown material tag \'%s\' at offset %d.' % (tag_name(tag), offset))
+        self.materials_size = reader.pos - start
+
+    def read_camera(self, reader):
+        reader.expect('verification bits')
+        reader.expect('PerspectiveCameraEntity')
+        pos = reader.floats(3)
+        up = reader.floats(3)
+        target = reader.floats(3)
+        resolution = ( reader.uint() , reader.uint() )
+        reader.float()
+        reader.floats(2)
+        reader.uint()
+        reader.floats(2)
+        fov = reader.float()
+        self.camera = ( pos , up , target , resolution , fov )
+        if np.allclose(pos, target):
+            self.problem('Camera is at the same place as its target.')
+
+    def read_matrix(self, reader, entity):
+        matrix = reader.floats(16)
+        if not np.all(np.isfinite(matrix)):
+            self.problem('Entity %d has an invalid transform.' % entity.index)
+
+    def read_entities(self, reader):
+        self.read_camera(reader)
+        while True:
+            offset = reader.pos
+            tag = reader.uint()
+            if tag == SID('End of Entities'):
+                break
+
+            entity = Entity(len(self.entities), tag_name(tag), offset)
+            self.entities.append(entity)
+            if tag == SID('VisualEntity'):
+                self.read_matrix(reader, entity)
+                for _ in range(reader.uint()):
+                    self.read_visual(reader, entity)
+            elif tag == SID('SharedGeometryEntity'):
+                geometry_id = reader.uint()
+                if geometry_id in self.geometries:
+                    self.problem('Shared geometry %d is defined more than once.' % geometry_id)
+                self.geometries[geometry_id] = entity
+                self.instance_counts.setdefault(geometry_id, 0)
+                self.read_visual(reader, entity)
+                entity.detail = 'geometry %d' % geometry_id
+            elif tag == SID('InstanceEntity'):
+                self.read_matrix(reader, entity)
+                geometry_id = reader.uint()
+                if geometry_id not in self.geometries:
+                    self.problem('Instance entity %d refers to undefined shared geometry %d.' % (entity.index, geometry_id))
+                self.instance_counts[geometry_id] = self.instance_counts.get(geometry_id, 0) + 1
+                entity.detail = 'geometry %d' % geometry_id
+            elif tag in ( SID('DirLightEntity') , SID('PointLightEntity') , SID('SpotLightEntity') , SID('AreaLightEntity') ):
+                self.read_matrix(reader, entity)
+                energy = reader.float()
+                reader.floats(3)
+                entity.detail = 'energy %g' % energy
+                if tag == SID('SpotLightEntity'):
+                    reader.floats(2)
+                elif tag == SID('AreaLightEntity'):
+                    shape = reader.uint()
+                    if shape == SID('SQUARE') or shape == SID('DISK'):
+                        reader.float()
+                    elif shape == SID('RECTANGLE'):
+                        reader.floats(2)
+                    else:
+                        raise SceneError('Area light entity %d has unknown shape \'%s\'.' % (entity.index, tag_name(shape)))
+                    entity.detail += ', ' + tag_name(shape).lower()
+            elif tag == SID('SkyLightEntity'):
+                self.read_matrix(reader, entity)
+                reader.floats(4)
+                path = reader.string()
+                entity.detail = path
+                if not os.path.exists(path):
+                    self.problem('Sky light image \'%s\' doesn\'t exist.' % path)
+            else:
+                raise SceneError('Unknown entity \'%s\' at offset %d.' % (tag_name(tag), offset))
+            entity.size += reader.pos - offset
+
+    def read_visual(self, reader, entity):
+        tag = reader.uint()
+        if tag == SID('MeshVisual'):
+            self.read_mesh(reader, entity)
+        elif tag == SID('SectionMeshVisual'):
+            index = reader.uint()
+            if index >= len(self.sections):
+                raise SceneError('Entity %d refers to section %d, there are only %d sections.' % (entity.index, index, len(self.sections)))
+            if index in self.referenced_sections:
+                self.problem('Section %d is referred to more than once.' % index)
+            self.referenced_sections.add(index)
+            _, offset, size = self.sections[index]
+            section = Reader(reader.data, offset, offset + size, 'section %d' % index)
+            self.read_mesh(section, entity)
+            if section.pos != section.end:
+                self.problem('%d bytes are left in section %d after the mesh.' % (section.end - section.pos, index))
+            entity.size += size
+        elif tag == SID('CachedMeshVisual'):
+            path = reader.string()
+            if not os.path.exists(path):
+                self.problem('Cached mesh \'%s\' of entity %d doesn\'t exist.' % (path, entity.index))
+                return
+            data = self.map_file(path)
+            cached = Reader(data, 0, len(data), path)
+            self.read_mesh(cached, entity)
+            entity.size += len(data)
+        elif tag == SID('HairVisual'):
+            self.read_hair(reader, entity)
+        else:
+            raise SceneError('Entity %d has unknown visual \'%s\'.' % (entity.index, tag_name(tag)))
+
+    # the layout of 'Mesh::Serialize' in SORT
+    def read_mesh(self, reader, entity):
+        start = reader.pos
+        reader.bool()
+        vert_cnt = reader.int()
+        verts = reader.array(np.float32, vert_cnt * 8).reshape(-1, 8)
+        prim_cnt = reader.int()
+        tris = reader.array(np.int32, prim_cnt * 4).reshape(-1, 4)
+
+        # the volume data, if there is any
+        volume = ''
+        volume_tag = reader.uint()
+        if volume_tag == SID('has_volume'):
+            density = self.read_volume_grid(reader, 1, entity)
+            color = self.read_volume_grid(reader, 3, entity)
+            volume = ', volume %s' % 'x'.join( str(d) for d in density )
+            if density != color and color != (0, 0, 0):
+                self.problem('Density and color of the volume in entity %d have different resolutions.' % entity.index)
+        elif volume_tag != SID('no_volume'):
+            raise SceneError('Entity %d has unknown volume tag \'%s\'.' % (entity.index, tag_name(volume_tag)))
+        reader.expect('end of mesh')
+
+        for first in range(0, vert_cnt, CHUNK_SIZE):
+            if not np.all(np.isfinite(verts[first:first + CHUNK_SIZE])):
+                self.problem('Mesh of entity %d has vertices that are not finite.' % entity.index)
+                break
+
+        degenerated = 0
+        for first in range(0, prim_cnt, CHUNK_SIZE):
+            chunk = tris[first:first + CHUNK_SIZE]
+            ids = chunk[:, :3]
+            if ids.min() < 0 or ids.max() >= vert_cnt:
+                self.problem('Mesh of entity %d has triangles referring to vertices out of range.' % entity.index)
+                break
+            degenerated += int(np.count_nonzero((ids[:, 0] == ids[:, 1]) | (ids[:, 1] == ids[:, 2]) | (ids[:, 0] == ids[:, 2])))
+            material_ids, counts = np.unique(chunk[:, 3], return_counts=True)
+            for material_id, count in zip(material_ids.tolist(), counts.tolist()):
+                self.material_usage[material_id] = self.material_usage.get(material_id, 0) + count
+        if degenerated > 0:
+            self.problem('Mesh of entity %d has %d degenerated triangles.' % (entity.index, degenerated))
+
+        # identical meshes are found by hashing all of the mesh data, which is read from the mapped memory directly
+        size = reader.pos - start
+        digest = hashlib.blake2b(memoryview(reader.data)[start:reader.pos], digest_size=16).digest()
+        self.mesh_hashes.setdefault(digest, []).append(( entity.index , size ))
+
+        entity.vertices += vert_cnt
+        entity.primitives += prim_cnt
+        entity.detail = ( entity.detail + ', ' if entity.detail else '' ) + 'mesh' + volume
+
+    # a volume grid is stored as sparse bricks, see 'export_volume_grid' in the exporter
+    def read_volume_grid(self, reader, channels, entity):
+        resolution = ( reader.uint() , reader.uint() , reader.uint() )
+        if resolution == (0, 0, 0):
+            return resolution
+        brick_cnt = 1
+        for d in resolution:
+            brick_cnt *= ( d + VOLUME_BRICK_SIZE - 1 ) // VOLUME_BRICK_SIZE
+        occupied = reader.uint()
+        brick_indices = reader.array(np.int32, brick_cnt)
+        reader.array(np.float32, occupied * VOLUME_BRICK_SIZE ** 3 * channels)
+        if brick_cnt > 0 and ( brick_indices.max() >= occupied or brick_indices.min() < -1 ):
+            self.problem('Volume of entity %d has bricks out of range.' % entity.index)
+        return resolution
+
+    # each hair is its segment count followed by all of its points
+    def read_hair(self, reader, entity):
+        hair_cnt = reader.uint()
+        reader.floats(2)
+        material_id = reader.int()
+        entity.detail = ( entity.detail + ', ' if entity.detail else '' ) + '%d hair' % hair_cnt
+
+        # hair usually have the same number of segments, all of them are checked at once in this case
+        segment_cnt = 0
+        point_cnt = 0
+        if hair_cnt > 0 and reader.end - reader.pos >= 4:
+            segments = UINT.unpack_from(reader.data, reader.pos)[0]
+            record_size = 1 + 3 * ( segments + 1 )
+            if segments > 0 and reader.end - reader.pos >= hair_cnt * record_size * 4:
+                records = np.frombuffer(reader.data, dtype=np.uint32, count=hair_cnt * record_size, offset=reader.pos).reshape(hair_cnt, record_size)
+                if np.all(records[:, 0] == segments):
+                    reader.skip(records.nbytes)
+                    segment_cnt = segments * hair_cnt
+                    point_cnt = ( segments + 1 ) * hair_cnt
+                    hair_cnt = 0
+
+        for _ in range(hair_cnt):
+            segments = reader.uint()
+            if segments == 0:
+                continue
+            reader.array(np.float32, ( segments + 1 ) * 3)
+            segment_cnt += segments
+            point_cnt += segments + 1
+        self.material_usage[material_id] = self.material_usage.get(material_id, 0) + segment_cnt
+
+        entity.vertices += point_cnt
+        entity.primitives += segment_cnt
+
+    def read_accelerator(self, reader):
+        start = reader.pos
+        accelerator = tag_name(reader.uint())
+        if accelerator == 'Auto':
+            cache_path = reader.string()
+            expected_paths = reader.float()
+            candidates = []
+            for _ in range(reader.uint()):
+                candidate = reader.string()
+                candidates.append(candidate)
+                if candidate != 'UniGrid':
+                    reader.uint(), reader.uint()
+            self.accelerator = 'Auto among %s, cache %s, %g expected paths' % (', '.join(candidates), cache_path, expected_paths)
+        elif accelerator == 'UniGrid':
+            self.accelerator = accelerator
+        elif accelerator in ACCELERATORS:
+            self.accelerator = '%s, max depth %d, max primitives in leaf %d' % (accelerator, reader.uint(), reader.uint())
+        else:
+            raise SceneError('Unknown accelerator \'%s\'.' % accelerator)
+        self.accelerator_size = reader.pos - start
+
+    def validate(self):
+        material_cnt = len(self.materials)
+        for material_id in self.material_usage:
+            if material_id != NO_MATERIAL and not 0 <= material_id < material_cnt:
+                self.problem('%d primitives use material %d, there are only %d materials.' % (self.material_usage[material_id], material_id, material_cnt))
+        for material_id, ( name , _ , _ ) in enumerate(self.materials):
+            if material_id not in self.material_usage:
+                self.problem('Material \'%s\' is not used by any primitive.' % name)
+        for geometry_id, cnt in self.instance_counts.items():
+            if cnt == 0:
+                self.problem('Shared geometry %d is not used by any instance.' % geometry_id)
+        if not any( entity.kind in LIGHTS for entity in self.entities ):
+            self.problem('There is no light in the scene.')
+
+    def report(self, top):
+        def size_text(size):
+            for unit in ('B', 'KB', 'MB', 'GB'):
+                if size < 1024 or unit == 'GB':
+                    return ('%d %s' if unit == 'B' else '%.2f %s') % (size, unit)
+                size /= 1024.0
+
+        print('Scene %s, %s, %s, %d sections.' % (self.path, size_text(self.file_size), self.format, len(self.sections)))
+
+        print('\nGlobal configuration, %s' % size_text(self.config_size))
+        for key, value in self.config.items():
+            print('    %-20s %s' % (key, value))
+
+        print('\nMaterials, %s' % size_text(self.materials_size))
+        for path, resource_type in self.resources:
+            print('    resource %s, %s' % (path, resource_type))
+        print('    %d shader units, %s of source' % (len(self.shader_units), size_text(sum(self.shader_units.values()))))
+        for material_id, ( name , size , description ) in enumerate(self.materials):
+            print('    %4d %-32s %10s %12d primitives, %s' % (material_id, name, size_text(size), self.material_usage.get(material_id, 0), description))
+        if NO_MATERIAL in self.material_usage:
+            print('    %4s %-32s %10s %12d primitives' % ('', 'default material', '', self.material_usage[NO_MATERIAL]))
+
+        pos, up, target, resolution, fov = self.camera
+        print('\nCamera at (%g, %g, %g) looking at (%g, %g, %g), %dx%d, fov %g' % (pos + target + resolution + (fov,)))
+
+        kinds = {}
+        for entity in self.entities:
+            kind = kinds.setdefault(entity.kind, [0, 0, 0, 0])
+            kind[0] += 1
+            kind[1] += entity.size
+            kind[2] += entity.vertices
+            kind[3] += entity.primitives
+        print('\nEntities')
+        for name, ( cnt , size , vertices , primitives ) in kinds.items():
+            print('    %-24s %8d entities %10s %14d vertices %14d primitives' % (name, cnt, size_text(size), vertices, primitives))
+
+        # primitives of shared geometries count once for each instance in the rendered scene
+        total_primitives = sum( entity.primitives for entity in self.entities if entity.kind != 'SharedGeometryEntity' )
+        total_primitives += sum( self.geometries[geometry_id].primitives * cnt for geometry_id, cnt in self.instance_counts.items() if geometry_id in self.geometries )
+        print('    %d primitives in the file, %d primitives once instanced.' % (sum( entity.primitives for entity in self.entities ), total_primitives))
+
+        if top > 0:
+            print('\nLargest entities')
+            for entity in sorted(self.entities, key=lambda e: e.size, reverse=True)[:top]:
+                print('    %6d %-24s %10s %14d vertices %14d primitives  %s' % (entity.index, entity.kind, size_text(entity.size), entity.vertices, entity.primitives, entity.detail))
+
+        duplicates = [ entries for entries in self.mesh_hashes.values() if len(entries) > 1 ]
+        if duplicates:
+            wasted = sum( entries[0][1] * ( len(entries) - 1 ) for entries in duplicates )
+            print('\nDuplicated meshes, %s could be saved by sharing them' % size_text(wasted))
+            for entries in sorted(duplicates, key=lambda e: e[0][1] * len(e), reverse=True)[:max(top, 1)]:
+                print('    %d copies of %s in entities %s' % (len(entries), size_text(entries[0][1]), ', '.join( str(index) for index, _ in entries )))
+
+        print('\nAccelerator: %s' % self.accelerator)
+
+        if self.problems:
+            print('\n%d problems' % len(self.problems))
+            for problem in self.problems:
+                print('    ' + problem)
+        else:
+            print('\nNo problem found.')
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and validate a scene exported for SORT.')
+    parser.add_argument('scene', help='path of the scene, like scene.sort')
+    parser.add_argument('--top', type=int, default=10, help='number of the largest entities and duplicated meshes listed')
+    args = parser.parse_args()
+
+    inspector = SceneInspector(args.scene)
+    try:
+        inspector.inspect()
+    except SceneError as exc:
+        inspector.problem('Parsing stopped: %s' % exc)
+        print('Failed to parse %s: %s' % (args.scene, exc))
+        for problem in inspector.problems[:-1]:
+            print('    ' + problem)
+        sys.exit(1)
+
+    inspector.report(args.top)
+    sys.exit(1 if inspector.problems else 0)
+
+if __name__=="__main__":
+    main()
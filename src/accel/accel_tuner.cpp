@@ -0,0 +1,267 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <fstream>
+#include <random>
+#include "accel_tuner.h"
+#include "core/scene.h"
+#include "core/log.h"
+#include "core/samplemethod.h"
+#include "camera/camera.h"
+#include "sampler/sample.h"
+
+// Camera rays traced by each candidate, each of them is followed by a bounce ray if it hits anything.
+static constexpr unsigned TUNER_RAY_GRID = 128;
+// Random numbers for the benchmark rays are the same in every run so that candidates are compared on the same rays.
+static constexpr unsigned TUNER_RANDOM_SEED = 1024;
+
+namespace {
+    // A camera ray and the random numbers for the direction of the bounce ray after it.
+    struct TunerRay {
+        Ray     ray;
+        float   u , v;
+    };
+
+    // Stream keeping a copy of every byte loaded through it, the settings of candidates are recorded this way no
+    // matter what settings each of them has.
+    class RecordingStream : public IStreamBase {
+    public:
+        RecordingStream( IStreamBase& source ) : m_source( source ) {}
+
+        StreamBase& operator >> (float& v) override { return Load( reinterpret_cast<char*>(&v) , sizeof(float) ); }
+        StreamBase& operator >> (int& v) override { return Load( reinterpret_cast<char*>(&v) , sizeof(int) ); }
+        StreamBase& operator >> (char& v) override { return Load( reinterpret_cast<char*>(&v) , sizeof(char) ); }
+        StreamBase& operator >> (unsigned int& v) override { return Load( reinterpret_cast<char*>(&v) , sizeof(unsigned int) ); }
+        StreamBase& operator >> (bool& v) override { return Load( reinterpret_cast<char*>(&v) , sizeof(bool) ); }
+
+        StreamBase& operator >> (std::string& v) override {
+            v = "";
+            char c;
+            do{
+                Load( &c , sizeof(char) );
+                if( c == 0 )
+                    break;
+                v += c;
+            }while( true );
+            return *this;
+        }
+
+        StreamBase& Load( char* data , int size ) override {
+            m_source.Load( data , size );
+            m_data.append( data , size );
+            return *this;
+        }
+
+        bool IsBroken() const override { return m_source.IsBroken(); }
+
+        const std::string& GetData() const { return m_data; }
+
+    private:
+        IStreamBase&    m_source;
+        std::string     m_data;
+    };
+
+    // Fowler-Noll-Vo hash, it is good enough to tell scenes apart.
+    SORT_FORCEINLINE void hashData( unsigned long long& hash , const void* data , size_t size ){
+        const auto bytes = (const unsigned char*)data;
+        for( size_t i = 0 ; i < size ; ++i ){
+            hash ^= bytes[i];
+            hash *= 1099511628211ull;
+        }
+    }
+}
+
+void AcceleratorTuner::Serialize( IStreamBase& stream ){
+    stream >> m_cache_path;
+    stream >> m_expected_paths;
+
+    unsigned candidate_cnt = 0;
+    stream >> candidate_cnt;
+    for( auto i = 0u ; i < candidate_cnt ; ++i ){
+        std::string type;
+        stream >> type;
+        auto candidate = MakeUniqueInstance<Accelerator>(StringID(type));
+        sAssertMsg( candidate , RESOURCE , "Serialization is broken." );
+
+        RecordingStream settings( stream );
+        candidate->Serialize(settings);
+        m_candidate_types.push_back(type);
+        m_candidate_settings.push_back(settings.GetData());
+        m_candidates.push_back(std::move(candidate));
+    }
+}
+
+std::unique_ptr<Accelerator> AcceleratorTuner::Tune( const Scene& scene ){
+    if( m_candidates.empty() )
+        return nullptr;
+
+    const auto& primitives = scene.GetPrimitives();
+    const auto& bbox = scene.GetBBox();
+
+    // the scene is benchmarked before, there is no need to do it again
+    const auto hash = hashScene( scene );
+    const auto cached = loadChoice( hash );
+    if( cached >= 0 ){
+        slog( INFO , GENERAL , "%s is picked for the scene before, benchmarking is skipped." , m_candidate_types[cached].c_str() );
+        auto accelerator = std::move(m_candidates[cached]);
+        accelerator->Build( primitives , bbox );
+        m_candidates.clear();
+        return accelerator;
+    }
+
+    // camera rays going through a grid of pixels, rays from the center of the scene if there is no camera
+    std::vector<TunerRay> rays;
+    std::mt19937 rng( TUNER_RANDOM_SEED );
+    std::uniform_real_distribution<float> dis( 0.0f , 1.0f );
+    const auto camera = scene.GetCamera();
+    const auto resolution = camera ? camera->GetImageResolution() : Vector2i( 1 , 1 );
+    PixelSample ps;
+    ps.dof_u = ps.dof_v = 0.0f;
+    for( auto i = 0u ; i < TUNER_RAY_GRID ; ++i ){
+        for( auto j = 0u ; j < TUNER_RAY_GRID ; ++j ){
+            TunerRay tuner_ray;
+            if( camera ){
+                ps.img_u = dis(rng);
+                ps.img_v = dis(rng);
+                const auto x = j * resolution.x / TUNER_RAY_GRID;
+                const auto y = i * resolution.y / TUNER_RAY_GRID;
+                tuner_ray.ray = camera->GenerateRay( (float)x , (float)y , ps );
+            }else{
+                const auto u = dis(rng);
+                const auto v = dis(rng);
+                tuner_ray.ray = Ray( ( bbox.m_Min + bbox.m_Max ) * 0.5f , UniformSampleSphere( u , v ) );
+            }
+            tuner_ray.u = dis(rng);
+            tuner_ray.v = dis(rng);
+            rays.push_back( tuner_ray );
+        }
+    }
+
+    using clock = std::chrono::high_resolution_clock;
+    const auto path_scale = std::max( m_expected_paths , (float)rays.size() ) / (float)rays.size();
+
+    auto best = -1;
+    auto best_cost = FLT_MAX;
+    for( auto k = 0u ; k < m_candidates.size() ; ++k ){
+        auto& candidate = m_candidates[k];
+
+        const auto build_start = clock::now();
+        candidate->Build( primitives , bbox );
+        const auto build_time = std::chrono::duration<float>( clock::now() - build_start ).count();
+
+        // a fresh render context for each candidate, the traversal stack of the fast BVHs depends on their depth
+        RenderContext rc;
+        rc.Init();
+
+        auto trace_time = 0.0f;
+        auto given_up = false;
+        const auto trace_start = clock::now();
+        for( auto i = 0u ; i < rays.size() && !given_up ; ++i ){
+            const auto& tuner_ray = rays[i];
+
+            SurfaceInteraction intersection;
+            if( candidate->GetIntersect( rc , tuner_ray.ray , intersection ) ){
+                // a diffuse bounce, the ray is incoherent with its neighbours
+                auto wi = UniformSampleSphere( tuner_ray.u , tuner_ray.v );
+                if( dot( wi , intersection.gnormal ) * dot( tuner_ray.ray.m_Dir , intersection.gnormal ) > 0.0f )
+                    wi = -wi;
+
+                SurfaceInteraction bounce_intersection;
+                candidate->GetIntersect( rc , Ray( intersection.intersect , wi , 0 , 0.001f ) , bounce_intersection );
+            }
+            rc.Reset();
+
+            // there is no point to keep going once a candidate can't be the fastest one anymore
+            if( ( i & 255 ) == 255 ){
+                trace_time = std::chrono::duration<float>( clock::now() - trace_start ).count();
+                given_up = build_time + trace_time * path_scale > best_cost;
+            }
+        }
+        trace_time = std::chrono::duration<float>( clock::now() - trace_start ).count();
+
+        const auto cost = build_time + trace_time * path_scale;
+        slog( INFO , GENERAL , "%s is built in %.3f (s), tracing the benchmark rays takes %.3f (s)%s." , m_candidate_types[k].c_str() , build_time , trace_time , given_up ? ", it is given up" : "" );
+        if( !given_up && cost < best_cost ){
+            if( best >= 0 )
+                m_candidates[best] = nullptr;
+            best = k;
+            best_cost = cost;
+        } else {
+            // memory of the candidates that lose is released as soon as possible
+            candidate = nullptr;
+        }
+    }
+
+    slog( INFO , GENERAL , "%s is the fastest accelerator, its expected cost is %.3f (s)." , m_candidate_types[best].c_str() , best_cost );
+    saveChoice( hash , best );
+
+    auto accelerator = std::move(m_candidates[best]);
+    m_candidates.clear();
+    return accelerator;
+}
+
+unsigned long long AcceleratorTuner::hashScene( const Scene& scene ) const{
+    auto hash = 14695981039346656037ull;
+    for( auto i = 0u ; i < m_candidate_types.size() ; ++i ){
+        hashData( hash , m_candidate_types[i].c_str() , m_candidate_types[i].size() + 1 );
+        hashData( hash , m_candidate_settings[i].data() , m_candidate_settings[i].size() );
+    }
+
+    // the cheapest candidate depends on how many paths are traced, a rendering with a few times more or less samples
+    // is still likely to pick the same one, a rendering with orders of magnitude more samples is not.
+    const auto path_bucket = m_expected_paths > 1.0f ? (int)std::log2( m_expected_paths ) / 2 : 0;
+    hashData( hash , &path_bucket , sizeof( path_bucket ) );
+    for( const auto primitive : scene.GetPrimitives() ){
+        const auto& bbox = primitive->GetBBox();
+        hashData( hash , &bbox.m_Min , sizeof( bbox.m_Min ) );
+        hashData( hash , &bbox.m_Max , sizeof( bbox.m_Max ) );
+    }
+    return hash;
+}
+
+int AcceleratorTuner::loadChoice( unsigned long long hash ) const{
+    if( m_cache_path.empty() )
+        return -1;
+
+    // each line is the hash of a scene and the type of the accelerator picked for it, the latest line wins
+    std::ifstream file( m_cache_path );
+    std::string choice;
+    unsigned long long scene_hash = 0;
+    std::string type;
+    while( file >> std::hex >> scene_hash >> type ){
+        if( scene_hash == hash )
+            choice = type;
+    }
+
+    const auto it = std::find( m_candidate_types.begin() , m_candidate_types.end() , choice );
+    return it == m_candidate_types.end() ? -1 : (int)( it - m_candidate_types.begin() );
+}
+
+void AcceleratorTuner::saveChoice( unsigned long long hash , int index ) const{
+    if( m_cache_path.empty() || index < 0 )
+        return;
+
+    std::ofstream file( m_cache_path , std::ios::app );
+    if( !file ){
+        slog( WARNING , GENERAL , "Failed to save the accelerator choice in %s." , m_cache_path.c_str() );
+        return;
+    }
+    file << std::hex << hash << " " << m_candidate_types[index] << std::endl;
+}
@@ -0,0 +1,70 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include <vector>
+#include <memory>
+#include "accelerator.h"
+
+class Scene;
+
+//! @brief  Pick the fastest acceleration structure for a scene.
+/**
+ * There is no single spatial acceleration structure that is the fastest in all scenes, it depends on the geometry and
+ * where it is looked at. The tuner builds every candidate on the scene and traces the same batch of camera rays and
+ * one bounce ray after each of them. The cost of a candidate is its construction time plus the tracing time of the
+ * batch scaled up to the number of paths the whole rendering is expected to trace, the cheapest one is picked.
+ *
+ * The choice is saved in a cache file along with a hash of the scene content, benchmarking only happens again once
+ * the geometry, the set of candidates, their settings or the magnitude of the expected number of paths changes.
+ */
+class AcceleratorTuner : public SerializableObject{
+public:
+    //! @brief  Serialize the tuner configuration, including the configuration of all candidates.
+    //!
+    //! @param  stream      Input stream.
+    void    Serialize( IStreamBase& stream ) override;
+
+    //! @brief  Build the fastest acceleration structure for the scene.
+    //!
+    //! @param  scene       The scene, its primitives and camera are needed.
+    //! @return             The acceleration structure that is already built, nullptr if there is no candidate.
+    std::unique_ptr<Accelerator>    Tune( const Scene& scene );
+
+private:
+    std::string                                 m_cache_path;           /**< File the choices for all scenes are saved in, nothing is cached if it is empty. */
+    float                                       m_expected_paths = 0.0f; /**< Number of paths the whole rendering is expected to trace. */
+    std::vector<std::string>                    m_candidate_types;      /**< Type of each candidate, like 'Qbvh'. */
+    std::vector<std::string>                    m_candidate_settings;   /**< Serialized settings of each candidate. */
+    std::vector<std::unique_ptr<Accelerator>>   m_candidates;           /**< Candidates that are configured, but not built yet. */
+
+    //! @brief  Hash of the scene content, the set of candidates and everything the choice depends on.
+    unsigned long long  hashScene( const Scene& scene ) const;
+
+    //! @brief  Look for the choice made for a scene before.
+    //!
+    //! @param  hash        Hash of the scene.
+    //! @return             Index of the candidate picked before, -1 if there is none or it is not a candidate anymore.
+    int     loadChoice( unsigned long long hash ) const;
+
+    //! @brief  Save the choice made for a scene so that it is not benchmarked again.
+    //!
+    //! @param  hash        Hash of the scene.
+    //! @param  index       Index of the candidate picked.
+    void    saveChoice( unsigned long long hash , int index ) const;
+};
@@ -141,6 +141,25 @@ bool Bvh::GetIntersect(RenderContext& rc, const Ray& ray, SurfaceInteraction& in
     return false;
 }
 
+bool Bvh::GetIntersect( const Ray& ray , SurfaceInteraction* intersect ) const{
+    if( !m_isValid )
+        return false;
+
+    ray.Prepare();
+
+    const auto fmin = Intersect(ray, m_bbox);
+    if (fmin < 0.0f)
+        return false;
+
+    if( IS_PTR_INVALID(intersect) || isShadowRay( intersect ) )
+        return traverseNode(m_root.get(), ray, intersect, fmin);
+
+    // the traversal also returns true when the ray is blocked by a nearer intersection found before, which is not
+    // an intersection with this primitive set, only a nearer one counts.
+    const auto t = intersect->t;
+    return traverseNode(m_root.get(), ray, intersect, fmin) && intersect->t < t;
+}
+
 #ifndef ENABLE_TRANSPARENT_SHADOW
 bool Bvh::IsOccluded( const Ray& ray ) const{
     SORT_PROFILE("Traverse Bvh");
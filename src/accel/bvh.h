@@ -68,6 +68,18 @@ public:
     //!                     it returns false.
     bool    GetIntersect( RenderContext& rc, const Ray& r , SurfaceInteraction& intersect ) const override;
 
+    //! @brief Get intersection between the ray and the primitive set without a render context.
+    //!
+    //! Unlike the other acceleration structures, BVH traversal is recursive and doesn't touch any per-thread
+    //! traversal stack in the render context. This makes it possible to traverse a BVH in the middle of
+    //! traversing another acceleration structure, which is exactly what instanced geometry needs for its
+    //! bottom level acceleration structure.
+    //!
+    //! @param r            The input ray to be tested, it is in the same space with the primitives.
+    //! @param intersect    The intersection result. It is only updated when a nearer intersection is found.
+    //! @return             Whether there is a nearer intersection.
+    bool    GetIntersect( const Ray& r , SurfaceInteraction* intersect ) const;
+
 #ifndef ENABLE_TRANSPARENT_SHADOW
     //! @brief This is a dedicated interface for detecting shadow rays.
     //!
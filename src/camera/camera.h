@@ -73,6 +73,18 @@ public:
         return Vector2i(m_image_width, m_image_height);
     }
 
+    //! @brief Change the resolution of the target image.
+    //!
+    //! The field of view stays the same, only the number of pixels covering it changes.
+    //!
+    //! @param width    Width of the target image.
+    //! @param height   Height of the target image.
+    void SetImageResolution( unsigned width , unsigned height ){
+        m_image_width = width;
+        m_image_height = height;
+        PreProcess();
+    }
+
 protected:
     Point           m_eye;                      /**< Viewing point of the camera. */
     float           m_sensorW = 0.0f;           /**< Image sensor width. */
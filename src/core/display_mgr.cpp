@@ -41,10 +41,81 @@ void DisplayManager::SetupDisplayServer(const std::string host, const std::strin
     }
 }
 
+bool DisplayManager::SetupSharedFramebuffer(const std::string& path, const int width, const int height) {
+    auto file = std::make_unique<MappedFile>(path, true);
+    if (!file->IsValid() || file->GetSize() < (size_t)width * height * 4 * sizeof(float)) {
+        slog(WARNING, SOCKET, "Shared frame buffer %s is not available, pixels will go through socket.", path.c_str());
+        return false;
+    }
+
+    slog(INFO, SOCKET, "Pixels are shared with display server through %s.", path.c_str());
+    m_shared_framebuffer = std::move(file);
+    m_shared_framebuffer_w = width;
+    m_shared_framebuffer_h = height;
+    return true;
+}
+
+bool DisplayManager::WriteSharedTile(const int x, const int y, const int w, const int h, const float* data) {
+    if (!m_shared_framebuffer)
+        return false;
+
+    if (x < 0 || y < 0 || x + w > m_shared_framebuffer_w || y + h > m_shared_framebuffer_h)
+        return false;
+
+    // rows of both the tile and the frame buffer go from bottom to top
+    auto framebuffer = reinterpret_cast<float*>(m_shared_framebuffer->GetWritableData());
+    const auto bottom = m_shared_framebuffer_h - y - h;
+    for (auto i = 0; i < h; ++i)
+        memcpy(framebuffer + 4 * ((size_t)(bottom + i) * m_shared_framebuffer_w + x), data + 4 * i * w, sizeof(float) * 4 * w);
+    return true;
+}
+
 bool DisplayManager::IsDisplayServerConnected() const {
     return m_display_server_connected;
 }
 
+bool DisplayManager::IsDisplayServerLost() {
+    if (!m_display_server_connected || !IsSocketClosedByPeer(m_socket_connection.get()))
+        return false;
+
+    slog(INFO, SOCKET, "Display server is gone.");
+    m_display_server_connected = false;
+    return true;
+}
+
+bool DisplayManager::ReceiveView(std::string& view) {
+    if (!m_display_server_connected)
+        return false;
+
+    // take whatever has arrived, a closed connection is left to be found by IsDisplayServerLost
+    char buffer[1024];
+    while (IsSocketReadable(m_socket_connection.get())) {
+        const auto cnt = recv(m_socket_connection->m_socket, buffer, sizeof(buffer), 0);
+        if (cnt <= 0)
+            break;
+        m_received.append(buffer, cnt);
+    }
+
+    // only the latest view matters if several of them have arrived
+    auto received = false;
+    while (m_received.size() >= sizeof(int)) {
+        int size = 0;
+        memcpy(&size, m_received.data(), sizeof(int));
+        if (size < 0) {
+            slog(WARNING, SOCKET, "Invalid view from display server, it is ignored.");
+            m_received.clear();
+            break;
+        }
+        if (m_received.size() < sizeof(int) + size)
+            break;
+
+        view = m_received.substr(sizeof(int), size);
+        m_received.erase(0, sizeof(int) + size);
+        received = true;
+    }
+    return received;
+}
+
 void DisplayManager::ProcessDisplayQueue(int cnt) {
     // don't process anything if the server is not even connected
     if (!m_display_server_connected)
@@ -80,12 +151,27 @@ void DisplayManager::DisconnectDisplayServer() {
         slog(INFO, SOCKET, "Disconnect display server.");
         DisconnectSocket(m_socket_connection.get());
     }
+
+    // a render daemon may render again with a different display server
+    m_display_server_connected = false;
+    m_socket_connection = nullptr;
+    m_received.clear();
+    m_stream = nullptr;
+    m_shared_framebuffer = nullptr;
 }
 
 void DisplayTile::Process(std::unique_ptr<OSocketStream>& ptr_stream) {
     OSocketStream& stream = *ptr_stream;
 
     if (is_blender_mode){
+        // Pixels are already in the shared frame buffer, the display server only needs to know where the tile is.
+        if (DisplayManager::GetSingleton().WriteSharedTile(x, y, w, h, m_data[0].get())) {
+            stream << int(sizeof(int) * 4);
+            stream << w << h << x << y;
+            stream.Flush();
+            return;
+        }
+
         // [0] Length of the package, it doesn't count itself
         // [1] Width of the tile
         // [2] Height of the tile
@@ -214,7 +300,7 @@ void FullTargetUpdate::Process(std::unique_ptr<OSocketStream>& ptr_stream) {
     auto display_tile = std::make_shared<DisplayTile>(title, 0, 0, w, h, is_blender_mode);
     for( auto i = 0u ; i < h;  ++i ){
         for( auto j = 0u ; j < w; ++j ){
-            const auto& color = m_rt->GetColor(j, i);
+            const auto& color = m_rt->GetColor(m_x + j, m_y + i);
             display_tile->UpdatePixel(j, i, color);
         }
     }
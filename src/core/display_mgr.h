@@ -22,6 +22,7 @@
 #include "core/singleton.h"
 #include "core/socket.h"
 #include "stream/sstream.h"
+#include "stream/mmstream.h"
 #include "texture/rendertarget.h"
 
 class RenderTarget;
@@ -98,9 +99,13 @@ struct DisplayImageInfo : public DisplayItemBase {
 struct FullTargetUpdate : public DisplayItemBase {
     FullTargetUpdate(const std::string& title, const RenderTarget* rt, const bool is_blender_mode)
         :DisplayItemBase(title, rt->GetWidth(), rt->GetHeight(), is_blender_mode), m_rt(rt) {}
+    //! @brief  Only a region of the target is displayed, it shows up as the whole image.
+    FullTargetUpdate(const std::string& title, const RenderTarget* rt, const int x, const int y, const int w, const int h, const bool is_blender_mode)
+        :DisplayItemBase(title, w, h, is_blender_mode), m_rt(rt), m_x(x), m_y(y) {}
     void Process(std::unique_ptr<OSocketStream>& stream) override;
 private:
     const RenderTarget* const m_rt = nullptr;
+    const int m_x = 0, m_y = 0;     // top left corner of the displayed region in the target
 };
 
 //! @brief  Display is responsible for displaying intermediate result of the ray traced images.
@@ -122,6 +127,28 @@ public:
     //! @param port         The port the server is listening.
     void SetupDisplayServer(const std::string host, const std::string& port);
 
+    //! @brief  Share pixels with the display server through a memory mapped file.
+    //!
+    //! This is only supported by Blender. Tiles are written to the file directly and only a small notification of
+    //! each tile goes through the socket, instead of all the pixels. The file is created by the display server and
+    //! its size needs to fit the whole image, four floats per pixel, bottom row first.
+    //!
+    //! @param path         Path of the file shared with the display server.
+    //! @param width        Width of the image.
+    //! @param height       Height of the image.
+    //! @return             Whether the file is mapped successfully.
+    bool SetupSharedFramebuffer(const std::string& path, const int width, const int height);
+
+    //! @brief  Write a tile to the shared frame buffer.
+    //!
+    //! @param x            X position of the tile.
+    //! @param y            Y position of the tile.
+    //! @param w            Width of the tile.
+    //! @param h            Height of the tile.
+    //! @param data         Pixels of the tile, four floats per pixel, bottom row first.
+    //! @return             Whether the tile is written, the tile needs to go through the socket otherwise.
+    bool WriteSharedTile(const int x, const int y, const int w, const int h, const float* data);
+
     //! @brief  Refresh the tile in display servers
     //!
     //! @param item         A display item to process
@@ -141,6 +168,24 @@ public:
     //!
     bool IsDisplayServerConnected() const;
 
+    //! @brief  Whether the display server has gone away after being connected.
+    //!
+    //! Blender closes the connection once it is no longer interested in the render, either the render is cancelled
+    //! or it is a viewport render that is out of date already. Nothing is sent to the display server afterwards.
+    //!
+    //! @return             True if the display server was connected and has gone away.
+    bool IsDisplayServerLost();
+
+    //! @brief  Take the latest view sent by the display server.
+    //!
+    //! Blender sends the camera of a viewport through the display connection whenever the view changes so that an
+    //! interactive render goes on with the new view instead of loading the scene again. Each view is the size of it
+    //! followed by the camera entity, serialized the same way as it is in the scene. This doesn't block at all.
+    //!
+    //! @param view         The latest view, it is left untouched if there is no complete view received.
+    //! @return             Whether a new view is received.
+    bool ReceiveView(std::string& view);
+
 private:
     /**< This data structure keeps track of all streams of servers. */
     std::unique_ptr<OSocketStream>                  m_stream;
@@ -154,4 +199,13 @@ private:
 
     /**< The socket of the server. */
     std::unique_ptr<SocketConnection>               m_socket_connection;
+    /**< Data received from the display server that doesn't make a complete view yet. */
+    std::string                                     m_received;
+
+    /**< The frame buffer shared with the display server, it is nullptr if pixels go through the socket. */
+    std::unique_ptr<MappedFile>                     m_shared_framebuffer;
+    /**< Width of the shared frame buffer. */
+    int                                             m_shared_framebuffer_w = 0;
+    /**< Height of the shared frame buffer. */
+    int                                             m_shared_framebuffer_h = 0;
 };
\ No newline at end of file
@@ -113,18 +113,39 @@ void Mesh::Serialize(IStreamBase& stream) {
     unsigned int vb_cnt, ib_cnt;
     stream >> vb_cnt;
     m_vertices.resize(vb_cnt);
-    for (MeshVertex& mv : m_vertices)
-        stream >> mv.m_position >> mv.m_normal >> mv.m_texCoord;
+
+    // Vertices and triangles are tightly packed in the stream, they are loaded in chunks instead of streaming
+    // each single value, which is a lot cheaper for streams backed by memory mapped files or sockets.
+    constexpr unsigned int chunk_size = 4096;
+    std::vector<float> chunk(chunk_size * 8);
+    for (auto i = 0u; i < vb_cnt; i += chunk_size) {
+        const auto cnt = std::min(chunk_size, vb_cnt - i);
+        stream.Load(reinterpret_cast<char*>(chunk.data()), cnt * 8 * sizeof(float));
+        for (auto j = 0u; j < cnt; ++j) {
+            const auto v = chunk.data() + j * 8;
+            auto& mv = m_vertices[i + j];
+            mv.m_position = Point(v[0], v[1], v[2]);
+            mv.m_normal = Vector(v[3], v[4], v[5]);
+            mv.m_texCoord = Vector2f(v[6], v[7]);
+        }
+    }
 
     // mapping from original material to material proxy
     std::unordered_map<const MaterialBase*, const MaterialBase*> mapping;
 
     stream >> ib_cnt;
     m_indices.resize(ib_cnt);
-    for (auto& mi : m_indices) {
-        stream >> mi.m_id[0] >> mi.m_id[1] >> mi.m_id[2];
-        int mat_id = -1;
-        stream >> mat_id;
+    std::vector<int> indices(chunk_size * 4);
+    for (auto i = 0u; i < ib_cnt; ++i) {
+        const auto k = i % chunk_size;
+        if (0 == k)
+            stream.Load(reinterpret_cast<char*>(indices.data()), std::min(chunk_size, ib_cnt - i) * 4 * sizeof(int));
+
+        auto& mi = m_indices[i];
+        mi.m_id[0] = indices[k * 4];
+        mi.m_id[1] = indices[k * 4 + 1];
+        mi.m_id[2] = indices[k * 4 + 2];
+        const int mat_id = indices[k * 4 + 3];
         mi.m_mat = MatManager::GetSingleton().GetMaterial(mat_id);
 
         // If there is SSS in the material or volume is attached to the material, it is necessary to create a material proxy to
@@ -36,7 +36,7 @@ inline std::vector<std::pair<std::string, std::string>> parse_args(int argc, cha
 
     std::vector < std::pair<std::string, std::string>> ret;
 
-    std::regex word_regex("--(\\w+)(?:\\s*:\\s*([^ \\n]+)\\s*)?");
+    std::regex word_regex("--(\\w[\\w-]*)(?:\\s*:\\s*([^ \\n]+)\\s*)?");
     auto words_begin = std::sregex_iterator(commandline.begin(), commandline.end(), word_regex);
     for (std::sregex_iterator it = words_begin; it != std::sregex_iterator(); ++it) {
         const auto m = *it;
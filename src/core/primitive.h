@@ -42,7 +42,7 @@ public:
     //! @param  shape   Shape of the material.
     //! @param  light   Light source attached to the material.
     Primitive(const Mesh* mesh, const MaterialBase* mat , const Shape* shape , class Light* light = nullptr ):
-        m_mesh(mesh), m_mat(mat), m_shape(shape), m_light(light){}
+        m_mesh(mesh), m_mat(mat), m_shape(shape), m_light(light), m_isInstance(SHAPE_INSTANCE == shape->GetShapeType()){}
 
     //! @brief  Get the intersection between a ray and the primitive.
     //!
@@ -53,7 +53,11 @@ public:
     SORT_FORCEINLINE bool GetIntersect( const Ray& r , SurfaceInteraction* intersect ) const{
         auto ret = m_shape->GetIntersect( r , intersect );
         if( ret && intersect ){
-            intersect->primitive = this;
+            // An instance has the primitive of the instanced geometry filled already. The only exception is a shadow ray
+            // blocked by an opaque primitive in the instance, which comes back with an empty primitive. The instance itself,
+            // which has the default opaque material, is recorded instead so that the upper level logic stays the same.
+            if( !m_isInstance || IS_PTR_INVALID(intersect->primitive) )
+                intersect->primitive = this;
             return true;
         }
         return ret;
@@ -131,4 +135,5 @@ private:
     const Shape*            m_shape;    /**< The shape of the primitive. */
     class Light*            m_light;    /**< Light source attached to the primitive. */
     const Mesh*             m_mesh;     /**< The mesh that owns this primitive. */
+    bool                    m_isInstance;   /**< Whether the primitive is an instance of shared geometry. */
 };
\ No newline at end of file
@@ -28,6 +28,7 @@
 #include "core/strid.h"
 #include "core/primitive.h"
 #include "entity/visual_entity.h"
+#include "entity/instance_entity.h"
 #include "entity/visual.h"
 #include "stream/fstream.h"
 #include "light/light.h"
@@ -44,12 +45,13 @@ bool Scene::LoadScene( IStreamBase& stream ){
 
     StringID checkingBit;
     stream >> checkingBit;
-    sAssertMsg( checkingBit == verificationBit , RESOURCE , "Serialization is broken." );
+    sAssertMsg( checkingBit == verificationBit || stream.IsBroken() , RESOURCE , "Serialization is broken." );
 
     while( true ){
         StringID class_id;
         stream >> class_id;
-        if( SID("End of Entities") == class_id )
+        // a broken stream never comes to the end of entities
+        if( SID("End of Entities") == class_id || stream.IsBroken() )
             break;
 
         auto entity = MakeUniqueInstance<Entity>( class_id );
@@ -69,11 +71,17 @@ bool Scene::LoadScene( IStreamBase& stream ){
     // parse the acceleration structure configuration
     StringID accelType;
     stream >> accelType;
-    m_accelerator = MakeUniqueInstance<Accelerator>(accelType);
-    if (m_accelerator)
-        m_accelerator->Serialize(stream);
+    if (SID("Auto") == accelType) {
+        // candidates are benchmarked once primitives are ready to be built
+        m_accelerator_tuner = std::make_unique<AcceleratorTuner>();
+        m_accelerator_tuner->Serialize(stream);
+    } else {
+        m_accelerator = MakeUniqueInstance<Accelerator>(accelType);
+        if (m_accelerator)
+            m_accelerator->Serialize(stream);
+    }
 
-    return true;
+    return !stream.IsBroken();
 }
 
 bool Scene::GetIntersect( RenderContext& rc, const Ray& r , SurfaceInteraction& intersect ) const{
@@ -199,5 +207,11 @@ void Scene::AddLight( Light* light ){
 }
 
 void Scene::BuildAccelerationStructure() {
+    // the tuner builds the accelerator it picks already
+    if (m_accelerator_tuner) {
+        m_accelerator = m_accelerator_tuner->Tune(*this);
+        m_accelerator_tuner = nullptr;
+        return;
+    }
     m_accelerator->Build(GetPrimitives(), GetBBox());
 }
\ No newline at end of file
@@ -19,6 +19,7 @@
 
 #include "core/define.h"
 #include <vector>
+#include <unordered_map>
 #include "core/sassert.h"
 #include "math/bbox.h"
 #include "spectrum/spectrum.h"
@@ -30,6 +31,7 @@
 #include "core/samplemethod.h"
 #include "core/render_context.h"
 #include "accel/accelerator.h"
+#include "accel/accel_tuner.h"
 
 class Light;
 struct BSSRDFIntersections;
@@ -143,6 +145,23 @@ public:
             m_volPrimitives.push_back( primitive );
     }
     
+    //! @brief  Register geometry that is shared by multiple instances.
+    //!
+    //! @param  id          Unique id of the shared geometry in the scene.
+    //! @param  geometry    The shared geometry.
+    void AddSharedGeometry( unsigned id , const class SharedGeometryEntity* geometry ) {
+        m_sharedGeometries[id] = geometry;
+    }
+
+    //! @brief  Get the shared geometry with a specific id.
+    //!
+    //! @param  id          Unique id of the shared geometry in the scene.
+    //! @return             The shared geometry, nullptr will be returned if there is no such geometry.
+    const class SharedGeometryEntity* GetSharedGeometry( unsigned id ) const {
+        const auto it = m_sharedGeometries.find( id );
+        return it == m_sharedGeometries.end() ? nullptr : it->second;
+    }
+
     //! @brief  Get all of the primitives in the scene.
     //!
     //! @return     A vector that holds all primitives in the scene.
@@ -172,6 +191,11 @@ public:
     // Build acceleration structure
     void BuildAccelerationStructure();
 
+    // Get the acceleration structure configured in the scene, it is not built until 'BuildAccelerationStructure' is called.
+    const Accelerator* GetAccelerator() const {
+        return m_accelerator.get();
+    }
+
 private:
     std::vector<std::unique_ptr<Entity>>        m_entities;             /**< Entities in the scene. */
     std::vector<Light*>                         m_lights;               /**< Lights in the scene. */
@@ -180,6 +204,9 @@ private:
     std::vector<const Primitive*>               m_volPrimitives;        /**< A list holding all primitives that has volume attached to it. */
 
     std::unique_ptr<Accelerator>                m_accelerator;          /**< Acceleration structure for the whole scene. */
+    std::unique_ptr<AcceleratorTuner>           m_accelerator_tuner;    /**< It picks the acceleration structure if the type of it is 'Auto'. */
+
+    std::unordered_map<unsigned, const class SharedGeometryEntity*>   m_sharedGeometries;   /**< Geometry shared by instances, indexed by its id. */
     
     Light*                  m_skyLight = nullptr;   /**< Sky light if available. */
     Camera*                 m_camera = nullptr;     /**< Camera of the scene. */
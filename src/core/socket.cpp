@@ -67,6 +67,29 @@ std::unique_ptr<SocketConnection> ConnectSocket(const std::string& ip, const std
     return ret;
 }
 
+bool IsSocketReadable(const SocketConnection* ptr) {
+    if (!ptr || !ptr->m_is_connected)
+        return false;
+
+    fd_set fds;
+    FD_ZERO(&fds);
+    FD_SET(ptr->m_socket, &fds);
+    timeval time_out = { 0, 0 };
+    return select((int)ptr->m_socket + 1, &fds, nullptr, nullptr, &time_out) > 0;
+}
+
+bool IsSocketClosedByPeer(const SocketConnection* ptr) {
+    if (!ptr || !ptr->m_is_connected)
+        return true;
+
+    if (!IsSocketReadable(ptr))
+        return false;
+
+    // being readable with nothing to read means the connection is closed
+    char c;
+    return recv(ptr->m_socket, &c, 1, MSG_PEEK) <= 0;
+}
+
 void DisconnectSocket(SocketConnection* ptr) {
     if (!ptr)
         return;
@@ -76,4 +99,5 @@ void DisconnectSocket(SocketConnection* ptr) {
 #else
     close(ptr->m_socket);
 #endif
+    ptr->m_is_connected = false;
 }
\ No newline at end of file
@@ -35,6 +35,7 @@ using socket_t = int;
 #include <netdb.h>
 #include <netinet/in.h>
 #include <signal.h>
+#include <sys/select.h>
 #include <sys/socket.h>
 #include <unistd.h>
 #endif
@@ -55,4 +56,21 @@ struct SocketConnection {
     }
 };
 
-std::unique_ptr<SocketConnection> ConnectSocket(const std::string& ip, const std::string& port);
\ No newline at end of file
+std::unique_ptr<SocketConnection> ConnectSocket(const std::string& ip, const std::string& port);
+
+//! @brief  Whether there is anything to receive from a connection, including the connection being closed.
+//!
+//! This doesn't block at all.
+//!
+//! @param ptr      The connection to check.
+//! @return         True if receiving from the connection won't block.
+bool IsSocketReadable(const SocketConnection* ptr);
+
+//! @brief  Whether the other side has closed a connection.
+//!
+//! Data sent by the other side and not received yet doesn't count as being closed. This doesn't block at all, it is
+//! cheap enough to be checked every now and then.
+//!
+//! @param ptr      The connection to check.
+//! @return         True if the connection is closed.
+bool IsSocketClosedByPeer(const SocketConnection* ptr);
\ No newline at end of file
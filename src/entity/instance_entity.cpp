@@ -0,0 +1,76 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include "instance_entity.h"
+#include "core/scene.h"
+
+void SharedGeometryEntity::Serialize( IStreamBase& stream ){
+    stream >> m_geometryId;
+
+    StringID class_name;
+    stream >> class_name;
+    sAssertMsg( SID("MeshVisual") == class_name || SID("CachedMeshVisual") == class_name || SID("SectionMeshVisual") == class_name ,
+                RESOURCE , "Only triangle mesh can be shared by instances." );
+
+    if( SID("CachedMeshVisual") == class_name )
+        m_geometry = std::make_unique<CachedMeshVisual>();
+    else if( SID("SectionMeshVisual") == class_name )
+        m_geometry = std::make_unique<SectionMeshVisual>();
+    else
+        m_geometry = std::make_unique<MeshVisual>();
+    m_geometry->Serialize( stream );
+
+    // the geometry stays in its local space, identity transform still generates uv and tangent if needed.
+    m_geometry->ApplyTransform( Transform() );
+}
+
+void SharedGeometryEntity::FillScene( Scene& scene ){
+    m_geometry->FillPrimitives( m_primitives );
+
+    BBox bbox;
+    for( const auto primitive : m_primitives ){
+        bbox.Union( primitive->GetBBox() );
+        m_area += primitive->SurfaceArea();
+    }
+
+    // enlarge the bounding box a little, same as what the scene does
+    static const auto threshold = 0.001f;
+    const auto delta = ( bbox.m_Max - bbox.m_Min ) * threshold;
+    bbox.m_Min -= delta;
+    bbox.m_Max += delta;
+
+    m_blas = std::make_unique<Bvh>();
+    m_blas->Build( m_primitives , bbox );
+
+    scene.AddSharedGeometry( m_geometryId , this );
+}
+
+void InstanceEntity::Serialize( IStreamBase& stream ){
+    stream >> m_transform;
+    stream >> m_geometryId;
+}
+
+void InstanceEntity::FillScene( Scene& scene ){
+    const auto geometry = scene.GetSharedGeometry( m_geometryId );
+    sAssertMsg( IS_PTR_VALID(geometry) , RESOURCE , "Shared geometry %d is missing." , m_geometryId );
+    if( IS_PTR_INVALID(geometry) || !geometry->GetBlas()->GetIsValid() )
+        return;
+
+    m_instance = std::make_unique<Instance>( geometry->GetBlas() , m_transform , geometry->GetSurfaceArea() );
+    m_primitive = std::make_unique<Primitive>( nullptr , nullptr , m_instance.get() );
+    scene.AddPrimitive( m_primitive.get() );
+}
@@ -0,0 +1,94 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include "entity.h"
+#include "accel/bvh.h"
+#include "shape/instance.h"
+
+//! @brief Geometry shared by multiple instances.
+/**
+ * Linked duplicates, collection instances and particle instances all point to the same mesh data. Instead of
+ * serializing and flattening every copy in world space, the geometry is loaded only once and kept in its local
+ * space with its own bottom level acceleration structure. It doesn't add anything to the scene by itself, it is
+ * InstanceEntity that adds a single primitive per instance referring to it.
+ */
+class SharedGeometryEntity : public Entity{
+public:
+    DEFINE_RTTI( SharedGeometryEntity , Entity );
+
+    //! @brief  Serialization interface. Loading data from stream.
+    //!
+    //! Serialize the entity. Loading from an IStreamBase, which could be coming from file, memory or network.
+    //!
+    //! @param  stream      Input stream for data.
+    void    Serialize( IStreamBase& stream ) override;
+
+    //! @brief  Build the bottom level acceleration structure and register the geometry in the scene.
+    //!
+    //! @param  scene       The scene to be filled.
+    void    FillScene( class Scene& scene ) override;
+
+    //! @brief  Get the bottom level acceleration structure of the geometry.
+    //!
+    //! @return             BVH of the geometry in its local space.
+    const Bvh*  GetBlas() const {
+        return m_blas.get();
+    }
+
+    //! @brief  Get the surface area of the geometry.
+    //!
+    //! @return             Surface area of the geometry in its local space.
+    float   GetSurfaceArea() const {
+        return m_area;
+    }
+
+private:
+    unsigned                        m_geometryId = 0;       /**< Unique id of the geometry that instances refer to. */
+    std::unique_ptr<MeshVisual>     m_geometry;             /**< The geometry in its local space. */
+    std::vector<const Primitive*>   m_primitives;           /**< Primitives of the geometry. */
+    std::unique_ptr<Bvh>            m_blas;                 /**< Bottom level acceleration structure. */
+    float                           m_area = 0.0f;          /**< Surface area of the geometry. */
+};
+
+//! @brief Instance of shared geometry.
+/**
+ * An instance is nothing but a transform and a reference to the shared geometry. It adds only one primitive in
+ * the scene no matter how complex the shared geometry is.
+ */
+class InstanceEntity : public Entity{
+public:
+    DEFINE_RTTI( InstanceEntity , Entity );
+
+    //! @brief  Serialization interface. Loading data from stream.
+    //!
+    //! Serialize the entity. Loading from an IStreamBase, which could be coming from file, memory or network.
+    //!
+    //! @param  stream      Input stream for data.
+    void    Serialize( IStreamBase& stream ) override;
+
+    //! @brief  Fill the scene with the primitive of the instance.
+    //!
+    //! @param  scene       The scene to be filled.
+    void    FillScene( class Scene& scene ) override;
+
+private:
+    unsigned                        m_geometryId = 0;       /**< Id of the shared geometry. */
+    std::unique_ptr<Instance>       m_instance;             /**< Shape of the instance. */
+    std::unique_ptr<Primitive>      m_primitive;            /**< Primitive of the instance. */
+};
@@ -16,11 +16,20 @@
  */
 
 #include <numeric>
+#include <marl/defer.h>
+#include <marl/scheduler.h>
 #include "visual.h"
 #include "material/matmanager.h"
 #include "core/scene.h"
+#include "stream/mmstream.h"
 
 void MeshVisual::FillScene( Scene& scene ){
+    m_loading.wait();
+
+    // the mesh data is missing, there is nothing to render
+    if( IS_PTR_INVALID(m_memory) )
+        return;
+
     for (const auto& mi : m_memory->m_indices){
         m_triangles.push_back( std::make_unique<Triangle>( this , mi ) );
         m_primitives.push_back(std::make_unique<Primitive>(m_memory.get(), mi.m_mat, m_triangles.back().get()));
@@ -28,12 +37,74 @@ void MeshVisual::FillScene( Scene& scene ){
     }
 }
 
+void MeshVisual::FillPrimitives( std::vector<const Primitive*>& primitives ){
+    m_loading.wait();
+
+    if( IS_PTR_INVALID(m_memory) )
+        return;
+
+    for (const auto& mi : m_memory->m_indices){
+        m_triangles.push_back( std::make_unique<Triangle>( this , mi ) );
+        m_primitives.push_back(std::make_unique<Primitive>(m_memory.get(), mi.m_mat, m_triangles.back().get()));
+        primitives.push_back(m_primitives.back().get());
+    }
+}
+
 void MeshVisual::Serialize( IStreamBase& stream ){
     m_memory = std::make_unique<Mesh>();
     m_memory->Serialize(stream);
 }
 
+void SectionMeshVisual::Serialize( IStreamBase& stream ){
+    unsigned int section = 0;
+    stream >> section;
+
+    m_stream = stream.GetSection( section );
+    if( IS_PTR_INVALID(m_stream) )
+        slog( ERROR , STREAM , "Mesh section %d doesn't exist, the mesh is left empty." , section );
+}
+
+void CachedMeshVisual::Serialize( IStreamBase& stream ){
+    std::string path;
+    stream >> path;
+
+    // the cached file could be evicted from the geometry cache after the scene is exported
+    auto mapped_stream = std::make_unique<IMappedStream>( path );
+    if( !mapped_stream->IsMapped() ){
+        slog( ERROR , STREAM , "Cached mesh %s can't be loaded, the mesh is left empty." , path.c_str() );
+        return;
+    }
+    m_stream = std::move( mapped_stream );
+}
+
 void MeshVisual::ApplyTransform( const Transform& transform ){
+    // the mesh is either loaded already or missing
+    if( IS_PTR_INVALID(m_stream) ){
+        if( IS_PTR_VALID(m_memory) )
+            applyTransform( transform );
+        return;
+    }
+
+    auto load = [this, transform](){
+        MeshVisual::Serialize( *m_stream );
+        m_stream = nullptr;
+        applyTransform( transform );
+    };
+
+    // there is nothing to run the loading in parallel without a scheduler
+    if( nullptr == marl::Scheduler::get() ){
+        load();
+        return;
+    }
+
+    m_loading.add();
+    marl::schedule([this, load](){
+        defer(m_loading.done());
+        load();
+    });
+}
+
+void MeshVisual::applyTransform( const Transform& transform ){
     m_memory->ApplyTransform( transform );
     m_memory->GenUV();
     m_memory->GenSmoothTagent();
@@ -17,6 +17,7 @@
 
 #pragma once
 
+#include <marl/waitgroup.h>
 #include "core/rtti.h"
 #include "core/mesh.h"
 #include "shape/triangle.h"
@@ -59,6 +60,14 @@ public:
     //! @param  scene       The scene to be filled.
     void        FillScene( class Scene& scene ) override;
 
+    //! @brief  Create the triangles without adding them to the scene.
+    //!
+    //! This is for geometry shared by multiple instances, whose triangles live in a bottom level
+    //! acceleration structure instead of the scene.
+    //!
+    //! @param  primitives  The container to hold the created primitives.
+    void        FillPrimitives( std::vector<const Primitive*>& primitives );
+
     //! @brief  Serialization interface. Loading data from stream.
     //!
     //! Serialize the visual. Loading from an IStreamBase, which could be coming from file, memory or network.
@@ -68,6 +77,9 @@ public:
 
     //! @brief  Some visual will apply transformation earlier for better performance.
     //!
+    //! If the mesh data is in a separate stream, loading it and applying the transform are both done on a
+    //! worker thread, the mesh is only guaranteed to be available once it fills the scene.
+    //!
     //! @param  transform   The transform of the visual to be applied.
     void        ApplyTransform( const Transform& transform ) override;
 
@@ -76,6 +88,50 @@ public:
     std::unique_ptr<Mesh>                 m_memory;
     /**< This is to make sure the memory of triangles will be properly cleared. */
     std::vector<std::unique_ptr<Triangle>>      m_triangles;
+
+protected:
+    /**< Separate stream holding the mesh data, which is loaded asynchronously. */
+    std::unique_ptr<IStreamBase>                m_stream;
+    /**< Wait group of loading the mesh data asynchronously. */
+    marl::WaitGroup                             m_loading;
+
+    //! @brief  Apply the transform to the loaded mesh.
+    //!
+    //! @param  transform   The transform of the visual to be applied.
+    void        applyTransform( const Transform& transform );
+};
+
+//! @brief Triangle mesh in a separate section of the scene file.
+/**
+ * The scene file can be organized in sections, with the data of each mesh in its own section. The main
+ * section only has the index of the mesh section so that it can be loaded on a worker thread while the
+ * rest of the scene is still being parsed. The section has exactly the same layout as an embedded MeshVisual.
+ */
+class SectionMeshVisual : public MeshVisual{
+public:
+    DEFINE_RTTI( SectionMeshVisual , Visual );
+
+    //! @brief  Serialization interface. Opening the section of the mesh data.
+    //!
+    //! @param  stream      Input stream holding the index of the section.
+    void        Serialize( IStreamBase& stream ) override;
+};
+
+//! @brief Triangle mesh loaded from the geometry cache.
+/**
+ * Meshes that don't change between renders are kept in a persistent geometry cache on disk by the
+ * Blender plugin. Instead of embedding the mesh, the scene stream only has the path to the cached
+ * data, which has exactly the same layout as an embedded MeshVisual. Cached files are memory mapped and
+ * loaded asynchronously just like mesh sections.
+ */
+class CachedMeshVisual : public MeshVisual{
+public:
+    DEFINE_RTTI( CachedMeshVisual , Visual );
+
+    //! @brief  Serialization interface. Loading the mesh from the cached file.
+    //!
+    //! @param  stream      Input stream holding the path to the cached mesh.
+    void        Serialize( IStreamBase& stream ) override;
 };
 
 //! HairVisual has a bunch of lines.
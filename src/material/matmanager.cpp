@@ -25,6 +25,9 @@
 #include "scatteringevent/bsdf/fourierbxdf.h"
 #include "texture/imagetexture2d.h"
 
+#include <cstdint>
+#include <sys/stat.h>
+
 #ifdef ENABLE_ASYNC_TEXTURE_LOADING
 #include <future>
 #endif
@@ -42,6 +45,13 @@ static bool async_load_resource(Resource* resource, std::string filename) {
 }
 #endif
 
+static time_t get_modified_time(const std::string& filename) {
+    struct stat st;
+    if (0 != stat(filename.c_str(), &st))
+        return 0;
+    return st.st_mtime;
+}
+
 bool MatManager::IsNoMaterialMode() const {
     return m_no_material_mode;
 }
@@ -50,6 +60,11 @@ bool MatManager::IsNoMaterialMode() const {
 std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBase& stream , const bool no_mat, Tsl_Namespace::ShadingContext* shading_context){
     SORT_PROFILE("Parsing Materials");
 
+    // materials only live as long as the scene, unlike resources and shader units
+    m_matPool.clear();
+    m_proxyPool.clear();
+    m_paramDefaultValues.clear();
+
     auto resource_cnt = 0u;
     stream >> resource_cnt;
 
@@ -64,6 +79,8 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
 
         Resource* ptr_resource = nullptr;
 
+        // resources stay resident between render jobs of a render daemon, they are only loaded again if the file changes
+        const auto modified_time = get_modified_time(resource_file);
         if (0 == m_resources.count(resource_file)) {
             if (resource_type == SID("MerlBRDFMeasuredData")) {
                 m_resources[resource_file] = std::make_unique<MerlData>();
@@ -78,26 +95,36 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
                 ptr_resource = m_resources[resource_file].get();
             }
 
-            if (!ptr_resource) {
+            if (!ptr_resource)
                 sAssertMsg(false, MATERIAL, "Resource type not supported!");
-            }
-            else {
+        }
+        else if (m_resource_times[resource_file] != modified_time) {
+            // the resource is loaded again in place so that shaders referring to it don't need to be compiled again
+            ptr_resource = m_resources[resource_file].get();
+        }
+
+        m_resource_times[resource_file] = modified_time;
+
+        if (ptr_resource) {
 #ifdef ENABLE_ASYNC_TEXTURE_LOADING
-                async_resource_reading.push_back(std::async(std::launch::async, async_load_resource, ptr_resource, resource_file));
+            async_resource_reading.push_back(std::async(std::launch::async, async_load_resource, ptr_resource, resource_file));
 #else
-                ptr_resource->LoadResource(resource_file);
+            ptr_resource->LoadResource(resource_file);
 #endif
-            }
         }
     }
 
     m_no_material_mode = no_mat;
 
+    // default values of all shader groups parsed so far, they are all applied to the next shader group
+    std::string default_values_desc;
+
     StringID material_type;
     while (true) {
         stream >> material_type;
 
-        if (material_type == SID("End of Material"))
+        // a broken stream never comes to the end of materials
+        if (material_type == SID("End of Material") || stream.IsBroken())
             break;
         else if (material_type == SID("ShaderUnitTemplate")) {
             // shader type, maybe I should use string id here.
@@ -119,6 +146,14 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
                 m_shader_resources_binding.push_back(srb);
             }
 
+            // a shader unit compiled by an earlier render job with the same source code and resources is still good to use
+            auto unit_source = source_code;
+            for (const auto& sr : m_shader_resources_binding)
+                unit_source += "\n" + sr.resource_handle_name + ":" + sr.shader_resource_name;
+            const auto it = m_shader_unit_sources.find(shader_node_type);
+            if (it != m_shader_unit_sources.end() && it->second == unit_source && m_shader_units.count(shader_node_type))
+                continue;
+
             // allocate the shader unit template
             const auto shader_unit_template = shading_context->begin_shader_unit_template(shader_node_type);
             
@@ -138,8 +173,13 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
             shading_context->end_shader_unit_template(shader_unit_template.get());
 
             // push it if it compiles the shader successful
-            if( ret )
+            if( ret ){
                 m_shader_units[shader_node_type] = shader_unit_template;
+                m_shader_unit_sources[shader_node_type] = unit_source;
+            }else{
+                m_shader_units.erase(shader_node_type);
+                m_shader_unit_sources.erase(shader_node_type);
+            }
         }
         else if (material_type == SID("ShaderGroupTemplate")) {
             // The following logic is very similar with 
@@ -164,22 +204,28 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
                     stream >> default_value.shader_unit_param_name;
                     int channel_num = 0;
                     stream >> channel_num;
+                    default_values_desc += default_value.shader_unit_name + "." + default_value.shader_unit_param_name + "=";
                     // currently only float and float3 are supported for now
                     if (channel_num == 1) {
                         float x;
                         stream >> x;
                         default_value.default_value = x;
+                        default_values_desc += std::string((const char*)&x, sizeof(x));
                     }
                     else if (channel_num == 3) {
                         float x, y, z;
                         stream >> x >> y >> z;
                         default_value.default_value = Tsl_Namespace::make_float3(x, y, z);
+                        const float xyz[] = { x, y, z };
+                        default_values_desc += std::string((const char*)xyz, sizeof(xyz));
                     }
                     else if (channel_num == 4) { // this is fairly ugly, but it works, I will find time to refactor it later.
                         std::string str;
                         stream >> str;
                         default_value.default_value = Tsl_Namespace::make_tsl_global_ref(str);
+                        default_values_desc += "@" + str;
                     }
+                    default_values_desc += "\n";
 
                     m_paramDefaultValues.push_back(default_value);
                 }
@@ -196,47 +242,70 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
                 shader_data.m_connections.push_back(connection);
             }
 
-            // compiling the shader group template
-            std::unordered_map<std::string, std::shared_ptr<Tsl_Namespace::ShaderUnitTemplate>> shader_units;
-            for (const auto& shader : shader_data.m_sources)
-                shader_units[shader.name] = MatManager::GetSingleton().GetShaderUnitTemplate(shader.type);
-
-            // begin compiling shader group
-            auto shader_group = shading_context->begin_shader_group_template(shader_template_type);
-            if (!shader_group)
-                continue;
-
-            // register tsl global
-            TslGlobal::shader_unit_register(shader_group.get());
-
-            // expose arguments in output node
+            // arguments exposed in output node
             std::string root_shader_name;
             stream >> root_shader_name;
+            std::vector<std::string> exposed_out_args;
             unsigned int exposed_out_arg_cnt = 0;
             stream >> exposed_out_arg_cnt;
             for (auto i = 0u; i < exposed_out_arg_cnt; ++i) {
                 std::string arg_name;
                 stream >> arg_name;
-
-                // expose the shader interface
-                shader_group->expose_shader_argument(root_shader_name, arg_name);
+                exposed_out_args.push_back(arg_name);
             }
 
+            // arguments exposed in input node
             std::string shader_group_input_name;
             stream >> shader_group_input_name;
-
+            std::vector<std::string> exposed_in_args;
             if (!shader_group_input_name.empty()) {
                 unsigned int exposed_in_arg_cnt = 0;
                 stream >> exposed_in_arg_cnt;
                 for (auto i = 0u; i < exposed_in_arg_cnt; ++i) {
                     std::string arg_name;
                     stream >> arg_name;
-
-                    // expose the shader interface
-                    shader_group->expose_shader_argument(shader_group_input_name, arg_name, false);
+                    exposed_in_args.push_back(arg_name);
                 }
             }
 
+            // compiling the shader group template
+            std::unordered_map<std::string, std::shared_ptr<Tsl_Namespace::ShaderUnitTemplate>> shader_units;
+            for (const auto& shader : shader_data.m_sources)
+                shader_units[shader.name] = MatManager::GetSingleton().GetShaderUnitTemplate(shader.type);
+
+            // a shader group built by an earlier render job out of the same shader units, put together the same way, is still good to use.
+            // shader units compiled again are different templates, the group holding the old ones needs to be built again.
+            std::string group_source;
+            for (const auto& shader : shader_data.m_sources)
+                group_source += shader.name + ":" + shader.type + ":" + std::to_string((uintptr_t)shader_units[shader.name].get()) + "\n";
+            for (const auto& connection : shader_data.m_connections)
+                group_source += connection.source_shader + "." + connection.source_property + "->" + connection.target_shader + "." + connection.target_property + "\n";
+            group_source += root_shader_name + "\n";
+            for (const auto& arg_name : exposed_out_args)
+                group_source += "out:" + arg_name + "\n";
+            group_source += shader_group_input_name + "\n";
+            for (const auto& arg_name : exposed_in_args)
+                group_source += "in:" + arg_name + "\n";
+            // default values of all shader groups so far are applied to this one too
+            group_source += default_values_desc;
+            const auto it = m_shader_group_sources.find(shader_template_type);
+            if (it != m_shader_group_sources.end() && it->second == group_source && m_shader_units.count(shader_template_type))
+                continue;
+
+            // begin compiling shader group
+            auto shader_group = shading_context->begin_shader_group_template(shader_template_type);
+            if (!shader_group)
+                continue;
+
+            // register tsl global
+            TslGlobal::shader_unit_register(shader_group.get());
+
+            // expose the shader interface
+            for (const auto& arg_name : exposed_out_args)
+                shader_group->expose_shader_argument(root_shader_name, arg_name);
+            for (const auto& arg_name : exposed_in_args)
+                shader_group->expose_shader_argument(shader_group_input_name, arg_name, false);
+
             for (auto su : shader_units) {
                 const auto is_root = (su.first == root_shader_name);
                 const auto ret = shader_group->add_shader_unit(su.first, su.second, is_root);
@@ -256,8 +325,13 @@ std::vector<std::unique_ptr<MaterialBase>>& MatManager::ParseMatFile( IStreamBas
             auto ret = shading_context->end_shader_group_template(shader_group.get());
 
             // push it if it compiles the shader successful
-            if (Tsl_Namespace::TSL_Resolving_Status::TSL_Resolving_Succeed == ret)
+            if (Tsl_Namespace::TSL_Resolving_Status::TSL_Resolving_Succeed == ret) {
                 m_shader_units[shader_template_type] = shader_group;
+                m_shader_group_sources[shader_template_type] = group_source;
+            }else{
+                m_shader_units.erase(shader_template_type);
+                m_shader_group_sources.erase(shader_template_type);
+            }
         }
         else if (material_type == SID("Material")) {
             // allocate a new material
@@ -296,8 +370,9 @@ const Resource* MatManager::GetResource(const std::string& name) const {
 }
 
 const MaterialBase* MatManager::CreateMaterialProxy(const MaterialBase& material) {
-    m_matPool.push_back(std::move(std::make_unique<MaterialProxy>(material)));
-    return m_matPool.back().get();
+    std::lock_guard<std::mutex> guard(m_proxyLock);
+    m_proxyPool.push_back(std::move(std::make_unique<MaterialProxy>(material)));
+    return m_proxyPool.back().get();
 }
 
 std::shared_ptr<Tsl_Namespace::ShaderUnitTemplate> MatManager::GetShaderUnitTemplate(const std::string& name_id) const {
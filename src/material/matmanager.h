@@ -21,6 +21,7 @@
 #include <vector>
 #include <memory>
 #include <unordered_map>
+#include <mutex>
 #include "core/singleton.h"
 #include "material/material.h"
 #include "core/resource.h"
@@ -46,6 +47,8 @@ public:
 
     //! @brief  Create a material proxy given a material.
     //!
+    //! This is thread safe since meshes could be loaded on multiple threads at the same time.
+    //!
     //! @param  material    The material to be proxied.
     //! @return             A material proxy that refers the to provided material.
     const MaterialBase* CreateMaterialProxy(const MaterialBase& material);
@@ -77,10 +80,17 @@ public:
 
 private:
     std::vector<std::unique_ptr<MaterialBase>>       m_matPool;         /**< Material pool holding all materials. */
+    std::vector<std::unique_ptr<MaterialBase>>       m_proxyPool;       /**< Material proxies, they are not part of the material pool so that it never changes during mesh loading. */
+    std::mutex                                       m_proxyLock;       /**< Lock protecting the material proxies. */
 
     std::unordered_map<std::string, std::unique_ptr<Resource>>  m_resources;       /**< Resources used during BXDF evaluation. */
+    std::unordered_map<std::string, time_t>                     m_resource_times;  /**< Last modified time of the resource files when they were loaded. */
 
     std::unordered_map<std::string, std::shared_ptr<Tsl_Namespace::ShaderUnitTemplate>>     m_shader_units;
+    /**< Source code and resources of the compiled shader units, a shader unit is only compiled again if they change. */
+    std::unordered_map<std::string, std::string>    m_shader_unit_sources;
+    /**< Shader units, connections, exposed arguments and default values of the built shader groups, a shader group is only built again if they change. */
+    std::unordered_map<std::string, std::string>    m_shader_group_sources;
 
     /**< Shader unit default values. */
     std::vector<ShaderParamDefaultValue>        m_paramDefaultValues;
@@ -37,6 +37,7 @@ IMPLEMENT_TSLGLOBAL_VAR(Tsl_float3, normal)       // this is world space normal
 IMPLEMENT_TSLGLOBAL_VAR(Tsl_float3, gnormal)      // this is world space geometric normal
 IMPLEMENT_TSLGLOBAL_VAR(Tsl_float3, I)            // this is world space input direction
 IMPLEMENT_TSLGLOBAL_VAR(Tsl_float, density)       // volume density
+IMPLEMENT_TSLGLOBAL_VAR(Tsl_float3, volume_color) // volume color
 IMPLEMENT_TSLGLOBAL_END()
 
 // WARNING, whatever the job system is used, it has to avoid preemption between reset and 
@@ -107,6 +108,8 @@ void ExecuteVolumeShader(Tsl_Namespace::ShaderInstance* shader, const MediumInte
 void EvaluateVolumeSample(Tsl_Namespace::ShaderInstance* shader, const MediumInteraction& mi, MediumSample& ms) {
     TslGlobal global;
     global.density = mi.mesh->SampleVolumeDensity(mi.intersect);
+    const auto volume_color = mi.mesh->SampleVolumeColor(mi.intersect);
+    global.volume_color = make_float3(volume_color.r, volume_color.g, volume_color.b);
 
     ClosureTreeNodeBase* closure = nullptr;
     auto raw_function = (void(*)(ClosureTreeNodeBase**, TslGlobal*))shader->get_function();
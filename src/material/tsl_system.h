@@ -50,6 +50,7 @@ DECLARE_TSLGLOBAL_VAR(Tsl_float3, normal)       // this is world space normal
 DECLARE_TSLGLOBAL_VAR(Tsl_float3, gnormal)      // this is world space geometric normal
 DECLARE_TSLGLOBAL_VAR(Tsl_float3, I)            // this is world space input direction
 DECLARE_TSLGLOBAL_VAR(Tsl_float, density)       // volume density
+DECLARE_TSLGLOBAL_VAR(Tsl_float3, volume_color) // volume color
 DECLARE_TSLGLOBAL_END()
 
 struct ShaderCompilingContext {
@@ -0,0 +1,70 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include "instance.h"
+#include "accel/bvh.h"
+
+Instance::Instance( const Bvh* blas , const Transform& transform , float area ) : m_blas( blas ) , m_area( area ){
+    m_transform = transform;
+    m_normalMatrix = transform.invMatrix.Transpose();
+}
+
+bool Instance::GetIntersect( const Ray& r , SurfaceInteraction* intersect ) const{
+    // the direction is not normalized on purpose so that the distance along the ray stays the same in both spaces
+    const auto ray = m_transform.invMatrix( r );
+
+#ifdef ENABLE_TRANSPARENT_SHADOW
+    // the bottom level structure checks shadow query through the intersection, it can't be empty
+    if( IS_PTR_INVALID(intersect) ){
+        SurfaceInteraction shadow_intersect;
+        shadow_intersect.query_shadow = true;
+        return m_blas->GetIntersect( ray , &shadow_intersect );
+    }
+#endif
+
+    // a nearer intersection found before, possibly in another instance, is left untouched
+    if( !m_blas->GetIntersect( ray , intersect ) )
+        return false;
+    if( IS_PTR_INVALID(intersect) )
+        return true;
+
+    // transform the intersection back to world space
+    intersect->intersect = r( intersect->t );
+    intersect->gnormal = normalize( m_normalMatrix.TransformVector( intersect->gnormal ) );
+    intersect->normal = normalize( m_normalMatrix.TransformVector( intersect->normal ) );
+    intersect->tangent = normalize( m_transform.TransformVector( intersect->tangent ) );
+    intersect->view = -r.m_Dir;
+
+    return true;
+}
+
+const BBox& Instance::GetBBox() const{
+    // if there is no bounding box , cache it
+    if( !m_bbox ){
+        m_bbox = std::make_unique<BBox>();
+
+        const auto& local = m_blas->GetBBox();
+        for( auto i = 0 ; i < 8 ; ++i ){
+            const Point corner( ( i & 1 ) ? local.m_Max.x : local.m_Min.x ,
+                                ( i & 2 ) ? local.m_Max.y : local.m_Min.y ,
+                                ( i & 4 ) ? local.m_Max.z : local.m_Min.z );
+            m_bbox->Union( m_transform.TransformPoint( corner ) );
+        }
+    }
+
+    return *m_bbox;
+}
@@ -0,0 +1,87 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include "shape.h"
+
+class Bvh;
+
+//! @brief Instance of geometry shared with other instances.
+/**
+ * Instead of flattening every copy of a shared mesh in world space, the geometry is kept in its own local
+ * space with a bottom level BVH built only once. Each instance is merely a transform pointing to it, the
+ * top level acceleration structure treats it as a single primitive. Since it is not a triangle or a line,
+ * Qbvh and Obvh will put it in their generic primitive list and it works with any acceleration structure.
+ * The ray is transformed into the local space of the geometry before traversing the bottom level structure
+ * and the intersection is transformed back to world space afterward. Unlike other shapes, the transform of
+ * an instance is allowed to have scaling in it.
+ */
+class   Instance : public Shape{
+public:
+    //! @brief Constructor of the instance.
+    //!
+    //! @param blas         The bottom level acceleration structure of the shared geometry in its local space.
+    //! @param transform    Transform from the local space of the shared geometry to world space.
+    //! @param area         Surface area of the shared geometry.
+    Instance( const Bvh* blas , const Transform& transform , float area );
+
+    //! @brief Instance doesn't support being sampled as a light source.
+    Point           Sample_l( const LightSample& ls , const Point& p , Vector& wi , Vector& n , float* pdf ) const override{
+        return Point();
+    }
+
+    //! @brief Instance doesn't support being sampled as a light source.
+    void            Sample_l( RenderContext& rc, const LightSample& ls , Ray& r , Vector& n , float* pdf ) const override{
+    }
+
+    //! @brief      Get intersected point between the ray and the instanced geometry.
+    //!
+    //! @param ray      The ray to be tested against in world space.
+    //! @param inter    The intersection data to be filled. If it is nullptr, there is no detailed information
+    //!                 for the intersection.
+    //! @return         Whether the ray intersects the shape.
+    bool            GetIntersect( const Ray& ray , SurfaceInteraction* inter = nullptr ) const override;
+
+    //! @brief      Get bounding box of the instance in world space.
+    //!
+    //! The bounding box is a conservative one that encloses the transformed local bounding box.
+    //!
+    //! @return     The bounding box of the shape.
+    const BBox&     GetBBox() const override;
+
+    //! @brief      Get the surface area of the shape.
+    //!
+    //! Instances are never attached with light sources, this is the area of the shared geometry in its local space.
+    //!
+    //! @return     Surface area of the shape.
+    float           SurfaceArea() const override{
+        return m_area;
+    }
+
+    //! @brief      Get the type of the shape
+    //!
+    //! @return     The type of the shape.
+    SHAPE_TYPE      GetShapeType() const override{
+        return SHAPE_INSTANCE;
+    }
+
+private:
+    const Bvh*  m_blas = nullptr;       /**< Bottom level acceleration structure of the shared geometry. */
+    Matrix      m_normalMatrix;         /**< Matrix transforming normals from local space to world space. */
+    float       m_area = 0.0f;          /**< Surface area of the shared geometry. */
+};
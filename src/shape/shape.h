@@ -33,6 +33,7 @@ enum SHAPE_TYPE{
     SHAPE_DISK      = 2,
     SHAPE_QUAD      = 3,
     SHAPE_SPHERE    = 4,
+    SHAPE_INSTANCE  = 5,
 };
 
 //! @brief Shape class defines basic interface of shape.
@@ -19,6 +19,8 @@
 #include "sort.h"
 #include "work/image_evaluation/image_evaluation.h"
 #include "work/unit_tests/unit_tests.h"
+#include "work/render_daemon/render_daemon.h"
+#include "work/benchmark/benchmark.h"
 #include "core/parse_args.h"
 
 int RunSORT(int argc, char** argv) {
@@ -27,19 +29,28 @@ int RunSORT(int argc, char** argv) {
 
     bool profiling_enabled = false;
     bool unit_test_mode = false;
+    bool daemon_mode = false;
+    bool benchmark_mode = false;
     bool valid_args = false;
 
     for (auto& arg : args) {
         const auto& key_str = arg.first;
         const auto& value_str = arg.second;
 
-        if (key_str == "input") {
+        if (key_str == "input" || key_str == "inputserver") {
             valid_args = true;
         }
         else if (key_str == "unittest") {
             unit_test_mode = true;
             valid_args = true;
         }
+        else if (key_str == "daemon") {
+            daemon_mode = true;
+            valid_args = true;
+        }
+        else if (key_str == "benchmark") {
+            benchmark_mode = true;
+        }
         else if (key_str == "profiling") {
             profiling_enabled = value_str == "on";
         }
@@ -54,7 +65,16 @@ int RunSORT(int argc, char** argv) {
         slog(INFO, GENERAL, "  --input:<filename>   Specify the sort input file.");
         slog(INFO, GENERAL, "  --blendermode        SORT is triggered from Blender.");
         slog(INFO, GENERAL, "  --unittest           Run unit tests.");
+        slog(INFO, GENERAL, "  --daemon:<ip:port>   Keep serving render jobs from Blender.");
         slog(INFO, GENERAL, "  --nomaterial         Disable materials in SORT.");
+        slog(INFO, GENERAL, "  --threads:<count>    Number of threads rendering, overriding the one in the scene.");
+        slog(INFO, GENERAL, "  --spp:<count>        Sample per pixel, overriding the one in the scene.");
+        slog(INFO, GENERAL, "  --downsample:<n>     Render at 1/n resolution, progressive rendering starts at it and goes up to full.");
+        slog(INFO, GENERAL, "  --time-budget:<sec>  Render progressively and stop once the time runs out.");
+        slog(INFO, GENERAL, "  --noise-target:<val> Render progressively and stop once all pixels are this converged.");
+        slog(INFO, GENERAL, "  --progressive        Render progressively until the sample count of the scene is reached.");
+        slog(INFO, GENERAL, "  --interactive        Render progressively and start over whenever the display server sends a new view.");
+        slog(INFO, GENERAL, "  --benchmark:<json>   Benchmark all accelerators on the input scene, --rays:<count> and --seed:<n> are optional.");
         slog(INFO, GENERAL, "  --profiling:<on|off> Toggling profiling option, false by default.");
         return -1;
     }
@@ -72,6 +92,10 @@ int RunSORT(int argc, char** argv) {
     std::unique_ptr<Work> work;
     if (unit_test_mode)
         work = std::make_unique<UnitTests>();
+    else if (daemon_mode)
+        work = std::make_unique<RenderDaemon>();
+    else if (benchmark_mode)
+        work = std::make_unique<Benchmark>();
     else
         work = std::make_unique<ImageEvaluation>();
     work->StartRunning(argc, argv);
@@ -80,7 +104,7 @@ int RunSORT(int argc, char** argv) {
     // Flush main thread data
     SortStatsFlushData(true);
     // Output stats data
-    if (ret == 0 && !unit_test_mode)
+    if (ret == 0 && !unit_test_mode && !daemon_mode && !benchmark_mode)
         SortStatsPrintData();
     
     return ret;
@@ -0,0 +1,177 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include "mmstream.h"
+
+#ifdef SORT_IN_WINDOWS
+#ifndef NOMINMAX
+#define NOMINMAX
+#endif
+#include <windows.h>
+#undef NOMINMAX
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+static constexpr char           SECTIONED_FILE_MAGIC[8] = { 'S', 'O', 'R', 'T', 'S', 'C', 'N', '\0' };
+static constexpr unsigned int   SECTIONED_FILE_VERSION = 0;
+static constexpr size_t         SECTIONED_FILE_HEADER_SIZE = 24;
+static constexpr size_t         SECTION_ENTRY_SIZE = 20;
+
+MappedFile::MappedFile( const std::string& filename , bool writable ):m_writable(writable){
+#ifdef SORT_IN_WINDOWS
+    const auto access = writable ? ( GENERIC_READ | GENERIC_WRITE ) : GENERIC_READ;
+    const auto share = writable ? ( FILE_SHARE_READ | FILE_SHARE_WRITE ) : FILE_SHARE_READ;
+    auto file = CreateFileA( filename.c_str() , access , share , nullptr , OPEN_EXISTING , FILE_ATTRIBUTE_NORMAL , nullptr );
+    if( file == INVALID_HANDLE_VALUE ){
+        slog( WARNING , STREAM , "File %s can't be loaded." , filename.c_str() );
+        return;
+    }
+    m_file = file;
+
+    LARGE_INTEGER size;
+    if( !GetFileSizeEx( file , &size ) || size.QuadPart == 0 )
+        return;
+
+    m_mapping = CreateFileMappingA( file , nullptr , writable ? PAGE_READWRITE : PAGE_READONLY , 0 , 0 , nullptr );
+    if( !m_mapping ){
+        slog( WARNING , STREAM , "File %s can't be mapped." , filename.c_str() );
+        return;
+    }
+
+    m_data = (const char*)MapViewOfFile( m_mapping , writable ? FILE_MAP_WRITE : FILE_MAP_READ , 0 , 0 , 0 );
+    if( m_data )
+        m_size = (size_t)size.QuadPart;
+#else
+    const auto fd = open( filename.c_str() , writable ? O_RDWR : O_RDONLY );
+    if( fd < 0 ){
+        slog( WARNING , STREAM , "File %s can't be loaded." , filename.c_str() );
+        return;
+    }
+
+    struct stat st;
+    if( fstat( fd , &st ) == 0 && st.st_size > 0 ){
+        const auto prot = writable ? ( PROT_READ | PROT_WRITE ) : PROT_READ;
+        auto data = mmap( nullptr , (size_t)st.st_size , prot , writable ? MAP_SHARED : MAP_PRIVATE , fd , 0 );
+        if( data != MAP_FAILED ){
+            m_data = (const char*)data;
+            m_size = (size_t)st.st_size;
+        }else{
+            slog( WARNING , STREAM , "File %s can't be mapped." , filename.c_str() );
+        }
+    }
+
+    // the mapping is still valid after closing the file
+    close( fd );
+#endif
+}
+
+MappedFile::~MappedFile(){
+#ifdef SORT_IN_WINDOWS
+    if( m_data )
+        UnmapViewOfFile( m_data );
+    if( m_mapping )
+        CloseHandle( m_mapping );
+    if( m_file )
+        CloseHandle( m_file );
+#else
+    if( m_data )
+        munmap( (void*)m_data , m_size );
+#endif
+}
+
+IMappedStream::IMappedStream( const std::string& filename ){
+    m_file = std::make_shared<MappedFile>( filename );
+    m_data = m_file->GetData();
+    m_size = m_file->GetSize();
+}
+
+IMappedStream::IMappedStream( std::shared_ptr<const MappedFile> file , size_t offset , size_t size ):m_file(file){
+    sAssert( offset + size <= file->GetSize() , STREAM );
+    m_data = file->GetData() + offset;
+    m_size = size;
+}
+
+ISectionedFileStream::ISectionedFileStream( const std::string& filename ):IMappedStream(filename){
+    m_valid = parseSections();
+
+    // only the main section is visible through this stream
+    const auto it = std::find_if( m_sections.begin() , m_sections.end() , []( const Section& section ){ return section.m_type == SID("scene"); } );
+    if( m_valid && it != m_sections.end() ){
+        m_data = m_file->GetData() + it->m_offset;
+        m_size = it->m_size;
+    }else{
+        m_valid = false;
+        m_data = nullptr;
+        m_size = 0;
+    }
+}
+
+std::unique_ptr<IStreamBase> ISectionedFileStream::GetSection( unsigned int index ){
+    if( !m_valid || index >= m_sections.size() )
+        return nullptr;
+
+    const auto& section = m_sections[index];
+    return std::make_unique<IMappedStream>( m_file , section.m_offset , section.m_size );
+}
+
+bool ISectionedFileStream::parseSections(){
+    const auto data = m_file->GetData();
+    const auto size = m_file->GetSize();
+    if( size < SECTIONED_FILE_HEADER_SIZE || memcmp( data , SECTIONED_FILE_MAGIC , sizeof(SECTIONED_FILE_MAGIC) ) != 0 )
+        return false;
+
+    unsigned int version = 0, section_cnt = 0;
+    unsigned long long table_offset = 0;
+    memcpy( &version , data + 8 , sizeof(version) );
+    memcpy( &section_cnt , data + 12 , sizeof(section_cnt) );
+    memcpy( &table_offset , data + 16 , sizeof(table_offset) );
+    if( version != SECTIONED_FILE_VERSION ){
+        slog( WARNING , STREAM , "Incompatible sectioned file version %d." , version );
+        return false;
+    }
+
+    // make sure the whole table and all sections are inside the file before touching anything
+    if( table_offset > size || ( size - table_offset ) / SECTION_ENTRY_SIZE < section_cnt ){
+        slog( WARNING , STREAM , "Table of sections is broken." );
+        return false;
+    }
+
+    m_sections.resize( section_cnt );
+    auto entry = data + table_offset;
+    for( auto& section : m_sections ){
+        sid_t type = 0;
+        unsigned long long offset = 0, section_size = 0;
+        memcpy( &type , entry , sizeof(type) );
+        memcpy( &offset , entry + 4 , sizeof(offset) );
+        memcpy( &section_size , entry + 12 , sizeof(section_size) );
+        entry += SECTION_ENTRY_SIZE;
+
+        if( offset > size || section_size > size - offset ){
+            slog( WARNING , STREAM , "Section out of the range of the file." );
+            return false;
+        }
+
+        section.m_type = StringID( type );
+        section.m_offset = (size_t)offset;
+        section.m_size = (size_t)section_size;
+    }
+    return true;
+}
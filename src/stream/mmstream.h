@@ -0,0 +1,225 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include <vector>
+#include <cstring>
+#include <algorithm>
+#include "stream.h"
+
+//! @brief Memory mapping of a whole file.
+/**
+ * The content of the file is not copied at all, pages are loaded by the operating system on demand and
+ * are shared with the page cache. The mapping is released when the object is destroyed. A file mapped
+ * as writable is shared with all other processes mapping the same file, which makes it a cheap way of
+ * sharing memory between processes.
+ */
+class MappedFile{
+public:
+    //! @brief Map a file into memory.
+    //!
+    //! @param filename     Name of the file to be mapped.
+    //! @param writable     Whether the mapping is writable, changes are visible to other processes.
+    MappedFile( const std::string& filename , bool writable = false );
+
+    //! @brief Destructor will release the mapping.
+    ~MappedFile();
+
+    //! @brief Whether the file is mapped successfully.
+    //!
+    //! @return     True if the file is mapped.
+    bool        IsValid() const { return nullptr != m_data; }
+
+    //! @brief Get the address of the mapped file.
+    //!
+    //! @return     Address of the first byte of the file.
+    const char* GetData() const { return m_data; }
+
+    //! @brief Get the address of the mapped file for writing.
+    //!
+    //! @return     Address of the first byte of the file, nullptr if the file is not mapped as writable.
+    char*       GetWritableData() const { return m_writable ? const_cast<char*>(m_data) : nullptr; }
+
+    //! @brief Get the size of the mapped file.
+    //!
+    //! @return     Size of the file in bytes.
+    size_t      GetSize() const { return m_size; }
+
+private:
+    const char* m_data = nullptr;       /**< Address of the mapped file. */
+    size_t      m_size = 0;             /**< Size of the mapped file. */
+    bool        m_writable = false;     /**< Whether the mapping is writable. */
+#ifdef SORT_IN_WINDOWS
+    void*       m_file = nullptr;       /**< Handle of the file. */
+    void*       m_mapping = nullptr;    /**< Handle of the file mapping. */
+#endif
+};
+
+//! @brief Streaming from a memory mapped file.
+/**
+ * IMappedStream streams data from a range of a memory mapped file. Data is decoded directly from the mapped
+ * pages without going through any intermediate buffer. Multiple streams could share the same mapped file,
+ * which is kept alive as long as any stream of it is alive. Any attempt to write data will result in
+ * immediate crash.
+ */
+class IMappedStream : public IStreamBase{
+public:
+    //! @brief Constructing from a file name, the whole file is streamed.
+    //!
+    //! @param filename     Name of the file to be streamed.
+    IMappedStream( const std::string& filename );
+
+    //! @brief Constructing from a range of a mapped file.
+    //!
+    //! @param file         The mapped file.
+    //! @param offset       Offset of the first byte of the range in the file.
+    //! @param size         Size of the range in bytes.
+    IMappedStream( std::shared_ptr<const MappedFile> file , size_t offset , size_t size );
+
+    //! @brief Streaming in a float number from the mapped file.
+    //!
+    //! @param v            Value to be loaded.
+    //! @return             Reference of the stream itself.
+    StreamBase& operator >> (float& v) override {
+        return Load(reinterpret_cast<char*>(&v), sizeof(float));
+    }
+
+    //! @brief Streaming in an integer number from the mapped file.
+    //!
+    //! @param v            Value to be loaded.
+    //! @return             Reference of the stream itself.
+    StreamBase& operator >> (int& v) override {
+        return Load(reinterpret_cast<char*>(&v), sizeof(int));
+    }
+
+    //! @brief Streaming out an 8 bit integer number.
+    //!
+    //! @param v    Value to be loaded.
+    //! @return     Reference of the stream itself.
+    StreamBase& operator >> (char& v) override {
+        return Load(reinterpret_cast<char*>(&v), sizeof(char));
+    }
+
+    //! @brief Streaming in an unsigned integer number from the mapped file.
+    //!
+    //! @param v            Value to be loaded.
+    //! @return             Reference of the stream itself.
+    StreamBase& operator >> (unsigned int& v) override {
+        return Load(reinterpret_cast<char*>(&v), sizeof(unsigned int));
+    }
+
+    //! @brief Streaming in a string from the mapped file.
+    //!
+    //! Unlike stand stream, space doesn't count to separate strings. For example, streaming "hello world" in will
+    //! result in one single string instead of two.
+    //!
+    //! @param v            Value to be loaded.
+    //! @return             Reference of the stream itself.
+    StreamBase& operator >> (std::string& v) override {
+        const auto begin = m_data + m_pos;
+        const auto length = strnlen(begin, m_size - m_pos);
+        v.assign(begin, length);
+        m_pos = std::min(m_pos + length + 1, m_size);
+        return *this;
+    }
+
+    //! @brief Streaming in a boolean value from the mapped file.
+    //!
+    //! @param v            Value to be loaded.
+    //! @return             Reference of the stream itself.
+    StreamBase& operator >> (bool& v) override {
+        return Load(reinterpret_cast<char*>(&v), sizeof(bool));
+    }
+
+    //! @brief Whether there is any data to stream from.
+    //!
+    //! @return             False if the file can't be mapped, like a missing or an empty file.
+    bool    IsMapped() const { return nullptr != m_data; }
+
+    //! @brief Loading data from stream directly.
+    //!
+    //! Reading beyond the end of the range fills the rest of the data with zero.
+    //!
+    //! @param  data    Data to be filled.
+    //! @param  size    Size of the data to be filled in bytes.
+    StreamBase& Load( char* data , int size ) override {
+        const auto size_to_copy = std::min( (size_t)size , m_size - m_pos );
+        memcpy( data , m_data + m_pos , size_to_copy );
+        if( size_to_copy < (size_t)size ){
+            memset( data + size_to_copy , 0 , size - size_to_copy );
+            sAssertMsg( false , STREAM , "Streaming beyond the end of the mapped data." );
+        }
+        m_pos += size_to_copy;
+        return *this;
+    }
+
+protected:
+    std::shared_ptr<const MappedFile>   m_file;             /**< The mapped file that the stream reads from. */
+    const char*                         m_data = nullptr;   /**< Address of the first byte of the range. */
+    size_t                              m_size = 0;         /**< Size of the range in bytes. */
+    size_t                              m_pos = 0;          /**< Current position in the range. */
+};
+
+//! @brief Streaming from a file organized in sections.
+/**
+ * A sectioned file starts with a header pointing to a table of sections. Each section has a type, an offset
+ * and a size. The main section, typed 'scene', is streamed by this stream itself. The rest of the sections,
+ * like meshes, are referred by their indices in the main section and can be opened as separate streams,
+ * which makes it possible to load them in parallel.
+ *
+ * The layout of the file is as below, all numbers are little endian.
+ *   header     : magic 'SORTSCN\0' (8 bytes) | version (4 bytes) | section count (4 bytes) | table offset (8 bytes)
+ *   sections   : raw data of all sections
+ *   table      : type (4 bytes) | offset (8 bytes) | size (8 bytes) for each section
+ */
+class ISectionedFileStream : public IMappedStream{
+public:
+    //! @brief Constructing from a file name.
+    //!
+    //! The file is validated first, an invalid file results in an empty stream.
+    //!
+    //! @param filename     Name of the file to be streamed.
+    ISectionedFileStream( const std::string& filename );
+
+    //! @brief Whether the file is a valid sectioned file.
+    //!
+    //! @return     True if the file is valid.
+    bool    IsValid() const { return m_valid; }
+
+    //! @brief Open a separate section of the file.
+    //!
+    //! @param  index   Index of the section in the table of sections.
+    //! @return         A stream of the section, it is nullptr if there is no such a section.
+    std::unique_ptr<IStreamBase> GetSection( unsigned int index ) override;
+
+private:
+    //! @brief Entry in the table of sections.
+    struct Section{
+        StringID    m_type;     /**< Type of the section. */
+        size_t      m_offset;   /**< Offset of the section in the file. */
+        size_t      m_size;     /**< Size of the section in bytes. */
+    };
+
+    std::vector<Section>    m_sections;         /**< Table of sections. */
+    bool                    m_valid = false;    /**< Whether the file is valid. */
+
+    //! @brief Parse and validate the header and the table of sections.
+    //!
+    //! @return     True if the file is valid.
+    bool    parseSections();
+};
@@ -38,7 +38,10 @@
 class ISocketStream : public IStreamBase{
 public:
     //! @brief  Constructor.
-    ISocketStream(){
+    //!
+    //! @param socket   A connected socket to stream data from.
+    ISocketStream(socket_t socket):m_socket(socket){
+        m_buffer = std::make_unique<char[]>(RECV_MAX_SIZE);
     }
 
     //! @brief Streaming in a float number from socket.
@@ -46,7 +49,7 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (float& v) override {
-        return *this;
+        return Load(reinterpret_cast<char*>(&v), sizeof(float));
     }
 
     //! @brief Streaming in an integer number from socket.
@@ -54,7 +57,7 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (int& v) override {
-        return *this;
+        return Load(reinterpret_cast<char*>(&v), sizeof(int));
     }
 
     //! @brief Streaming in an unsigned integer number from socket.
@@ -62,7 +65,7 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (unsigned int& v) override {
-        return *this;
+        return Load(reinterpret_cast<char*>(&v), sizeof(unsigned int));
     }
     
     //! @brief Streaming out an 8 bit integer number.
@@ -70,7 +73,7 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (char& v) override {
-        return *this;
+        return Load(reinterpret_cast<char*>(&v), sizeof(char));
     }
 
     //! @brief Streaming in a string from socket.
@@ -81,6 +84,14 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (std::string& v) override {
+        v = "";
+        char c;
+        do{
+            Load(&c, sizeof(char));
+            if( c == 0 )
+                break;
+            v += c;
+        }while(true);
         return *this;
     }
 
@@ -89,16 +100,77 @@ public:
     //! @param v    Value to be loaded.
     //! @return     Reference of the stream itself.
     StreamBase& operator >> (bool& v) override {
-        return *this;
+        return Load(reinterpret_cast<char*>(&v), sizeof(bool));
     }
 
     //! @brief Loading data from stream directly.
     //!
+    //! The call blocks until all requested bytes arrive. If the connection is lost in the middle, the rest of
+    //! the data is zero filled so that higher level code won't read garbage, the stream is broken since then.
+    //!
     //! @param  data    Data to be filled.
     //! @param  size    Size of the data to be filled in bytes.
     StreamBase& Load( char* data , int size ) override {
+        while( size > 0 ){
+            // refill the buffer if all received data is consumed already.
+            if( m_offset == m_size && !fill() ){
+                memset(data, 0, size);
+                break;
+            }
+
+            const auto size_to_copy = std::min( size , m_size - m_offset );
+            memcpy(data, m_buffer.get() + m_offset, size_to_copy);
+            m_offset += size_to_copy;
+            data += size_to_copy;
+            size -= size_to_copy;
+        }
         return *this;
     }
+
+    //! @brief  Whether the socket connection is still alive.
+    //!
+    //! @return     False if the other side closed the connection or anything went wrong.
+    bool IsConnected() const {
+        return m_is_connected;
+    }
+
+    //! @brief  Whether the connection is lost, the data loaded after that is zero filled.
+    //!
+    //! @return     True if the other side closed the connection or anything went wrong.
+    bool IsBroken() const override {
+        return !m_is_connected;
+    }
+
+private:
+    socket_t                m_socket;               /**< Socket to receive data from. */
+    std::unique_ptr<char[]> m_buffer;               /**< Buffer holding received but not consumed data. */
+    int                     m_size = 0;             /**< Number of valid bytes in the buffer. */
+    int                     m_offset = 0;           /**< Offset of the first byte not consumed yet. */
+    bool                    m_is_connected = true;  /**< Whether the connection is still alive. */
+
+    static constexpr int RECV_MAX_SIZE = 65536;
+
+    //! @brief  Receive more data from the socket, blocking until some bytes arrive.
+    //!
+    //! @return     Whether any data is received.
+    bool fill(){
+        m_offset = m_size = 0;
+        while( m_is_connected ){
+            const auto byte_received = recv(m_socket, m_buffer.get(), RECV_MAX_SIZE, 0);
+            if( byte_received > 0 ){
+                m_size = (int)byte_received;
+                return true;
+            }
+
+#ifndef SORT_IN_WINDOWS
+            // interrupted by signal, try again.
+            if( byte_received < 0 && errno == EINTR )
+                continue;
+#endif
+            m_is_connected = false;
+        }
+        return false;
+    }
 };
 
 //! @brief Streaming to socket.
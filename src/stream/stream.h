@@ -17,6 +17,7 @@
 
 #pragma once
 
+#include <memory>
 #include "core/sassert.h"
 #include "core/log.h"
 #include "math/point.h"
@@ -303,6 +304,23 @@ public:
     //! @param  data    Data to be written.
     //! @param  size    Size of the data to be filled in bytes.
     StreamBase& Write( char* data , int size ) override final { sAssertMsg(false, STREAM, "Streaming in data by using OStreamBase!"); return *this; }
+
+    //! @brief Open a separate section of the stream.
+    //!
+    //! Some streams are organized in sections, which can be loaded independently, even on different threads.
+    //! Streams without sections will simply return nothing.
+    //!
+    //! @param  index   Index of the section in the table of sections.
+    //! @return         A stream of the section, it is nullptr if there is no such a section.
+    virtual std::unique_ptr<IStreamBase> GetSection( unsigned int index ) { return nullptr; }
+
+    //! @brief Whether the source of the stream is lost in the middle.
+    //!
+    //! Streams losing their source, like a socket stream whose peer disconnects, fill the rest of the data with zeros.
+    //! Code waiting for a marker at the end of a list of objects should stop once the stream is broken.
+    //!
+    //! @return         Whether the data loaded so far is not all from the source of the stream.
+    virtual bool IsBroken() const { return false; }
 };
 
 //! @brief Streaming out data
@@ -15,6 +15,7 @@
     this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
  */
 
+#include <type_traits>
 #include "imagetexture3d.h"
 
 template class ImageTexture3D<float>;
@@ -25,8 +26,13 @@ T ImageTexture3D<T>::Sample(int x, int y, int z) const {
     if (x < 0 || x >= (int)Texture3DBase<T>::m_width || y < 0 || y >= (int)Texture3DBase<T>::m_height || z < 0 || z >= (int)Texture3DBase<T>::m_depth)
         return 0.0f;
 
-    const auto offset = z * Texture3DBase<T>::m_width * Texture3DBase<T>::m_height + y * Texture3DBase<T>::m_width + x;
-    return m_memory->m_texel[offset];
+    const auto brick = ((z / BRICK_SIZE) * m_brickCntY + y / BRICK_SIZE) * m_brickCntX + x / BRICK_SIZE;
+    const auto brick_index = m_brickIndices[brick];
+    if (brick_index < 0)
+        return 0.0f;
+
+    const auto offset = ((z % BRICK_SIZE) * BRICK_SIZE + y % BRICK_SIZE) * BRICK_SIZE + x % BRICK_SIZE;
+    return m_bricks[brick_index * BRICK_TEXEL_CNT + offset];
 }
 
 template<class T>
@@ -34,7 +40,7 @@ T ImageTexture3D<T>::Sample(float u, float v, float w) const{
     // There should have been proper filtering algorithms
     // However, since this is mainly for medium density for now, there will be no filter supported.
     // If the uvw is out of range, just retuen 0.0.
-    if (u < 0.0f || u >= 1.0f || v < 0.0f || v >= 1.0f || w < 0.0f || w >= 1.0f)
+    if (u < 0.0f || u >= 1.0f || v < 0.0f || v >= 1.0f || w < 0.0f || w >= 1.0f || !Texture3DBase<T>::IsValid())
         return 0.0f;
 
     const auto width    = Texture3DBase<T>::m_width;
@@ -53,23 +59,62 @@ T ImageTexture3D<T>::Sample(float u, float v, float w) const{
     const auto dy = fy - y;
     const auto dz = fz - z;
 
-    const auto slice_strand = width * height;
-    const auto offset00 = z * slice_strand + y * width + x;
-    const auto offset01 = (x < width - 1) ? offset00 + 1 : offset00;
-    const auto offset10 = (z < depth - 1) ? offset00 + slice_strand : offset00;
-    const auto offset11 = (x < width - 1) ? offset10 + 1 : offset10;
-    const auto offset20 = (y < height - 1) ? offset00 + width : offset00;
-    const auto offset21 = (x < width - 1) ? offset20 + 1 : offset20;
-    const auto offset30 = (z < depth - 1) ? offset20 + slice_strand : offset20;
-    const auto offset31 = (x < width - 1) ? offset30 + 1 : offset30;
-
-    const auto t0 = slerp(m_memory->m_texel[offset00], m_memory->m_texel[offset01], dx);
-    const auto t1 = slerp(m_memory->m_texel[offset10], m_memory->m_texel[offset11], dx);
-    const auto t2 = slerp(m_memory->m_texel[offset20], m_memory->m_texel[offset21], dx);
-    const auto t3 = slerp(m_memory->m_texel[offset30], m_memory->m_texel[offset31], dx);
+    const auto x1 = (x < width - 1) ? x + 1 : x;
+    const auto y1 = (y < height - 1) ? y + 1 : y;
+    const auto z1 = (z < depth - 1) ? z + 1 : z;
+
+    // skip empty space right away if all texels to be interpolated are in the same empty brick
+    if (x / BRICK_SIZE == x1 / BRICK_SIZE && y / BRICK_SIZE == y1 / BRICK_SIZE && z / BRICK_SIZE == z1 / BRICK_SIZE) {
+        const auto brick = ((z / BRICK_SIZE) * m_brickCntY + y / BRICK_SIZE) * m_brickCntX + x / BRICK_SIZE;
+        if (m_brickIndices[brick] < 0)
+            return 0.0f;
+    }
+
+    const auto t0 = slerp(Sample((int)x, (int)y, (int)z), Sample((int)x1, (int)y, (int)z), dx);
+    const auto t1 = slerp(Sample((int)x, (int)y, (int)z1), Sample((int)x1, (int)y, (int)z1), dx);
+    const auto t2 = slerp(Sample((int)x, (int)y1, (int)z), Sample((int)x1, (int)y1, (int)z), dx);
+    const auto t3 = slerp(Sample((int)x, (int)y1, (int)z1), Sample((int)x1, (int)y1, (int)z1), dx);
 
     const auto t02 = slerp(t0, t2, dy);
     const auto t13 = slerp(t1, t3, dy);
     
     return slerp(t02, t13, dz);
-}
\ No newline at end of file
+}
+
+template<class T>
+void ImageTexture3D<T>::loadBricks(IStreamBase& stream) {
+    auto& width = Texture3DBase<T>::m_width;
+    auto& height = Texture3DBase<T>::m_height;
+    auto& depth = Texture3DBase<T>::m_depth;
+    stream >> width >> height >> depth;
+
+    // make sure the dimension is valid.
+    if (width == 0 || height == 0 || depth == 0)
+        return;
+
+    m_brickCntX = (width + BRICK_SIZE - 1) / BRICK_SIZE;
+    m_brickCntY = (height + BRICK_SIZE - 1) / BRICK_SIZE;
+    m_brickCntZ = (depth + BRICK_SIZE - 1) / BRICK_SIZE;
+    const auto brick_cnt = m_brickCntX * m_brickCntY * m_brickCntZ;
+
+    unsigned occupied_brick_cnt = 0;
+    stream >> occupied_brick_cnt;
+
+    m_brickIndices = std::make_unique<int[]>(brick_cnt);
+    stream.Load((char*)m_brickIndices.get(), sizeof(int) * brick_cnt);
+
+    const auto texel_cnt = occupied_brick_cnt * BRICK_TEXEL_CNT;
+    m_bricks = std::make_unique<T[]>(texel_cnt);
+    if constexpr (std::is_same<T, float>::value) {
+        stream.Load((char*)m_bricks.get(), sizeof(float) * texel_cnt);
+    } else {
+        for (auto i = 0u; i < texel_cnt; ++i)
+            stream >> m_bricks[i];
+    }
+
+    // make sure broken data won't lead to out of range access
+    for (auto i = 0u; i < brick_cnt; ++i) {
+        if (m_brickIndices[i] >= (int)occupied_brick_cnt)
+            m_brickIndices[i] = -1;
+    }
+}
@@ -18,10 +18,15 @@
 #pragma once
 
 #include "texturebase.h"
+#include "stream/stream.h"
 
 //! @brief  3D image texture.
 /**
  * 3D image texture is a three dimentional set of pixel data.
+ *
+ * Volume data is usually mostly empty, the texels are stored in bricks of 8x8x8 texels and only bricks
+ * with any non-zero texel take memory. An occupancy index maps each brick to its data, empty bricks are
+ * not backed by any memory and sampling in them returns zero right away.
  */
 template<class T>
 class ImageTexture3D : public Texture3DBase<T>{
@@ -44,12 +49,26 @@ public:
     T Sample(float u, float v, float w) const override;
 
 protected:
-    template<class D>
-    class ImgMemory {
-    public:
-        std::unique_ptr<D[]>     m_texel = nullptr;   /**< RGB Channels. */
-    };
-
-    /**< 3d texture memory. */
-    std::unique_ptr<ImgMemory<T>>  m_memory = nullptr;
-};
\ No newline at end of file
+    /**< Number of texels along each axis of a brick. */
+    static constexpr unsigned BRICK_SIZE = 8;
+    /**< Number of texels in a brick. */
+    static constexpr unsigned BRICK_TEXEL_CNT = BRICK_SIZE * BRICK_SIZE * BRICK_SIZE;
+
+    /**< Number of bricks along each axis. */
+    unsigned    m_brickCntX = 0;
+    unsigned    m_brickCntY = 0;
+    unsigned    m_brickCntZ = 0;
+
+    /**< Index of the data of each brick, it is -1 for empty bricks. */
+    std::unique_ptr<int[]>  m_brickIndices = nullptr;
+    /**< Texels of all occupied bricks. */
+    std::unique_ptr<T[]>    m_bricks = nullptr;
+
+    //! @brief  Load the texture in bricks from stream.
+    //!
+    //! The dimension of the texture comes first, followed by the number of occupied bricks, the occupancy
+    //! index of all bricks and the texels of occupied bricks. A texture of zero size has nothing else.
+    //!
+    //! @param  stream  Where the serialization data comes from.
+    void    loadBricks(IStreamBase& stream);
+};
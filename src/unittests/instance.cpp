@@ -0,0 +1,62 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+*/
+
+#include "thirdparty/gtest/gtest.h"
+#include "shape/quad.h"
+#include "shape/instance.h"
+#include "accel/bvh.h"
+#include "unittest_common.h"
+
+// Two instances of a quad along a ray pointing downward, the upper one is untransformed and the lower one is rotated.
+// No matter in which order they are tested, the intersection should be the one with the upper instance.
+TEST(Instance, OverlappingInstances) {
+    Quad quad;
+    quad.SetSizeX( 4.0f );
+    quad.SetSizeY( 4.0f );
+    const Primitive quad_primitive( nullptr , nullptr , &quad );
+    const std::vector<const Primitive*> primitives = { &quad_primitive };
+
+    Bvh blas;
+    blas.Build( primitives , quad.GetBBox() );
+
+    const Instance upper( &blas , Translate( 0.0f , 1.0f , 0.0f ) , quad.SurfaceArea() );
+    const Instance lower( &blas , Translate( 0.0f , -1.0f , 0.0f ) * RotateZ( PI * 0.25f ) , quad.SurfaceArea() );
+
+    const Ray ray( Point( 0.0f , 10.0f , 0.0f ) , Vector( 0.0f , -1.0f , 0.0f ) );
+
+    // the lower instance is behind the intersection with the upper one, it should leave the intersection untouched
+    SurfaceInteraction intersect0;
+    EXPECT_TRUE( upper.GetIntersect( ray , &intersect0 ) );
+    EXPECT_FALSE( lower.GetIntersect( ray , &intersect0 ) );
+    EXPECT_NEAR( intersect0.t , 9.0f , 0.001f );
+    EXPECT_NEAR( intersect0.normal.y , 1.0f , 0.001f );
+    EXPECT_NEAR( intersect0.gnormal.y , 1.0f , 0.001f );
+    EXPECT_NEAR( intersect0.tangent.z , 1.0f , 0.001f );
+
+    // the upper instance replaces the intersection with the lower one
+    SurfaceInteraction intersect1;
+    EXPECT_TRUE( lower.GetIntersect( ray , &intersect1 ) );
+    EXPECT_NEAR( intersect1.t , 11.0f , 0.001f );
+    EXPECT_NEAR( intersect1.normal.y , cos( PI * 0.25f ) , 0.001f );
+    EXPECT_TRUE( upper.GetIntersect( ray , &intersect1 ) );
+    EXPECT_NEAR( intersect1.t , 9.0f , 0.001f );
+    EXPECT_NEAR( intersect1.normal.y , 1.0f , 0.001f );
+    EXPECT_NEAR( intersect1.gnormal.y , 1.0f , 0.001f );
+
+    // it is still an intersection when nothing is nearer
+    EXPECT_TRUE( lower.GetIntersect( ray , nullptr ) );
+}
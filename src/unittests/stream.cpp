@@ -18,6 +18,7 @@
 #include "thirdparty/gtest/gtest.h"
 #include "stream/fstream.h"
 #include "stream/mstream.h"
+#include "stream/mmstream.h"
 #include "core/rand.h"
 #include "core/render_context.h"
 #include "unittest_common.h"
@@ -111,4 +112,110 @@ TEST(STREAM, MemoryStream) {
         EXPECT_EQ(t1, vec_i[i]);
         EXPECT_EQ(t2, vec_u[i]);
     }
-}
\ No newline at end of file
+}
+
+TEST(STREAM, MappedStream) {
+    RenderContext rc;
+    rc.Init();
+
+    std::vector<float>           vec_f;
+    std::vector<int>             vec_i;
+    std::vector<unsigned int>    vec_u;
+    OFileStream ofile("test_mapped.bin");
+    std::string str = "this is a random string";
+    ofile<<str;
+    bool flag = true;
+    ofile<<flag;
+    std::string empty_str = "";
+    ofile<<empty_str;
+    for (unsigned i = 0; i < STREAM_SAMPLE_COUNT; ++i) {
+        vec_f.push_back( sort_rand<float>(rc) );
+        vec_i.push_back( (int)( ( 2.0f * sort_rand<float>(rc) - 1.0f ) * STREAM_SAMPLE_COUNT ) );
+        vec_u.push_back( (unsigned int)( sort_rand<float>(rc) * STREAM_SAMPLE_COUNT ) );
+        ofile << vec_f.back() << vec_i.back() ;
+        ofile << vec_u.back();
+    }
+    ofile.Close();
+
+    IMappedStream ifile("test_mapped.bin");
+    std::string str_copy;
+    ifile>>str_copy;
+    EXPECT_EQ( str_copy , str );
+    bool flag_copy = false;
+    ifile>>flag_copy;
+    EXPECT_EQ( flag_copy , flag );
+    std::string empty_str_copy;
+    ifile>>empty_str_copy;
+    EXPECT_EQ( empty_str_copy , empty_str );
+    for (int i = 0; i < STREAM_SAMPLE_COUNT; ++i) {
+        float t0 = 0.0f;
+        int t1 = 0;
+        unsigned int t2 = 0;
+        ifile >> t0 >> t1 >> t2;
+        EXPECT_EQ(t0, vec_f[i]);
+        EXPECT_EQ(t1, vec_i[i]);
+        EXPECT_EQ(t2, vec_u[i]);
+    }
+}
+
+TEST(STREAM, SectionedFileStream) {
+    // two sections, the main section goes after a mesh section
+    const std::string scene_data = "scene section";
+    const std::string mesh_data = "mesh section";
+    const unsigned int header_size = 24;
+    const unsigned int mesh_offset = header_size;
+    const unsigned int mesh_size = (unsigned int)mesh_data.size() + 1;
+    const unsigned int scene_offset = mesh_offset + mesh_size;
+    const unsigned int scene_size = (unsigned int)scene_data.size() + 1;
+    const unsigned int table_offset = scene_offset + scene_size;
+
+    OFileStream ofile("test_sectioned.bin");
+    char magic[8] = { 'S', 'O', 'R', 'T', 'S', 'C', 'N', '\0' };
+    ofile.Write( magic , sizeof(magic) );
+    ofile << 0u << 2u << table_offset << 0u;
+    ofile << mesh_data << scene_data;
+    ofile << "mesh"_sid << mesh_offset << 0u << mesh_size << 0u;
+    ofile << "scene"_sid << scene_offset << 0u << scene_size << 0u;
+    ofile.Close();
+
+    ISectionedFileStream ifile("test_sectioned.bin");
+    EXPECT_TRUE( ifile.IsValid() );
+
+    std::string str;
+    ifile >> str;
+    EXPECT_EQ( str , scene_data );
+
+    auto section = ifile.GetSection(0);
+    EXPECT_TRUE( IS_PTR_VALID(section) );
+    *section >> str;
+    EXPECT_EQ( str , mesh_data );
+
+    EXPECT_TRUE( IS_PTR_INVALID(ifile.GetSection(2)) );
+
+    // plain files are not sectioned files
+    ISectionedFileStream plain_file("test.bin");
+    EXPECT_FALSE( plain_file.IsValid() );
+}
+
+TEST(STREAM, WritableMappedFile) {
+    OFileStream ofile("test_shared.bin");
+    for (unsigned i = 0; i < STREAM_SAMPLE_COUNT; ++i)
+        ofile << 0.0f;
+    ofile.Close();
+
+    // changes through a writable mapping are visible to any other mapping of the same file
+    {
+        MappedFile writable("test_shared.bin", true);
+        ASSERT_TRUE( writable.IsValid() );
+        auto data = reinterpret_cast<float*>(writable.GetWritableData());
+        for (unsigned i = 0; i < STREAM_SAMPLE_COUNT; ++i)
+            data[i] = (float)i;
+
+        MappedFile readonly("test_shared.bin");
+        EXPECT_EQ( readonly.GetWritableData() , nullptr );
+        EXPECT_EQ( readonly.GetSize() , writable.GetSize() );
+        const auto shared = reinterpret_cast<const float*>(readonly.GetData());
+        for (unsigned i = 0; i < STREAM_SAMPLE_COUNT; ++i)
+            EXPECT_EQ( shared[i] , (float)i );
+    }
+}
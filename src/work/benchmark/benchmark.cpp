@@ -0,0 +1,310 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include <algorithm>
+#include <chrono>
+#include <fstream>
+#include <random>
+#include <typeinfo>
+#include "benchmark.h"
+#include "core/log.h"
+#include "core/parse_args.h"
+#include "core/samplemethod.h"
+#include "material/matmanager.h"
+#include "sampler/sample.h"
+#include "stream/fstream.h"
+#include "stream/mmstream.h"
+
+#if defined(SORT_IN_WINDOWS)
+#include <windows.h>
+#include <psapi.h>
+#elif defined(SORT_IN_MAC)
+#include <mach/mach.h>
+#else
+#include <unistd.h>
+#endif
+
+// Camera rays are generated tile by tile, rays inside a tile go through neighbouring pixels.
+static constexpr unsigned BENCHMARK_TILE_SIZE = 8;
+
+// All accelerators, the name is what they are registered with.
+static const char* BENCHMARK_ACCELERATORS[] = { "Bvh", "Qbvh", "Obvh", "KDTree", "OcTree", "UniGrid" };
+
+namespace {
+    // Memory of the process that is in RAM, in bytes.
+    long long residentMemory() {
+#if defined(SORT_IN_WINDOWS)
+        PROCESS_MEMORY_COUNTERS counters;
+        if (GetProcessMemoryInfo(GetCurrentProcess(), &counters, sizeof(counters)))
+            return (long long)counters.WorkingSetSize;
+        return 0;
+#elif defined(SORT_IN_MAC)
+        mach_task_basic_info info;
+        mach_msg_type_number_t count = MACH_TASK_BASIC_INFO_COUNT;
+        if (task_info(mach_task_self(), MACH_TASK_BASIC_INFO, (task_info_t)&info, &count) == KERN_SUCCESS)
+            return (long long)info.resident_size;
+        return 0;
+#else
+        long long pages = 0, resident = 0;
+        std::ifstream statm("/proc/self/statm");
+        if (statm >> pages >> resident)
+            return resident * sysconf(_SC_PAGESIZE);
+        return 0;
+#endif
+    }
+
+    // Million rays per second.
+    float mraysPerSecond(size_t ray_cnt, float ms) {
+        return ms > 0.0f ? (float)ray_cnt / (ms * 1000.0f) : 0.0f;
+    }
+
+    // Milliseconds since a moment.
+    float elapsedMs(const std::chrono::high_resolution_clock::time_point& start) {
+        return std::chrono::duration<float, std::milli>(std::chrono::high_resolution_clock::now() - start).count();
+    }
+}
+
+void Benchmark::StartRunning(int argc, char** argv) {
+    parseCommandArgs(argc, argv);
+
+    if (m_output_file.empty())
+        m_output_file = "sort_benchmark_" + logTimeStringStripped() + ".json";
+
+    // materials need to be parsed to get to the scene even if nothing is shaded
+    CreateTSLThreadContexts();
+
+    // load the file the same way it is loaded for rendering
+    std::unique_ptr<IStreamBase> stream_ptr;
+    auto sectioned_stream = std::make_unique<ISectionedFileStream>(m_input_file);
+    if (sectioned_stream->IsValid())
+        stream_ptr = std::move(sectioned_stream);
+    else
+        stream_ptr = std::make_unique<IFileStream>(m_input_file);
+    auto& stream = *stream_ptr;
+
+    // only the scene itself matters, the configuration is skipped
+    GlobalConfiguration config;
+    config.Serialize(stream);
+
+    auto sc = pullContext(m_sc_holder);
+    MatManager::GetSingleton().ParseMatFile(stream, true, sc->context.get());
+    recycleContext(m_sc_holder, sc);
+
+    m_loaded = m_scene.LoadScene(stream);
+    if (!m_loaded || m_scene.GetPrimitives().empty()) {
+        slog(WARNING, GENERAL, "There is nothing to benchmark in %s.", m_input_file.c_str());
+        m_loaded = false;
+        return;
+    }
+
+    slog(INFO, GENERAL, "Benchmarking %d primitives with %d rays, seed %d.", (int)m_scene.GetPrimitives().size(), m_ray_cnt, m_seed);
+    generateCoherentRays();
+
+    // growing the bounce rays later would free buffers that the next accelerator reuses without growing the resident memory
+    m_incoherent_rays.reserve(m_coherent_rays.size());
+
+    // the accelerator in the scene keeps its own settings
+    const auto scene_accelerator = m_scene.GetAccelerator();
+    for (const auto type : BENCHMARK_ACCELERATORS) {
+        auto accelerator = MakeUniqueInstance<Accelerator>(StringID(type));
+        if (!accelerator)
+            continue;
+        if (scene_accelerator && typeid(*scene_accelerator) == typeid(*accelerator))
+            accelerator = scene_accelerator->Clone();
+        benchmarkAccelerator(type, std::move(accelerator));
+    }
+}
+
+int Benchmark::WaitForWorkToBeDone() {
+    DestroyTSLThreadContexts();
+
+    if (!m_loaded)
+        return -1;
+
+    std::ofstream file(m_output_file);
+    if (!file) {
+        slog(WARNING, GENERAL, "Failed to write benchmark results to %s.", m_output_file.c_str());
+        return -1;
+    }
+
+    std::string scene = m_input_file;
+    for (auto pos = scene.find_first_of("\\\""); pos != std::string::npos; pos = scene.find_first_of("\\\"", pos + 2))
+        scene.insert(pos, "\\");
+
+    file << "{\n";
+    file << "  \"scene\": \"" << scene << "\",\n";
+    file << "  \"primitives\": " << m_scene.GetPrimitives().size() << ",\n";
+    file << "  \"seed\": " << m_seed << ",\n";
+    file << "  \"threads\": 1,\n";
+    file << "  \"coherent_rays\": " << m_coherent_rays.size() << ",\n";
+    file << "  \"incoherent_rays\": " << m_incoherent_rays.size() << ",\n";
+    file << "  \"accelerators\": [\n";
+    for (auto i = 0u; i < m_results.size(); ++i) {
+        const auto& result = m_results[i];
+        file << "    {\n";
+        file << "      \"type\": \"" << result.type << "\",\n";
+        file << "      \"build_ms\": " << result.build_time << ",\n";
+        file << "      \"memory_bytes\": " << result.memory << ",\n";
+        file << "      \"closest_hit_mrays\": { \"coherent\": " << result.closest_coherent << ", \"incoherent\": " << result.closest_incoherent << " },\n";
+        file << "      \"occlusion_mrays\": { \"coherent\": " << result.occlusion_coherent << ", \"incoherent\": " << result.occlusion_incoherent << " },\n";
+        file << "      \"hits\": { \"coherent\": " << result.hit_coherent << ", \"incoherent\": " << result.hit_incoherent << " }\n";
+        file << "    }" << (i + 1 < m_results.size() ? "," : "") << "\n";
+    }
+    file << "  ]\n";
+    file << "}\n";
+
+    slog(INFO, GENERAL, "Benchmark results are written to %s.", m_output_file.c_str());
+    return 0;
+}
+
+void Benchmark::parseCommandArgs(int argc, char** argv) {
+    const auto& args = parse_args(argc, argv, true);
+    for (auto& arg : args) {
+        const std::string& key_str = arg.first;
+        const std::string& value_str = arg.second;
+
+        if (key_str == "input")
+            m_input_file = value_str;
+        else if (key_str == "benchmark")
+            m_output_file = value_str;
+        else if (key_str == "rays")
+            m_ray_cnt = std::max(1, atoi(value_str.c_str()));
+        else if (key_str == "seed")
+            m_seed = (unsigned)std::max(0, atoi(value_str.c_str()));
+    }
+}
+
+void Benchmark::generateCoherentRays() {
+    std::mt19937 rng(m_seed);
+    std::uniform_real_distribution<float> dis(0.0f, 1.0f);
+
+    const auto camera = m_scene.GetCamera();
+    if (!camera) {
+        // rays from the center of the scene are still coherent if their directions are sorted
+        const auto& bbox = m_scene.GetBBox();
+        const auto center = (bbox.m_Min + bbox.m_Max) * 0.5f;
+        for (auto i = 0u; i < m_ray_cnt; ++i) {
+            const auto u = ((float)i + dis(rng)) / (float)m_ray_cnt;
+            m_coherent_rays.push_back(Ray(center, UniformSampleSphere(u, dis(rng))));
+        }
+        return;
+    }
+
+    // a grid of the same aspect ratio with the image, each cell of the grid gets one ray
+    const auto resolution = camera->GetImageResolution();
+    const auto aspect = (float)resolution.x / (float)std::max(resolution.y, 1);
+    const auto grid_w = std::max(1u, (unsigned)sqrt(m_ray_cnt * aspect));
+    const auto grid_h = std::max(1u, m_ray_cnt / grid_w);
+
+    PixelSample ps;
+    ps.dof_u = ps.dof_v = 0.0f;
+    for (auto ty = 0u; ty < grid_h; ty += BENCHMARK_TILE_SIZE) {
+        for (auto tx = 0u; tx < grid_w; tx += BENCHMARK_TILE_SIZE) {
+            for (auto y = ty; y < std::min(ty + BENCHMARK_TILE_SIZE, grid_h); ++y) {
+                for (auto x = tx; x < std::min(tx + BENCHMARK_TILE_SIZE, grid_w); ++x) {
+                    const auto px = ((float)x + dis(rng)) * (float)resolution.x / (float)grid_w;
+                    const auto py = ((float)y + dis(rng)) * (float)resolution.y / (float)grid_h;
+                    ps.img_u = px - floor(px);
+                    ps.img_v = py - floor(py);
+                    m_coherent_rays.push_back(camera->GenerateRay(floor(px), floor(py), ps));
+                }
+            }
+        }
+    }
+}
+
+void Benchmark::generateIncoherentRays(const Accelerator& accelerator) {
+    std::mt19937 rng(m_seed + 1);
+    std::uniform_real_distribution<float> dis(0.0f, 1.0f);
+
+    auto rc = pullContext(m_rc_holder);
+    for (const auto& ray : m_coherent_rays) {
+        SurfaceInteraction intersection;
+        rc->Reset();
+        if (!accelerator.GetIntersect(*rc, ray, intersection))
+            continue;
+
+        // bounce off the side of the surface the camera ray comes from
+        auto wi = UniformSampleSphere(dis(rng), dis(rng));
+        if (dot(wi, intersection.gnormal) * dot(ray.m_Dir, intersection.gnormal) > 0.0f)
+            wi = -wi;
+        m_incoherent_rays.push_back(Ray(intersection.intersect, wi, 0, 0.001f));
+    }
+    recycleContext(m_rc_holder, rc);
+
+    // neighbouring rays have nothing to do with each other
+    std::shuffle(m_incoherent_rays.begin(), m_incoherent_rays.end(), rng);
+}
+
+void Benchmark::benchmarkAccelerator(const std::string& type, std::unique_ptr<Accelerator> accelerator) {
+    AcceleratorResult result;
+    result.type = type;
+
+    const auto memory = residentMemory();
+    const auto build_start = std::chrono::high_resolution_clock::now();
+    accelerator->Build(m_scene.GetPrimitives(), m_scene.GetBBox());
+    result.build_time = elapsedMs(build_start);
+    result.memory = std::max(0ll, residentMemory() - memory);
+
+    // the first accelerator finds the surfaces for bounce rays, all the others trace the same rays
+    if (m_results.empty())
+        generateIncoherentRays(*accelerator);
+
+    auto rc = pullContext(m_rc_holder);
+
+    auto closest_hit = [&](const std::vector<Ray>& rays, unsigned& hit_cnt) {
+        const auto start = std::chrono::high_resolution_clock::now();
+        for (const auto& ray : rays) {
+            SurfaceInteraction intersection;
+            rc->Reset();
+            if (accelerator->GetIntersect(*rc, ray, intersection))
+                ++hit_cnt;
+        }
+        return mraysPerSecond(rays.size(), elapsedMs(start));
+    };
+
+    auto occlusion = [&](const std::vector<Ray>& rays) {
+        const auto start = std::chrono::high_resolution_clock::now();
+        for (const auto& ray : rays) {
+#ifndef ENABLE_TRANSPARENT_SHADOW
+            accelerator->IsOccluded(ray);
+#else
+            SurfaceInteraction intersection;
+            intersection.query_shadow = true;
+            rc->Reset();
+            accelerator->GetIntersect(*rc, ray, intersection);
+#endif
+        }
+        return mraysPerSecond(rays.size(), elapsedMs(start));
+    };
+
+    result.closest_coherent = closest_hit(m_coherent_rays, result.hit_coherent);
+    result.closest_incoherent = closest_hit(m_incoherent_rays, result.hit_incoherent);
+    result.occlusion_coherent = occlusion(m_coherent_rays);
+    result.occlusion_incoherent = occlusion(m_incoherent_rays);
+
+    recycleContext(m_rc_holder, rc);
+
+    slog(INFO, GENERAL, "%s: build %.2f (ms), %.2f (MB), closest hit %.2f/%.2f Mrays/s, occlusion %.2f/%.2f Mrays/s (coherent/incoherent).",
+         type.c_str(), result.build_time, result.memory / (1024.0f * 1024.0f), result.closest_coherent, result.closest_incoherent,
+         result.occlusion_coherent, result.occlusion_incoherent);
+
+    m_results.push_back(result);
+
+    // it is kept alive until all accelerators are built so that the next one can't reuse its memory
+    m_accelerators.push_back(std::move(accelerator));
+}
@@ -0,0 +1,88 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include <vector>
+#include "../work.h"
+
+//! @brief  Measuring the throughput of all spatial acceleration structures on a scene.
+/**
+ * The scene is loaded the same way it is for rendering, every accelerator is then built on it one after another. The
+ * accelerator configured in the scene keeps its settings, the others take their default settings. Build time and
+ * the resident memory it takes are measured for each of them. All accelerators are kept alive until the end so that
+ * memory still held by one accelerator never counts for another.
+ *
+ * Two fixed sets of rays are traced against each accelerator, both closest hit and occlusion queries are measured.
+ *   coherent   : camera rays going through the image tile by tile, neighbouring rays go through neighbouring pixels.
+ *   incoherent : diffuse bounce rays off the surfaces hit by the camera rays, in random order.
+ * Random numbers come from a seeded generator so that the same scene and seed always give the same rays, results can
+ * be compared between builds of SORT. Rays are traced in a single thread, the results are written as a json file.
+ */
+class Benchmark : public Work {
+public:
+    DEFINE_RTTI(Benchmark, Work);
+
+    //! @brief  Load the scene and benchmark all accelerators.
+    void    StartRunning(int argc, char** argv) override;
+
+    //! @brief  Write the results of benchmarking.
+    //!
+    //! @return             Zero if the results are written, non-zero otherwise.
+    int     WaitForWorkToBeDone() override;
+
+private:
+    //! @brief  Results of benchmarking an accelerator.
+    struct AcceleratorResult {
+        std::string     type;                       /**< Type of the accelerator. */
+        float           build_time = 0.0f;          /**< Time to build the accelerator, in milliseconds. */
+        long long       memory = 0;                 /**< Resident memory that grows when building the accelerator, in bytes. */
+        float           closest_coherent = 0.0f;    /**< Million closest hit queries per second of coherent rays. */
+        float           closest_incoherent = 0.0f;  /**< Million closest hit queries per second of incoherent rays. */
+        float           occlusion_coherent = 0.0f;  /**< Million occlusion queries per second of coherent rays. */
+        float           occlusion_incoherent = 0.0f;/**< Million occlusion queries per second of incoherent rays. */
+        unsigned        hit_coherent = 0;           /**< Coherent rays hitting anything, accelerators should agree on it. */
+        unsigned        hit_incoherent = 0;         /**< Incoherent rays hitting anything, accelerators should agree on it. */
+    };
+
+    std::string                     m_input_file;           // scene to be benchmarked
+    std::string                     m_output_file;          // json file the results are written to
+    unsigned                        m_ray_cnt = 1 << 20;    // number of coherent rays
+    unsigned                        m_seed = 0;             // seed of the random numbers for rays
+    bool                            m_loaded = false;       // whether the scene is loaded
+
+    std::vector<Ray>                m_coherent_rays;        // camera rays
+    std::vector<Ray>                m_incoherent_rays;      // bounce rays
+    std::vector<AcceleratorResult>  m_results;              // results of all accelerators
+    std::vector<std::unique_ptr<Accelerator>>   m_accelerators; // all accelerators built, kept alive while measuring
+
+    void    parseCommandArgs(int argc, char** argv);
+
+    //! @brief  Generate camera rays tile by tile.
+    void    generateCoherentRays();
+
+    //! @brief  Generate bounce rays off the surfaces hit by camera rays.
+    //!
+    //! @param  accelerator The accelerator that is built, it finds the surfaces.
+    void    generateIncoherentRays(const Accelerator& accelerator);
+
+    //! @brief  Build an accelerator and measure it.
+    //!
+    //! @param  type        Type of the accelerator.
+    //! @param  accelerator The accelerator that is not built yet.
+    void    benchmarkAccelerator(const std::string& type, std::unique_ptr<Accelerator> accelerator);
+};
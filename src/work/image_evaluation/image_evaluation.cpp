@@ -22,6 +22,9 @@
 #include "image_evaluation.h"
 #include "core/display_mgr.h"
 #include "stream/fstream.h"
+#include "stream/sstream.h"
+#include "stream/mmstream.h"
+#include "stream/mstream.h"
 #include "core/strid.h"
 #include "material/matmanager.h"
 #include "core/timer.h"
@@ -33,14 +36,19 @@ SORT_STATS_DEFINE_COUNTER(sPreprocessingTimeMS)
 SORT_STATS_DEFINE_COUNTER(sRenderingTimeMS)
 SORT_STATS_DEFINE_COUNTER(sSamplePerPixel)
 SORT_STATS_DEFINE_COUNTER(sThreadCnt)
+SORT_STATS_DEFINE_COUNTER(sPixelSampleCnt)
+SORT_STATS_DEFINE_COUNTER(sPixelCnt)
 
 SORT_STATS_TIME("Performance", "Acceleration Structure Construction", sPreprocessingTimeMS);
 SORT_STATS_TIME("Performance", "Rendering Time", sRenderingTimeMS);
 SORT_STATS_AVG_RAY_SECOND("Performance", "Number of rays per second", sRayCount, sRenderingTimeMS);
 SORT_STATS_COUNTER("Statistics", "Sample per Pixel", sSamplePerPixel);
 SORT_STATS_COUNTER("Performance", "Worker thread number", sThreadCnt);
+SORT_STATS_AVG_COUNT("Statistics", "Average Sample per Pixel", sPixelSampleCnt, sPixelCnt);
 
-static constexpr unsigned int GLOBAL_CONFIGURATION_VERSION = 0;
+// The luminance of dark pixels is clamped to this when estimating their relative noise, otherwise nearly black pixels
+// would never converge.
+static constexpr float ADAPTIVE_MIN_LUMINANCE = 0.01f;
 static constexpr unsigned int IMAGE_TILE_SIZE = 64;
 
 void thread_shut_down(int id) {
@@ -59,12 +67,87 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
     // create tsl thread context
     CreateTSLThreadContexts();
     
-    // load the file
-    std::unique_ptr<IStreamBase> stream_ptr = std::make_unique<IFileStream>( m_input_file );
+    // the scene is streamed through socket if there is an input server, this avoids the round trip to disk.
+    std::unique_ptr<SocketConnection> input_connection;
+    std::unique_ptr<IStreamBase> stream_ptr;
+    if (m_has_input_server) {
+        input_connection = ConnectSocket(m_input_server_ip, m_input_server_port);
+        if (!input_connection) {
+            slog(ERROR, SOCKET, "Failed to connect to input server %s:%s, rendering is aborted.", m_input_server_ip.c_str(), m_input_server_port.c_str());
+            m_aborted = true;
+            return;
+        }
+
+        slog(INFO, SOCKET, "Connected to input server %s:%s.", m_input_server_ip.c_str(), m_input_server_port.c_str());
+        stream_ptr = std::make_unique<ISocketStream>(input_connection->m_socket);
+    }
+
+    // a socket stream is zero filled once the input server is gone, what is loaded after that is not the scene
+    const auto is_input_lost = [&]() {
+        if (!stream_ptr->IsBroken())
+            return false;
+        slog(ERROR, SOCKET, "Lost connection to input server %s:%s before the scene is loaded, rendering is aborted.", m_input_server_ip.c_str(), m_input_server_port.c_str());
+        m_aborted = true;
+        return true;
+    };
+
+    // load the file, sectioned files are memory mapped so that meshes can be loaded in parallel
+    if (!stream_ptr) {
+        auto sectioned_stream = std::make_unique<ISectionedFileStream>( m_input_file );
+        if (sectioned_stream->IsValid())
+            stream_ptr = std::move(sectioned_stream);
+        else
+            stream_ptr = std::make_unique<IFileStream>( m_input_file );
+    }
     auto& stream = *stream_ptr;
     
     // load configuration
     loadConfig(stream);
+    if (is_input_lost())
+        return;
+
+    // the image is shared with other processes if there is a tile server, the whole image is rendered otherwise
+    if (m_has_tile_server) {
+        m_tile_connection = ConnectSocket(m_tile_server_ip, m_tile_server_port);
+        if (m_tile_connection) {
+            slog(INFO, SOCKET, "Connected to tile server %s:%s.", m_tile_server_ip.c_str(), m_tile_server_port.c_str());
+            m_tile_input = std::make_unique<ISocketStream>(m_tile_connection->m_socket);
+            m_tile_output = std::make_unique<OSocketStream>(m_tile_connection->m_socket);
+        } else {
+            slog(WARNING, SOCKET, "Failed to connect to tile server %s:%s, rendering the whole image.", m_tile_server_ip.c_str(), m_tile_server_port.c_str());
+        }
+    }
+
+    // a time budget or a noise target makes the image rendered in passes, passes can also be asked for explicitly
+    m_progressive = m_progressive || m_interactive || m_time_budget > 0.0f || m_noise_target > 0.0f;
+    if (m_progressive && m_tile_connection) {
+        slog(WARNING, GENERAL, "Progressive rendering is not supported with a tile server, it is disabled.");
+        m_progressive = false;
+    }
+    if (m_progressive && IS_PTR_VALID(m_integrator) && m_integrator->NeedImageLock()) {
+        slog(WARNING, GENERAL, "Progressive rendering is not supported by this integrator, it is disabled.");
+        m_progressive = false;
+    }
+    if (m_interactive && (!m_progressive || !m_has_display_server)) {
+        slog(WARNING, GENERAL, "Interactive rendering needs progressive rendering and a display server, it is disabled.");
+        m_interactive = false;
+    }
+
+    // quick previews render fewer pixels and samples, progressive rendering only starts with low resolution passes
+    if (m_downsample > 1 && !m_progressive) {
+        m_image_width = std::max(1u, m_image_width / m_downsample);
+        m_image_height = std::max(1u, m_image_height / m_downsample);
+
+        const auto border_end = ( m_border_ori + m_border_size ) / (int)m_downsample;
+        m_border_ori /= (int)m_downsample;
+        m_border_size = Vector2i(std::max(1, border_end.x - m_border_ori.x), std::max(1, border_end.y - m_border_ori.y));
+    }
+    if (m_spp_override > 0) {
+        m_sample_per_pixel = m_spp_override;
+        m_adaptive_sampling = false;
+    }
+    if (m_thread_override > 0)
+        m_thread_cnt = m_thread_override;
 
     // setup job system
     marl::Scheduler::Config cfg;
@@ -82,6 +165,10 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
         });
     }
 
+    // pixels go through memory shared with Blender if possible, the socket is still needed for notifications
+    if (m_has_display_server && m_blender_mode && !m_display_memory.empty())
+        DisplayManager::GetSingleton().SetupSharedFramebuffer(m_display_memory, m_border_size.x, m_border_size.y);
+
     m_need_render_target = !m_blender_mode || m_integrator->NeedFinalUpdate();
     if (m_need_render_target)
         m_render_target = std::make_unique<RenderTarget>(m_image_width, m_image_height);
@@ -106,10 +193,19 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
 
     // Serialize the scene entities
     m_scene.LoadScene(stream);
+    if (is_input_lost()) {
+#ifdef ENABLE_MULTI_THREAD_SHADER_COMPILATION
+        build_mat_wait_group.wait();
+#endif
+        return;
+    }
+    if (m_downsample > 1 && !m_progressive && m_scene.GetCamera())
+        m_scene.GetCamera()->SetImageResolution(m_image_width, m_image_height);
 
     // display the image first
     if (m_has_display_server) {
-        std::shared_ptr<DisplayImageInfo> image_info = std::make_shared<DisplayImageInfo>(m_image_title, m_image_width, m_image_height, m_blender_mode);
+        const auto display_size = m_blender_mode ? m_border_size : Vector2i(m_image_width, m_image_height);
+        std::shared_ptr<DisplayImageInfo> image_info = std::make_shared<DisplayImageInfo>(m_image_title, display_size.x, display_size.y, m_blender_mode);
         DisplayManager::GetSingleton().QueueDisplayItem(image_info);
     }
 
@@ -150,17 +246,6 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
         recycleContext(m_rc_holder, pRc);
     });
 
-    // get the number of total task
-    const auto tilesize = IMAGE_TILE_SIZE;
-    Vector2i tile_num = Vector2i((int)ceil(m_image_width / (float)tilesize), (int)ceil(m_image_height / (float)tilesize));
-
-    // start tile from center instead of top-left corner
-    Vector2i cur_pos(tile_num / 2);
-    int cur_dir = 0;
-    int cur_len = 0;
-    int cur_dir_len = 1;
-    const Vector2i dir[4] = { Vector2i(0 , -1) , Vector2i(-1 , 0) , Vector2i(0 , 1) , Vector2i(1 , 0) };
-
     // make sure preprocessing is done
     pre_processing_done.wait();
 
@@ -171,97 +256,70 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
 
     m_timer.Reset();
 
-    // at this point, we are starting to render stuff
-    while (true) {
-        // only process node inside the image region
-        if (cur_pos.x >= 0 && cur_pos.x < tile_num.x && cur_pos.y >= 0 && cur_pos.y < tile_num.y) {
-            Vector2i tl(cur_pos.x * tilesize, cur_pos.y * tilesize);
-            Vector2i size((tilesize < (m_image_width - tl.x)) ? tilesize : (m_image_width - tl.x),
-                (tilesize < (m_image_height - tl.y)) ? tilesize : (m_image_height - tl.y));
-
-            // pre-processing for integrators, like instant radiosity
+    // each worker thread keeps asking the tile server for the next tile until there is none left
+    if (m_tile_connection) {
+        const auto samples = m_adaptive_sampling ? m_max_samples : m_sample_per_pixel;
+        for (auto i = 0u; i < m_thread_cnt; ++i) {
             ++m_tile_cnt;
-            marl::schedule([this](const Vector2i& ori, const Vector2i& size) {
-                // get a render context
-                auto pRc = pullContext(m_rc_holder);
-                auto& rc = *pRc;
-
-                // get camera
-                auto camera = m_scene.GetCamera();
-
-                auto sampler = std::make_unique<RandomSampler>();
-                auto pixelSamples = std::make_unique<PixelSample[]>(m_sample_per_pixel);
+            marl::schedule([this, samples]() {
+                Vector2i ori, size;
+                while (!m_aborted && requestTile(ori, size))
+                    renderTile(ori, size, samples);
+                --m_tile_cnt;
+            });
+        }
+        return;
+    }
 
-                // request samples
-                m_integrator->RequestSample(sampler.get(), pixelSamples.get(), m_sample_per_pixel);
+    const auto tiles = collectTiles();
 
-                const bool need_refresh_tile = m_integrator->NeedRefreshTile();
-                const auto total_pixel = size.x * size.y;
-                std::shared_ptr<DisplayTile> display_tile;
-                if (m_has_display_server && need_refresh_tile) {
-                    // indicate that we are rendering this tile
-                    std::shared_ptr<IndicationTile> indicate_tile = std::make_shared<IndicationTile>(m_image_title, ori.x, ori.y, size.x, size.y, m_blender_mode);
-                    DisplayManager::GetSingleton().QueueDisplayItem(indicate_tile);
+    // a single task drives all passes, the rendering is done once it is done
+    if (m_progressive) {
+        m_estimates = std::make_unique<PixelEstimate[]>(m_border_size.x * m_border_size.y);
 
-                    display_tile = std::make_shared<DisplayTile>(m_image_title, ori.x, ori.y, size.x, size.y, m_blender_mode);
-                }
+        ++m_tile_cnt;
+        marl::schedule([this, tiles]() {
+            renderProgressively(tiles);
+            --m_tile_cnt;
+        });
+        return;
+    }
 
-                Vector2i rb = ori + size;
-                for (int i = ori.y; i < rb.y; i++) {
-                    for (int j = ori.x; j < rb.x; j++) {
-                        // reset the memory allocator so that the last sample could reuse memory
-                        // otherwise, memory usage is linear to spp.
-                        rc.Reset();
-
-                        // generate samples to be used later
-                        m_integrator->GenerateSample(sampler.get(), pixelSamples.get(), m_sample_per_pixel, m_scene, rc);
-
-                        // the radiance
-                        Spectrum radiance;
-
-                        auto valid_pixel_cnt = m_sample_per_pixel;
-                        for (unsigned k = 0; k < m_sample_per_pixel; ++k) {
-
-                            // generate rays
-                            auto r = camera->GenerateRay((float)j, (float)i, pixelSamples[k]);
-                            // accumulate the radiance
-                            auto li = m_integrator->Li(r, pixelSamples[k], m_scene, rc);
-                            if (m_clampping > 0.0f)
-                                li = li.Clamp(0.0f, m_clampping);
-
-                            sAssert(li.IsValid(), GENERAL);
-
-                            if (li.IsValid())
-                                radiance += li;
-                            else
-                                --valid_pixel_cnt;
-                        }
-
-                        if (valid_pixel_cnt > 0)
-                            radiance /= (float)valid_pixel_cnt;
-
-                        if (m_need_render_target)
-                            UpdateImage(Vector2i(j,i), radiance);
-
-                        // update the value if display server is connected
-                        if (m_has_display_server && need_refresh_tile) {
-                            auto local_i = i - ori.y;
-                            auto local_j = j - ori.x;
-                            display_tile->UpdatePixel(local_j, local_i, radiance);
-                        }
-                    }
-                }
+    // at this point, we are starting to render stuff
+    const auto samples = m_adaptive_sampling ? m_max_samples : m_sample_per_pixel;
+    for (const auto& tile : tiles) {
+        ++m_tile_cnt;
+        marl::schedule([this, samples](const Vector2i& ori, const Vector2i& size) {
+            // nobody is interested in the result anymore
+            if (!m_aborted)
+                renderTile(ori, size, samples);
+
+            // we are done with this tile
+            --m_tile_cnt;
+        }, tile.first, tile.second);
+    }
+}
 
-                // update display server if needed
-                if (m_has_display_server && need_refresh_tile)
-                    DisplayManager::GetSingleton().QueueDisplayItem(display_tile);
+std::vector<std::pair<Vector2i, Vector2i>> ImageEvaluation::collectTiles() const {
+    // get the number of total task, only tiles inside the border are rendered
+    const auto tilesize = IMAGE_TILE_SIZE;
+    Vector2i tile_num = Vector2i((int)ceil(m_border_size.x / (float)tilesize), (int)ceil(m_border_size.y / (float)tilesize));
 
-                // we are done with this tile
-                --m_tile_cnt;
+    // start tile from center instead of top-left corner
+    Vector2i cur_pos(tile_num / 2);
+    int cur_dir = 0;
+    int cur_len = 0;
+    int cur_dir_len = 1;
+    const Vector2i dir[4] = { Vector2i(0 , -1) , Vector2i(-1 , 0) , Vector2i(0 , 1) , Vector2i(1 , 0) };
 
-                // we are done with the render context, recycle it
-                recycleContext(m_rc_holder, pRc);
-            }, tl, size);
+    std::vector<std::pair<Vector2i, Vector2i>> tiles;
+    while (true) {
+        // only process node inside the image region
+        if (cur_pos.x >= 0 && cur_pos.x < tile_num.x && cur_pos.y >= 0 && cur_pos.y < tile_num.y) {
+            Vector2i tl(cur_pos.x * tilesize, cur_pos.y * tilesize);
+            Vector2i size((tilesize < (m_border_size.x - tl.x)) ? tilesize : (m_border_size.x - tl.x),
+                (tilesize < (m_border_size.y - tl.y)) ? tilesize : (m_border_size.y - tl.y));
+            tiles.push_back(std::make_pair(tl + m_border_ori, size));
         }
 
         // turn to the next direction
@@ -277,15 +335,350 @@ void ImageEvaluation::StartRunning(int argc, char** argv) {
         if ((cur_pos.x < 0 || cur_pos.x >= tile_num.x) && (cur_pos.y < 0 || cur_pos.y >= tile_num.y))
             break;
     }
+    return tiles;
+}
+
+void ImageEvaluation::renderProgressively(const std::vector<std::pair<Vector2i, Vector2i>>& tiles) {
+    while (true) {
+        renderPasses(tiles);
+
+        // an interactive render waits for the next view once its passes are done, it is over only once it is aborted
+        while (m_interactive && !m_aborted && !m_view_changed)
+            m_view_event.wait_for(std::chrono::milliseconds(50));
+        if (m_aborted || !m_view_changed)
+            break;
+
+        applyView();
+    }
+
+    const auto pixel_cnt = m_border_size.x * m_border_size.y;
+    for (auto i = 0; i < pixel_cnt; ++i)
+        SORT_STATS(sPixelSampleCnt += m_estimates[i].sample_cnt);
+    SORT_STATS(sPixelCnt += pixel_cnt);
+}
+
+void ImageEvaluation::renderPasses(const std::vector<std::pair<Vector2i, Vector2i>>& tiles) {
+    // the sample count of the scene is the sample budget, it is the maximum samples with adaptive sampling
+    const auto max_samples = m_adaptive_sampling ? m_max_samples : m_sample_per_pixel;
+
+    // the image shows up in no time at low resolution before the first real pass, each preview halves the size of blocks
+    if (m_has_display_server && m_integrator->NeedRefreshTile() && !m_show_sample_count) {
+        for (auto block = m_downsample; block > 1 && !m_aborted && !m_view_changed; block /= 2) {
+            marl::WaitGroup preview_done((unsigned)tiles.size());
+            for (const auto& tile : tiles) {
+                marl::schedule([&, block](const Vector2i& ori, const Vector2i& size) {
+                    defer(preview_done.done());
+                    if (!m_aborted && !m_view_changed)
+                        renderPreviewTile(ori, size, block);
+                }, tile.first, tile.second);
+            }
+            preview_done.wait();
+        }
+    }
+
+    // the first pass is as cheap as possible so that there is something to look at, each pass doubles the samples after it
+    auto samples = 1u;
+    auto pass_samples = 1u;
+    auto pass = 0;
+    while (!m_aborted && !m_view_changed) {
+        m_unconverged_cnt = 0;
+
+        marl::WaitGroup pass_done((unsigned)tiles.size());
+        for (const auto& tile : tiles) {
+            marl::schedule([&, samples](const Vector2i& ori, const Vector2i& size) {
+                defer(pass_done.done());
+                if (!m_aborted && !m_view_changed)
+                    renderTile(ori, size, samples);
+            }, tile.first, tile.second);
+        }
+        pass_done.wait();
+
+        // the pass is not complete, the passes start over with the new view
+        if (m_view_changed)
+            break;
+
+        ++pass;
+        slog(INFO, GENERAL, "Progressive pass %d is done, %d samples per pixel in %.2f (s).", pass, samples, m_timer.GetElapsedTime() / 1000.0f);
+
+        if (isOutOfTime()) {
+            slog(INFO, GENERAL, "The time budget of %.2f (s) runs out.", m_time_budget);
+            break;
+        }
+        if ((m_noise_target > 0.0f || m_adaptive_sampling) && m_unconverged_cnt == 0) {
+            slog(INFO, GENERAL, "All pixels are converged.");
+            break;
+        }
+        if (samples >= max_samples)
+            break;
+
+        pass_samples = samples;
+        samples = std::min(samples + pass_samples, max_samples);
+    }
+}
+
+void ImageEvaluation::applyView() {
+    std::string view;
+    {
+        std::lock_guard<std::mutex> guard(m_view_lock);
+        view.swap(m_pending_view);
+        m_view_changed = false;
+    }
+
+    IMemoryStream stream(view.data(), (unsigned)view.size());
+    StringID class_id;
+    stream >> class_id;
+    if (SID("PerspectiveCameraEntity") != class_id) {
+        slog(WARNING, GENERAL, "Invalid view from display server, it is ignored.");
+        return;
+    }
+
+    auto entity = MakeUniqueInstance<Entity>(class_id);
+    entity->Serialize(stream);
+
+    // the estimates of pixels are only valid for an image of the same size
+    const auto old_camera = m_scene.GetCamera();
+    entity->FillScene(m_scene);
+    const auto resolution = m_scene.GetCamera()->GetImageResolution();
+    if (resolution.x != (int)m_image_width || resolution.y != (int)m_image_height) {
+        slog(WARNING, GENERAL, "The view is %d x %d instead of %u x %u, it is ignored.", resolution.x, resolution.y, m_image_width, m_image_height);
+        m_scene.SetupCamera(old_camera);
+        return;
+    }
+    m_view_entity = std::move(entity);
+
+    // pixels start from nothing with the new view, so does the time budget
+    m_estimates = std::make_unique<PixelEstimate[]>(m_border_size.x * m_border_size.y);
+    m_timer.Reset();
+    m_budget_timer.Reset();
+
+    slog(INFO, GENERAL, "Rendering starts over with a new view.");
+}
+
+void ImageEvaluation::renderPreviewTile(const Vector2i& ori, const Vector2i& size, unsigned block) {
+    auto pRc = pullContext(m_rc_holder);
+    auto& rc = *pRc;
+
+    auto camera = m_scene.GetCamera();
+    auto sampler = std::make_unique<RandomSampler>();
+    PixelSample pixel_sample;
+    m_integrator->RequestSample(sampler.get(), &pixel_sample, 1);
+
+    const auto display_ori = ori - displayOrigin();
+    auto display_tile = std::make_shared<DisplayTile>(m_image_title, display_ori.x, display_ori.y, size.x, size.y, m_blender_mode);
+
+    // one sample through the center of each block fills the whole block, nothing is kept for the passes after it
+    const auto block_size = (int)block;
+    for (int i = 0; i < size.y && !m_aborted && !m_view_changed; i += block_size) {
+        for (int j = 0; j < size.x; j += block_size) {
+            const auto block_w = std::min(block_size, size.x - j);
+            const auto block_h = std::min(block_size, size.y - i);
+
+            rc.Reset();
+            m_integrator->GenerateSample(sampler.get(), &pixel_sample, 1, m_scene, rc);
+            auto r = camera->GenerateRay((float)(ori.x + j + block_w / 2), (float)(ori.y + i + block_h / 2), pixel_sample);
+            auto li = m_integrator->Li(r, pixel_sample, m_scene, rc);
+            if (m_clampping > 0.0f)
+                li = li.Clamp(0.0f, m_clampping);
+            if (!li.IsValid())
+                li = Spectrum(0.0f);
+
+            for (auto y = i; y < i + block_h; ++y)
+                for (auto x = j; x < j + block_w; ++x)
+                    display_tile->UpdatePixel(x, y, li);
+        }
+    }
+
+    if (!m_aborted && !m_view_changed)
+        DisplayManager::GetSingleton().QueueDisplayItem(display_tile);
+
+    recycleContext(m_rc_holder, pRc);
+}
+
+bool ImageEvaluation::isOutOfTime() const {
+    return m_progressive && m_time_budget > 0.0f && m_budget_timer.GetElapsedTime() >= m_time_budget * 1000.0f;
+}
+
+bool ImageEvaluation::isConverged(const PixelEstimate& estimate, float threshold) const {
+    if (threshold <= 0.0f || estimate.sample_cnt < m_min_samples || estimate.valid_cnt < 2)
+        return false;
+
+    // the standard error of the mean luminance is small enough compared with the luminance itself
+    const auto n = (float)estimate.valid_cnt;
+    const auto mean = estimate.luminance_sum / n;
+    const auto variance = std::max(0.0f, (estimate.luminance_sqr_sum - estimate.luminance_sum * mean) / (n - 1.0f));
+    return sqrt(variance / n) <= threshold * std::max(mean, ADAPTIVE_MIN_LUMINANCE);
+}
+
+void ImageEvaluation::renderTile(const Vector2i& ori, const Vector2i& size, unsigned samples) {
+    // get a render context
+    auto pRc = pullContext(m_rc_holder);
+    auto& rc = *pRc;
+
+    // get camera
+    auto camera = m_scene.GetCamera();
+
+    // pixels stop taking samples once they are converged, the noise target of progressive rendering goes first
+    const auto threshold = (m_progressive && m_noise_target > 0.0f) ? m_noise_target : (m_adaptive_sampling ? m_noise_threshold : 0.0f);
+
+    // with adaptive sampling, a pixel takes samples until it is converged, there are only so many of them though
+    const auto max_samples = m_adaptive_sampling ? m_max_samples : m_sample_per_pixel;
+
+    auto sampler = std::make_unique<RandomSampler>();
+    auto pixelSamples = std::make_unique<PixelSample[]>(samples);
+
+    // request samples
+    m_integrator->RequestSample(sampler.get(), pixelSamples.get(), samples);
+
+    const bool need_refresh_tile = m_integrator->NeedRefreshTile();
+    std::shared_ptr<DisplayTile> display_tile;
+    if (m_has_display_server && need_refresh_tile) {
+        const auto display_ori = ori - displayOrigin();
+
+        // indicate that we are rendering this tile
+        std::shared_ptr<IndicationTile> indicate_tile = std::make_shared<IndicationTile>(m_image_title, display_ori.x, display_ori.y, size.x, size.y, m_blender_mode);
+        DisplayManager::GetSingleton().QueueDisplayItem(indicate_tile);
+
+        display_tile = std::make_shared<DisplayTile>(m_image_title, display_ori.x, display_ori.y, size.x, size.y, m_blender_mode);
+    }
+
+    auto unconverged_cnt = 0;
+    Vector2i rb = ori + size;
+    for (int i = ori.y; i < rb.y && !m_aborted && !m_view_changed; i++) {
+        // once the time budget runs out, pixels left in this pass keep what they have from previous passes
+        const auto out_of_time = isOutOfTime();
+
+        for (int j = ori.x; j < rb.x; j++) {
+            // progressive rendering refines the same estimate pass after pass, a pixel starts from nothing otherwise
+            PixelEstimate local_estimate;
+            auto& estimate = m_estimates ? m_estimates[(i - m_border_ori.y) * m_border_size.x + j - m_border_ori.x] : local_estimate;
+            const auto sample_cnt = estimate.sample_cnt;
+
+            // every pixel takes the first pass no matter what, there would be nothing to deliver otherwise
+            if ((!out_of_time || estimate.sample_cnt == 0) && estimate.sample_cnt < samples && !isConverged(estimate, threshold)) {
+                // reset the memory allocator so that the last sample could reuse memory
+                // otherwise, memory usage is linear to spp.
+                rc.Reset();
+
+                // generate samples to be used later
+                const auto sample_num = samples - estimate.sample_cnt;
+                m_integrator->GenerateSample(sampler.get(), pixelSamples.get(), sample_num, m_scene, rc);
+
+                for (auto k = 0u; k < sample_num; ++k) {
+                    // generate rays
+                    auto r = camera->GenerateRay((float)j, (float)i, pixelSamples[k]);
+                    // accumulate the radiance
+                    auto li = m_integrator->Li(r, pixelSamples[k], m_scene, rc);
+                    if (m_clampping > 0.0f)
+                        li = li.Clamp(0.0f, m_clampping);
+
+                    sAssert(li.IsValid(), GENERAL);
+
+                    ++estimate.sample_cnt;
+                    if (li.IsValid()) {
+                        estimate.radiance += li;
+                        ++estimate.valid_cnt;
+
+                        // luminance of valid samples tells how noisy the pixel is
+                        const auto luminance = li.GetIntensity();
+                        estimate.luminance_sum += luminance;
+                        estimate.luminance_sqr_sum += luminance * luminance;
+                    }
+
+                    if (isConverged(estimate, threshold))
+                        break;
+                }
+            }
+
+            if (threshold > 0.0f && !isConverged(estimate, threshold))
+                ++unconverged_cnt;
+
+            if (!m_progressive) {
+                SORT_STATS(sPixelSampleCnt += estimate.sample_cnt - sample_cnt);
+                SORT_STATS(++sPixelCnt);
+            }
+
+            auto radiance = estimate.radiance;
+            if (estimate.valid_cnt > 0)
+                radiance /= (float)estimate.valid_cnt;
+
+            // pixels taking more samples are brighter, the maximum number of samples is white
+            if (m_show_sample_count)
+                radiance = Spectrum((float)estimate.sample_cnt / (float)max_samples);
+
+            if (m_need_render_target)
+                UpdateImage(Vector2i(j,i), radiance);
+
+            // update the value if display server is connected
+            if (m_has_display_server && need_refresh_tile) {
+                auto local_i = i - ori.y;
+                auto local_j = j - ori.x;
+                display_tile->UpdatePixel(local_j, local_i, radiance);
+            }
+        }
+    }
+
+    m_unconverged_cnt += unconverged_cnt;
+
+    // update display server if needed, a tile of an old view is of no use
+    if (m_has_display_server && need_refresh_tile && !m_aborted && !m_view_changed)
+        DisplayManager::GetSingleton().QueueDisplayItem(display_tile);
+
+    // we are done with the render context, recycle it
+    recycleContext(m_rc_holder, pRc);
+}
+
+bool ImageEvaluation::requestTile(Vector2i& ori, Vector2i& size) {
+    std::lock_guard<std::mutex> guard(m_tile_lock);
+    if (!m_tile_input->IsConnected())
+        return false;
+
+    *m_tile_output << (int)0;
+    m_tile_output->Flush();
+
+    int x = 0, y = 0, w = 0, h = 0;
+    *m_tile_input >> x >> y >> w >> h;
+    if (!m_tile_input->IsConnected() || w <= 0 || h <= 0)
+        return false;
+
+    const auto border_end = m_border_ori + m_border_size;
+    if (x < m_border_ori.x || y < m_border_ori.y || x + w > border_end.x || y + h > border_end.y) {
+        slog(WARNING, SOCKET, "Invalid tile from tile server, x: %d, y: %d, width: %d, height: %d.", x, y, w, h);
+        return false;
+    }
+
+    ori = Vector2i(x, y);
+    size = Vector2i(w, h);
+    return true;
 }
 
 int ImageEvaluation::WaitForWorkToBeDone() {
     Timer timer;
+    Timer lost_timer;
     while (m_tile_cnt > 0) {
+        // Blender closes the display server once it doesn't need the render anymore, there is no point to keep going
+        // the camera is replaced once the passes in flight give up, the rest of the scene stays the same
+        std::string view;
+        if (m_interactive && !m_aborted && DisplayManager::GetSingleton().ReceiveView(view)) {
+            {
+                std::lock_guard<std::mutex> guard(m_view_lock);
+                m_pending_view.swap(view);
+                m_view_changed = true;
+            }
+            m_view_event.signal();
+        }
+
+        if (m_blender_mode && !m_aborted && lost_timer.GetElapsedTime() > 50) {
+            if (DisplayManager::GetSingleton().IsDisplayServerLost()) {
+                slog(INFO, GENERAL, "Rendering is aborted.");
+                m_aborted = true;
+            }
+            lost_timer.Reset();
+        }
+
         if (DisplayManager::GetSingleton().IsDisplayServerConnected()) {
             if (UNLIKELY(m_integrator->NeedFullTargetRealtimeUpdate())) {
                 if (timer.GetElapsedTime() > 1000) {
-                    std::shared_ptr<FullTargetUpdate> di = std::make_shared<FullTargetUpdate>(m_image_title, m_render_target.get(), m_blender_mode);
+                    std::shared_ptr<FullTargetUpdate> di = makeFullTargetUpdate();
                     DisplayManager::GetSingleton().QueueDisplayItem(di);
                     timer.Reset();
                 }
@@ -296,12 +689,12 @@ int ImageEvaluation::WaitForWorkToBeDone() {
         std::this_thread::yield();
     }
 
-    if (m_has_display_server && UNLIKELY(m_integrator->NeedFinalUpdate())) {
-        std::shared_ptr<FullTargetUpdate> di = std::make_shared<FullTargetUpdate>(m_image_title, m_render_target.get(), m_blender_mode);
+    if (m_has_display_server && !m_aborted && UNLIKELY(m_integrator->NeedFinalUpdate())) {
+        std::shared_ptr<FullTargetUpdate> di = makeFullTargetUpdate();
         DisplayManager::GetSingleton().QueueDisplayItem(di);
     }
 
-    if (!m_blender_mode)
+    if (!m_blender_mode && !m_aborted)
         m_render_target->Output("sort_" + logTimeStringStripped() + ".exr");
 
     // make sure flush all display items before quiting
@@ -309,18 +702,26 @@ int ImageEvaluation::WaitForWorkToBeDone() {
 
     DestroyTSLThreadContexts();
 
-    m_scheduler->unbind();
-    m_scheduler = nullptr;
+    // the scheduler is not there if the scene failed to load
+    if (m_scheduler) {
+        m_scheduler->unbind();
+        m_scheduler = nullptr;
+    }
 
     SORT_STATS(sRenderingTimeMS = m_timer.GetElapsedTime());
 
     // Close the display server to make sure TEV/Blender receives all data
     DisplayManager::GetSingleton().DisconnectDisplayServer();
 
+    // the tile server knows this process is done once the connection is closed
+    m_tile_input = nullptr;
+    m_tile_output = nullptr;
+    m_tile_connection = nullptr;
+
     // shutdown socket system
     ShutdownSocketSystem();
 
-    return 0;
+    return m_aborted ? -1 : 0;
 }
 
 void ImageEvaluation::parseCommandArgs(int argc, char** argv){
@@ -347,36 +748,92 @@ void ImageEvaluation::parseCommandArgs(int argc, char** argv){
             m_display_server_ip = value_str.substr(0, split);
             m_display_server_port = value_str.substr(split + 1);
             m_has_display_server = !m_display_server_ip.empty() && !m_display_server_port.empty();
+        }else if (key_str == "downsample") {
+            m_downsample = std::max(1, atoi(value_str.c_str()));
+        }else if (key_str == "spp") {
+            m_spp_override = std::max(0, atoi(value_str.c_str()));
+        }else if (key_str == "threads") {
+            m_thread_override = std::max(0, atoi(value_str.c_str()));
+        }else if (key_str == "time-budget") {
+            m_time_budget = std::max(0.0f, (float)atof(value_str.c_str()));
+        }else if (key_str == "noise-target") {
+            m_noise_target = std::max(0.0f, (float)atof(value_str.c_str()));
+        }else if (key_str == "progressive") {
+            m_progressive = true;
+        }else if (key_str == "interactive") {
+            m_interactive = true;
+        }else if (key_str == "tileserver") {
+            int split = value_str.find_last_of(':');
+            if (split < 0)
+                continue;
+
+            m_tile_server_ip = value_str.substr(0, split);
+            m_tile_server_port = value_str.substr(split + 1);
+            m_has_tile_server = !m_tile_server_ip.empty() && !m_tile_server_port.empty();
+        }else if (key_str == "displaymemory") {
+            m_display_memory = value_str;
+        }else if (key_str == "inputserver") {
+            int split = value_str.find_last_of(':');
+            if (split < 0)
+                continue;
+
+            m_input_server_ip = value_str.substr(0, split);
+            m_input_server_port = value_str.substr(split + 1);
+            m_has_input_server = !m_input_server_ip.empty() && !m_input_server_port.empty();
         }
     }
 }
 
 void ImageEvaluation::loadConfig(IStreamBase& stream) {
-    // check the version, there is no version for now, :(
-    unsigned version = 0;
-    stream >> version;
-    sAssertMsg(GLOBAL_CONFIGURATION_VERSION == version, GENERAL, "Incompatible resource file with this version SORT.");
+    GlobalConfiguration config;
+    config.Serialize(stream);
 
-    stream >> m_resource_path;
-    stream >> m_thread_cnt;
+    m_resource_path = config.resource_path;
+    m_thread_cnt = config.thread_cnt;
     if (!m_thread_cnt)
         m_thread_cnt = std::thread::hardware_concurrency();
 
-    stream >> m_sample_per_pixel;
-    stream >> m_image_width >> m_image_height;
-    stream >> m_clampping;
+    m_sample_per_pixel = config.sample_per_pixel;
+    m_image_width = config.image_width;
+    m_image_height = config.image_height;
+    m_clampping = config.clampping;
+
+    // the region to be rendered, it is the whole image unless there is a render border in Blender
+    m_border_ori.x = std::min(std::max(config.border_ori.x, 0), (int)m_image_width - 1);
+    m_border_ori.y = std::min(std::max(config.border_ori.y, 0), (int)m_image_height - 1);
+    m_border_size.x = std::min(std::max(config.border_size.x, 1), (int)m_image_width - m_border_ori.x);
+    m_border_size.y = std::min(std::max(config.border_size.y, 1), (int)m_image_height - m_border_ori.y);
+
+    m_adaptive_sampling = config.adaptive_sampling;
+    m_noise_threshold = config.noise_threshold;
+    m_show_sample_count = config.show_sample_count;
+    m_min_samples = std::max(config.min_samples, 2u);
+    m_max_samples = std::max(config.max_samples, m_min_samples);
 
-    StringID integratorType;
-    stream >> integratorType;
-    m_integrator = MakeUniqueInstance<Integrator>(integratorType);
+    m_integrator = std::move(config.integrator);
     if (IS_PTR_VALID(m_integrator)) {
-        m_integrator->Serialize(stream);
         m_integrator->SetImageEvaluation(this);
+
+        // integrators splatting all over the image count on every pixel taking the same number of samples
+        if (m_adaptive_sampling && m_integrator->NeedImageLock()) {
+            slog(WARNING, GENERAL, "Adaptive sampling is not supported by this integrator, it is disabled.");
+            m_adaptive_sampling = false;
+        }
     }
 
     slog(INFO, GENERAL, "There will be %d threads rendering at the same time.", m_thread_cnt);
 }
 
+Vector2i ImageEvaluation::displayOrigin() const {
+    return m_blender_mode ? m_border_ori : Vector2i(0, 0);
+}
+
+std::shared_ptr<FullTargetUpdate> ImageEvaluation::makeFullTargetUpdate() const {
+    if (!m_blender_mode)
+        return std::make_shared<FullTargetUpdate>(m_image_title, m_render_target.get(), m_blender_mode);
+    return std::make_shared<FullTargetUpdate>(m_image_title, m_render_target.get(), m_border_ori.x, m_border_ori.y, m_border_size.x, m_border_size.y, m_blender_mode);
+}
+
 void ImageEvaluation::UpdateImage(const Vector2i& coord, const Spectrum& value) {
     if (m_integrator->NeedImageLock()) {
         std::lock_guard<std::mutex> guard(m_image_lock);
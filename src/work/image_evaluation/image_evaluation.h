@@ -18,17 +18,37 @@
 #pragma once
 
 #include <atomic>
+#include <vector>
 #include <marl/scheduler.h>
+#include <marl/event.h>
 #include "work/work.h"
+#include "entity/entity.h"
 #include "core/timer.h"
 #include "integrator/integrator.h"
 #include "texture/rendertarget.h"
+#include "core/socket.h"
+#include "core/display_mgr.h"
+#include "stream/sstream.h"
 
 //! @brief  Generating an image using ray tracing algorithms.
 /**
  * This class has all the image generation specific logic inside, including parsing streamed input,
  * spawning render tasks for image tiles, storing the results to an image and send it to display server
  * through sockets if needed.
+ *
+ * An image can also be shared by several processes, each of them connects to a tile server that hands out tiles
+ * until there is none left, so that a faster process simply renders more tiles. The protocol is as below, all numbers
+ * are little endian.
+ *   request    : an integer of any value (4 bytes)
+ *   reply      : x, y, width and height of the next tile (16 bytes), an empty tile means there is nothing left
+ *
+ * With a time budget or a noise target, the image is rendered progressively instead. The whole image is rendered in
+ * passes of increasing sample count, every pass refines the estimate of each pixel so that the image is always the
+ * best one so far, rendering stops once the budget runs out, the pixels are converged or all samples are taken.
+ *
+ * An interactive render is a progressive one that keeps going after its passes are done. Whenever the display server
+ * sends a new view, the passes are abandoned and start all over again with the new camera, the rest of the scene is
+ * not loaded again.
  */
 class ImageEvaluation : public Work {
 public:
@@ -71,20 +91,126 @@ private:
     std::string     m_resource_path;            // resource path
     std::string     m_display_server_ip;        // display server ip
     std::string     m_display_server_port;      // display server port
-    bool            m_has_display_server;       // whether it has a display server
+    bool            m_has_display_server = false; // whether it has a display server
+    std::string     m_display_memory;           // file shared with the display server for pixels, only in blender mode
+    std::string     m_input_server_ip;          // input server ip, the scene is streamed from it if available
+    std::string     m_input_server_port;        // input server port
+    bool            m_has_input_server = false; // whether it has an input server
+    std::string     m_tile_server_ip;           // tile server ip, tiles are handed out by it if available
+    std::string     m_tile_server_port;         // tile server port
+    bool            m_has_tile_server = false;  // whether it has a tile server
     unsigned        m_thread_cnt = 6;           // thread cnt
     unsigned        m_sample_per_pixel = 16;    // sample per pixel to be evaluated.
     unsigned        m_image_width = 0;          // width of the image to be generated
     unsigned        m_image_height = 0;         // height of the image to be generated
     float           m_clampping = 0.0f;         // radiance can't go higher than this, this is the cheapest way to do firefly reduction.
+    Vector2i        m_border_ori;               // top left corner of the region to be rendered, the rest of the image is left black
+    Vector2i        m_border_size;              // size of the region to be rendered
+    bool            m_adaptive_sampling = false; // whether a pixel stops taking samples once it is converged
+    float           m_noise_threshold = 0.01f;  // a pixel is converged once the relative standard error of its luminance is below this
+    unsigned        m_min_samples = 16;         // samples a pixel takes before its noise is estimated at all
+    unsigned        m_max_samples = 1024;       // samples a pixel takes at most, even if it is not converged
+    bool            m_show_sample_count = false; // display the number of samples of each pixel instead of its color
+    unsigned        m_downsample = 1;           // the image is rendered at a fraction of its resolution, only the first passes in progressive mode
+    unsigned        m_spp_override = 0;         // sample per pixel overriding the one in the scene if it is not zero
+    unsigned        m_thread_override = 0;      // thread count overriding the one in the scene if it is not zero
+    float           m_time_budget = 0.0f;       // seconds the rendering is allowed to take in progressive mode, zero means no limit
+    float           m_noise_target = 0.0f;      // relative noise all pixels get down to in progressive mode, zero means no target
+    bool            m_progressive = false;      // whether the image is rendered in passes of increasing sample count
+    bool            m_interactive = false;      // whether the camera can be changed by the display server while rendering
 
     std::unique_ptr<Integrator>         m_integrator;       // the algorithm used for ray tracing
     std::atomic<int>                    m_tile_cnt;         // number of total tiles
+    std::atomic<bool>                   m_aborted{false};   // whether the rest of the rendering is abandoned
     std::unique_ptr<RenderTarget>       m_render_target;    // a temporary buffer for saving out the result
     std::unique_ptr<marl::Scheduler>    m_scheduler;        // job system scheduler
     std::mutex                          m_image_lock;       // image lock, ideally we should have a lock for each pixel
     Timer                               m_timer;            // timer to evaluate the rendering time.
+    Timer                               m_budget_timer;     // timer started along with the work, the time budget covers loading the scene too
+
+    std::unique_ptr<SocketConnection>   m_tile_connection;  // connection to the tile server
+    std::unique_ptr<ISocketStream>      m_tile_input;       // tiles from the tile server
+    std::unique_ptr<OSocketStream>      m_tile_output;      // requests to the tile server
+    std::mutex                          m_tile_lock;        // only one request is sent to the tile server at a time
+
+    //! @brief  Samples taken by a pixel so far, progressive rendering keeps refining it pass after pass.
+    struct PixelEstimate {
+        Spectrum    radiance;                   /**< Sum of the radiance of valid samples. */
+        float       luminance_sum = 0.0f;       /**< Sum of the luminance of valid samples. */
+        float       luminance_sqr_sum = 0.0f;   /**< Sum of the squared luminance of valid samples. */
+        unsigned    valid_cnt = 0;              /**< Number of valid samples. */
+        unsigned    sample_cnt = 0;             /**< Number of samples, including the invalid ones. */
+    };
+
+    std::unique_ptr<PixelEstimate[]>    m_estimates;        // estimates of pixels inside the border, only in progressive mode
+    std::atomic<int>                    m_unconverged_cnt{0}; // pixels that are not converged by the end of the current pass
+
+    std::mutex                          m_view_lock;        // lock of the pending view
+    std::string                         m_pending_view;     // the latest view sent by the display server, not applied yet
+    std::atomic<bool>                   m_view_changed{false}; // whether there is a pending view, the current passes are abandoned
+    marl::Event                         m_view_event{marl::Event::Mode::Auto}; // signaled once there is a pending view
+    std::unique_ptr<Entity>             m_view_entity;      // camera of the latest applied view
 
     void    parseCommandArgs(int argc, char** argv);
     void    loadConfig(IStreamBase& stream);
+
+    //! @brief  Top left corner of the displayed image in the whole image.
+    //!
+    //! Blender only expects the rendered region of the image, TEV displays the whole image.
+    Vector2i    displayOrigin() const;
+
+    //! @brief  Display the whole render target, or only the rendered region of it in Blender.
+    std::shared_ptr<FullTargetUpdate>   makeFullTargetUpdate() const;
+
+    //! @brief  Tiles inside the border, starting from the center of the image instead of the top-left corner.
+    //!
+    //! @return             Top left corner and size of each tile.
+    std::vector<std::pair<Vector2i, Vector2i>>  collectTiles() const;
+
+    //! @brief  Render a tile of the image.
+    //!
+    //! @param ori          Top left corner of the tile.
+    //! @param size         Size of the tile.
+    //! @param samples      Samples each pixel of the tile has taken in total once the tile is done.
+    void    renderTile(const Vector2i& ori, const Vector2i& size, unsigned samples);
+
+    //! @brief  Render the whole image pass after pass, each pass doubles the samples taken so far.
+    //!
+    //! @param tiles        Tiles of the image.
+    void    renderProgressively(const std::vector<std::pair<Vector2i, Vector2i>>& tiles);
+
+    //! @brief  Render the preview and all passes of the image with the current camera.
+    //!
+    //! @param tiles        Tiles of the image.
+    void    renderPasses(const std::vector<std::pair<Vector2i, Vector2i>>& tiles);
+
+    //! @brief  Replace the camera of the scene with the pending view and start over.
+    //!
+    //! The view is ignored if it has a different resolution, the estimates of pixels are only valid for the image.
+    void    applyView();
+
+    //! @brief  Render a tile of the image at low resolution, only for display.
+    //!
+    //! @param ori          Top left corner of the tile.
+    //! @param size         Size of the tile.
+    //! @param block        Size of the square blocks of pixels that share one sample.
+    void    renderPreviewTile(const Vector2i& ori, const Vector2i& size, unsigned block);
+
+    //! @brief  Whether the time budget of progressive rendering has run out.
+    bool    isOutOfTime() const;
+
+    //! @brief  Whether the noise of a pixel is low enough compared with its luminance.
+    //!
+    //! A pixel needs to take the minimum number of samples before its noise is estimated at all.
+    //!
+    //! @param estimate     Samples taken by the pixel so far.
+    //! @param threshold    Relative standard error of the luminance a converged pixel has at most, zero means never.
+    bool    isConverged(const PixelEstimate& estimate, float threshold) const;
+
+    //! @brief  Ask the tile server for the next tile to render, this is thread safe.
+    //!
+    //! @param ori          Top left corner of the tile.
+    //! @param size         Size of the tile.
+    //! @return             False if there is no tile left or the tile server is gone.
+    bool    requestTile(Vector2i& ori, Vector2i& size);
 };
\ No newline at end of file
@@ -0,0 +1,92 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include <vector>
+#include "render_daemon.h"
+#include "core/log.h"
+#include "core/parse_args.h"
+#include "stream/sstream.h"
+#include "work/image_evaluation/image_evaluation.h"
+
+void RenderDaemon::StartRunning(int argc, char** argv) {
+    InitializeSocketSystem();
+
+    m_binary = argc > 0 ? argv[0] : "";
+
+    const auto& args = parse_args(argc, argv, true);
+    for (auto& arg : args) {
+        if (arg.first != "daemon")
+            continue;
+
+        const auto& value_str = arg.second;
+        int split = value_str.find_last_of(':');
+        if (split < 0)
+            continue;
+
+        const auto ip = value_str.substr(0, split);
+        const auto port = value_str.substr(split + 1);
+        m_control_connection = ConnectSocket(ip, port);
+        if (m_control_connection)
+            slog(INFO, SOCKET, "Render daemon connected to %s:%s.", ip.c_str(), port.c_str());
+        else
+            slog(WARNING, SOCKET, "Render daemon failed to connect to %s:%s.", ip.c_str(), port.c_str());
+    }
+}
+
+int RenderDaemon::WaitForWorkToBeDone() {
+    if (!m_control_connection) {
+        ShutdownSocketSystem();
+        return -1;
+    }
+
+    ISocketStream input(m_control_connection->m_socket);
+    OSocketStream output(m_control_connection->m_socket);
+
+    while (true) {
+        // a lost connection reads as an empty job too
+        unsigned int arg_cnt = 0;
+        input >> arg_cnt;
+        if (0 == arg_cnt || !input.IsConnected())
+            break;
+
+        std::vector<std::string> args(arg_cnt + 1);
+        args[0] = m_binary;
+        for (auto i = 1u; i <= arg_cnt; ++i)
+            input >> args[i];
+        if (!input.IsConnected())
+            break;
+
+        std::vector<char*> argv;
+        for (auto& arg : args)
+            argv.push_back(&arg[0]);
+
+        // every job is evaluated like a fresh process, except that whatever is cached in singletons is still there
+        slog(INFO, GENERAL, "Render daemon starts job with %d arguments.", arg_cnt);
+        auto job = std::make_unique<ImageEvaluation>();
+        job->StartRunning((int)argv.size(), argv.data());
+        const auto ret = job->WaitForWorkToBeDone();
+        job = nullptr;
+
+        output << ret;
+        output.Flush();
+    }
+
+    slog(INFO, GENERAL, "Render daemon shuts down.");
+    m_control_connection = nullptr;
+    ShutdownSocketSystem();
+    return 0;
+}
@@ -0,0 +1,54 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#pragma once
+
+#include <memory>
+#include <string>
+#include "../work.h"
+#include "core/socket.h"
+
+//! @brief  A long-lived renderer serving render jobs from Blender.
+/**
+ * Launching a new process for every render means parsing everything, compiling every shader unit and loading every
+ * texture again, even if nothing has changed since last render. In daemon mode, SORT stays alive and keeps a control
+ * connection with Blender, each render job is a list of command line arguments that is evaluated exactly like a fresh
+ * process would evaluate it. What makes it cheaper is that everything cached in singletons stays resident between
+ * jobs. Textures are only reloaded if their files change and shader units are only compiled again if their source
+ * code changes.
+ *
+ * The protocol on the control connection is as below, all numbers are little endian.
+ *   job        : argument count (4 bytes) | arguments (null terminated strings), an empty job shuts down the daemon
+ *   reply      : result of the job (4 bytes), zero means success
+ */
+class RenderDaemon : public Work {
+public:
+    DEFINE_RTTI(RenderDaemon, Work);
+
+    //! @brief  Connect to Blender.
+    //!
+    //! @param argc         Number of command line arguments.
+    //! @param argv         Command line arguments, '--daemon:ip:port' is where Blender is listening.
+    void    StartRunning(int argc, char** argv) override;
+
+    //! @brief  Keep serving render jobs until Blender asks to shut down or goes away.
+    int     WaitForWorkToBeDone() override;
+
+private:
+    std::string                         m_binary;               /**< Path of the binary itself, it is the first argument of every job. */
+    std::unique_ptr<SocketConnection>   m_control_connection;   /**< Control connection with Blender. */
+};
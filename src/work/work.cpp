@@ -0,0 +1,36 @@
+/*
+    This file is a part of SORT(Simple Open Ray Tracing), an open-source cross
+    platform physically based renderer.
+
+    Copyright (c) 2011-2020 by Jiayin Cao - All rights reserved.
+
+    SORT is a free software written for educational purpose. Anyone can distribute
+    or modify it under the the terms of the GNU General Public License Version 3 as
+    published by the Free Software Foundation. However, there is NO warranty that
+    all components are functional in a perfect manner. Without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+    General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with
+    this program. If not, see <http://www.gnu.org/licenses/gpl-3.0.html>.
+ */
+
+#include "work.h"
+#include "core/log.h"
+
+void GlobalConfiguration::Serialize(IStreamBase& stream) {
+    // check the version, there is no version for now, :(
+    unsigned version = 0;
+    stream >> version;
+    sAssertMsg(GLOBAL_CONFIGURATION_VERSION == version, GENERAL, "Incompatible resource file with this version SORT.");
+
+    stream >> resource_path >> thread_cnt >> sample_per_pixel >> image_width >> image_height >> clampping;
+    stream >> border_ori.x >> border_ori.y >> border_size.x >> border_size.y;
+    stream >> adaptive_sampling >> noise_threshold >> min_samples >> max_samples >> show_sample_count;
+
+    StringID integrator_type;
+    stream >> integrator_type;
+    integrator = MakeUniqueInstance<Integrator>(integrator_type);
+    if (IS_PTR_VALID(integrator))
+        integrator->Serialize(stream);
+}
@@ -20,8 +20,40 @@
 #include "core/rtti.h"
 #include "core/scene.h"
 #include "material/tsl_system.h"
+#include "integrator/integrator.h"
 #include "stream/stream.h"
 
+// Version of the global configuration at the beginning of a scene file.
+static constexpr unsigned int GLOBAL_CONFIGURATION_VERSION = 2;
+
+//! @brief  Global configuration at the beginning of a scene file.
+/**
+ * Every scene file starts with the global configuration, followed by materials and then the scene itself. All works
+ * loading scene files read it through this so that they stay in sync with the exporter. Values are kept as they are
+ * in the file, it is up to the work to validate them.
+ */
+struct GlobalConfiguration {
+    std::string                 resource_path;              // resource path
+    unsigned                    thread_cnt = 0;             // thread cnt, zero means as many as the hardware supports
+    unsigned                    sample_per_pixel = 0;       // sample per pixel to be evaluated
+    unsigned                    image_width = 0;            // width of the image to be generated
+    unsigned                    image_height = 0;           // height of the image to be generated
+    float                       clampping = 0.0f;           // radiance can't go higher than this
+    Vector2i                    border_ori;                 // top left corner of the region to be rendered
+    Vector2i                    border_size;                // size of the region to be rendered
+    bool                        adaptive_sampling = false;  // whether a pixel stops taking samples once it is converged
+    float                       noise_threshold = 0.0f;     // relative standard error a pixel is converged below
+    unsigned                    min_samples = 0;            // samples a pixel takes before its noise is estimated at all
+    unsigned                    max_samples = 0;            // samples a pixel takes at most
+    bool                        show_sample_count = false;  // display the number of samples of each pixel instead of its color
+    std::unique_ptr<Integrator> integrator;                 // the algorithm used for ray tracing, nullptr if it is unknown
+
+    //! @brief  Load the configuration from a stream.
+    //!
+    //! @param  stream      The stream positioned at the beginning of a scene file.
+    void    Serialize(IStreamBase& stream);
+};
+
 template<class Context>
 struct ContextHolder {
     std::mutex                            m_rc_mutex;                     // a mutex to make sure pool is not accessed by two threads at the same time.